@@ -24,8 +24,17 @@ import asyncio
 import threading
 import platform # used to determine which OS we're using for MAC address/GUID listing
 import logging
+import signal # quitting cleanly when the HTTP server is stopped (SIGTERM from systemd, etc.)
+import random # used by the simulated light backend (--simulate)
+import json # the preset library stores each preset as JSON
+import sqlite3 # the preset library
+import heapq # the HTTP server's command queue
+import ast # reading the presets in the old customLights.prefs file into the preset library
 
 from datetime import datetime
+from collections import deque, OrderedDict, namedtuple # frame timing windows, ring buffers, LRU caches and the global configuration
+from functools import lru_cache # memoizing the frames sent to the lights
+from bisect import bisect_left, insort # keeping the light table's sort views in order
 from subprocess import run, PIPE # used to get MacOS Mac address
 
 from importlib import util as ilu # determining which PySide installation is in place 
@@ -39,7 +48,17 @@ print("  > https://github.com/taburineagle/NeewerLite-Python <")
 print("---------------------------------------------------------")
 print("Checking for bleak and PySide packages...")
 
-if (ilu.find_spec("bleak")) != None: # we have Bleak installed
+# CHECK TO SEE IF WE'RE USING THE SIMULATED LIGHT BACKEND (--simulate) INSTEAD OF BLUETOOTH
+simParser = argparse.ArgumentParser(add_help=False) # only look for the simulator options here, the rest of the options are parsed later
+simParser.add_argument("--simulate", nargs="?", const="", default=None) # a number of lights, or a list of light names (name:protocol,name:protocol)
+simParser.add_argument("--sim_latency", type=float, default=0.01) # how long (in seconds) one acknowledged write takes on a simulated light
+simParser.add_argument("--sim_loss", type=float, default=0.0) # the chance (0.0-1.0) of a write or connection attempt being lost
+simParser.add_argument("--sim_log", default=None) # a file to log every frame the simulated lights apply to (used by neewer_benchmark.py)
+simArgs = simParser.parse_known_args()[0]
+
+if simArgs.simulate != None: # we're using simulated lights, so we don't need Bleak
+    print("Using SIMULATED Neewer lights (--simulate) - bleak isn't needed, and no Bluetooth devices will be used!")
+elif (ilu.find_spec("bleak")) != None: # we have Bleak installed
     # IMPORT BLEAK (this is the library that allows the program to communicate with the lights) - THIS IS NECESSARY!
     try:
         from bleak import BleakScanner, BleakClient
@@ -69,13 +88,13 @@ if (ilu.find_spec("PySide6")) != None: # if PySide6 is available, try to import
     try:
         from PySide6.QtCore import QItemSelectionModel
         from PySide6.QtGui import QKeySequence, QShortcut
-        from PySide6.QtWidgets import QApplication, QMainWindow, QTableWidgetItem, QMessageBox
+        from PySide6.QtWidgets import QApplication, QMainWindow, QMessageBox
 
-        from PySide6.QtCore import QRect, Signal, Qt
+        from PySide6.QtCore import QRect, Signal, Qt, QAbstractTableModel, QModelIndex, QTimer
         from PySide6.QtGui import QFont, QGradient, QLinearGradient, QColor
-        from PySide6.QtWidgets import QFormLayout, QGridLayout, QKeySequenceEdit, QWidget, QPushButton, QTableWidget, \
-             QTableWidgetItem, QAbstractScrollArea, QAbstractItemView, QTabWidget, QGraphicsScene, QGraphicsView, QFrame, \
-             QSlider, QLabel, QLineEdit, QCheckBox, QStatusBar, QScrollArea, QTextEdit, QComboBox
+        from PySide6.QtWidgets import QFormLayout, QGridLayout, QKeySequenceEdit, QWidget, QPushButton, QTableView, \
+             QAbstractScrollArea, QAbstractItemView, QTabWidget, QGraphicsScene, QGraphicsView, QFrame, \
+             QSlider, QLabel, QLineEdit, QCheckBox, QStatusBar, QScrollArea, QTextEdit, QComboBox, QInputDialog
 
         print(f'PySide6 is installed (skipping the PySide2 check!)  Version: {ilm.version("PySide6")}')
         PySideGUI = "PySide6"
@@ -93,11 +112,11 @@ if importError == 1:
             from PySide2.QtGui import QKeySequence
             from PySide2.QtWidgets import QApplication, QMainWindow, QShortcut, QMessageBox
 
-            from PySide2.QtCore import QRect, Signal, Qt
+            from PySide2.QtCore import QRect, Signal, Qt, QAbstractTableModel, QModelIndex, QTimer
             from PySide2.QtGui import QFont, QLinearGradient, QColor
-            from PySide2.QtWidgets import QFormLayout, QGridLayout, QKeySequenceEdit, QWidget, QPushButton, QTableWidget, \
-                 QTableWidgetItem, QAbstractScrollArea, QAbstractItemView, QTabWidget, QGraphicsScene, QGraphicsView, QFrame, \
-                 QSlider, QLabel, QLineEdit, QCheckBox, QStatusBar, QScrollArea, QTextEdit, QComboBox
+            from PySide2.QtWidgets import QFormLayout, QGridLayout, QKeySequenceEdit, QWidget, QPushButton, QTableView, \
+                 QAbstractScrollArea, QAbstractItemView, QTabWidget, QGraphicsScene, QGraphicsView, QFrame, \
+                 QSlider, QLabel, QLineEdit, QCheckBox, QStatusBar, QScrollArea, QTextEdit, QComboBox, QInputDialog
 
             print(f'PySide2 is installed!  Version: {ilm.version("PySide2")}')
             importError = 0
@@ -127,29 +146,27 @@ if importError == 1:
 
 print("---------------------------------------------------------")
 
-# IMPORT THE HTTP SERVER
-try:
-    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
-    import urllib.parse # parsing custom light names in the HTTP server
-except Exception as e:
-    pass # if there are any HTTP errors, don't do anything yet
+# IMPORT THE HTTP SERVER HELPERS (THE SERVER ITSELF RUNS ON asyncioEventLoop)
+import urllib.parse # parsing the doAction URL and custom light names in the HTTP server
+from html import escape as escapeHTML # light names in the HTTP server's pages
 
 CCTSlider = -1 # the current slider moved in the CCT window - 1 - Brightness / 2 - Hue / -1 - Both Brightness and Hue
 sendValue = [120, 135, 2, 50, 56, 50] # an array to hold the values to be sent to the light
 lastSelection = [] # the current light selection (this is for snapshot preset entering/leaving buttons)
 lastSortingField = -1 # the last field used for sorting purposes
-
-availableLights = [] # the list of Neewer lights currently available to control
-# List Subitems (for ^^^^^^):
-# [0] - UpdatedBLEInformation object (replaces Bleak object, but retains information) Object (can use .name / .realname / .address / .rssi / .HWMACaddr to get specifics)
-# [1] - Bleak Connection (the actual Bluetooth connection to the light itself)
-# [2] - Custom Name for Light (string)
-# [3] - Last Used Parameters (list)
-# [4] - The range of color temperatures to use in CCT mode (list, min, max) <- changed in 0.12
-# [5] - Whether or not to send Brightness and Hue independently for old lights (boolean)
-# [6] - Whether or not this light has been manually turned ON/OFF (boolean)
-# [7] - The Power and Channel data returned for this light (list)
-# [8] - Whether or not this light uses the new Infinity light protocol (int - 0: no, 1: yes, 2: protocol, but not Infinity light)
+lastSortReversed = False # whether the last sort was in reverse order
+
+availableLights = [] # the list of Neewer lights currently available to control (lightRecord objects, kept in order by the light registry)
+# List Subitems (for ^^^^^^) - each position is also a named field of lightRecord (in brackets):
+# [0] (info) - UpdatedBLEInformation object (keeps Bleak's BLEDevice in .device, along with the information Bleak doesn't) Object (can use .name / .realname / .address / .rssi / .HWMACaddr / .device to get specifics)
+# [1] (client) - Bleak Connection (the actual Bluetooth connection to the light itself)
+# [2] (customName) - Custom Name for Light (string)
+# [3] (lastParams) - Last Used Parameters (list)
+# [4] (cctRange) - The range of color temperatures to use in CCT mode (list, min, max) <- changed in 0.12
+# [5] (cctOnly) - Whether or not to send Brightness and Hue independently for old lights (boolean)
+# [6] (isOn) - Whether or not this light is ON (boolean) - from the last power command or settings sent to it, or the light's own power status reply, whichever is newer
+# [7] (powerChannel) - The Power and Channel data returned for this light (list)
+# [8] (infinityMode) - Whether or not this light uses the new Infinity light protocol (int - 0: no, 1: yes, 2: protocol, but not Infinity light)
 
 # Light Preset ***Default*** Settings (for sections below):
 # NOTE: The list is 0-based, so the preset itself is +1 from the subitem
@@ -176,15 +193,11 @@ defaultLightPresets = [
 
 customLightPresets = defaultLightPresets[:] # copy the default presets to the list for the current session's presets
 
-threadAction = "" # the current action to take from the thread
-serverBusy = [False, ""] # whether or not the HTTP server is busy
 asyncioEventLoop = None # the current asyncio loop
 
 setLightUUID = "69400002-B5A3-F393-E0A9-E50E24DCCA99" # the UUID to send information to the light
 notifyLightUUID = "69400003-B5A3-F393-E0A9-E50E24DCCA99" # the UUID for notify callbacks from the light
 
-receivedData = "" # the data received from the Notify characteristic
-
 # SET FROM THE PREFERENCES FILE ON LAUNCH
 findLightsOnStartup = True # whether or not to look for lights when the program starts
 autoConnectToLights = True # whether or not to auto-connect to lights after finding them
@@ -199,12 +212,70 @@ enableTabsOnLaunch = False # whether or not to enable tabs on startup (even with
 
 lockFile = tempfile.gettempdir() + os.sep + "NeewerLite-Python.lock"
 anotherInstance = False # whether or not we're using a new instance (for the Singleton check)
+ownsLockFile = False # whether or not this instance made the lockfile (so --force_instance never deletes another instance's lockfile)
 globalPrefsFile = os.path.dirname(os.path.abspath(sys.argv[0])) + os.sep + "light_prefs" + os.sep + "NeewerLite-Python.prefs" # the global preferences file for saving/loading
 customLightPresetsFile = os.path.dirname(os.path.abspath(sys.argv[0])) + os.sep + "light_prefs" + os.sep + "customLights.prefs"
 
+# PRINT A DEBUG STRING TO THE CONSOLE, ALONG WITH THE CURRENT TIME
+def printDebugString(theString):
+    if printDebug == True:
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] - {theString}")
+
+# THE DEFAULT SETTINGS FOR A LIGHT - [CUSTOM NAME, CCT RANGE, CCT-ONLY] (OR JUST THE CCT RANGE WITH "temp")
+# [MODEL NAME, MINIMUM CCT, MAXIMUM CCT, CCT-ONLY] - the first section are bi-color lights (CCT only), the rest can do HSI and animations too
+masterNeewerLightList = [
+    ["GL1", 2900, 7000, True], ["NL140", 3200, 5600, True], ["SNL1320", 3200, 5600, True], ["SNL1920", 3200, 5600, True],
+    ["SNL480", 3200, 5600, True], ["SNL530", 3200, 5600, True], ["SNL660", 3200, 5600, True], ["SNL960", 3200, 5600, True],
+    ["SRP16", 3200, 5600, True], ["SRP18", 3200, 5600, True], ["WRP18", 3200, 5600, True], ["ZRP16", 3200, 5600, True],
+    ["BH30S", 2500, 10000, False], ["CB60", 2500, 6500, False], ["CL124", 2500, 10000, False], ["RGB C80", 2500, 10000, False],
+    ["RGB CB60", 2500, 10000, False], ["RGB1000", 2500, 10000, False], ["RGB1200", 2500, 10000, False], ["RGB140", 2500, 10000, False],
+    ["RGB168", 2500, 8500, False], ["RGB176 A1", 2500, 10000, False], ["RGB512", 2500, 10000, False], ["RGB800", 2500, 10000, False],
+    ["SL-90", 2500, 10000, False],
+    ["RGB1", 3200, 5600, False], ["RGB176", 3200, 5600, False], ["RGB18", 3200, 5600, False], ["RGB190", 3200, 5600, False],
+    ["RGB450", 3200, 5600, False], ["RGB480", 3200, 5600, False], ["RGB530 PRO", 3200, 5600, False], ["RGB530", 3200, 5600, False],
+    ["RGB650", 3200, 5600, False], ["RGB660 PRO", 3200, 5600, False], ["RGB660", 3200, 5600, False], ["RGB960", 3200, 5600, False],
+    ["RGB-P200", 3200, 5600, False], ["RGB-P280", 3200, 5600, False], ["SL-70", 3200, 8500, False], ["SL-80", 3200, 8500, False],
+    ["ZK-RY", 3200, 5600, False]
+]
+
+def normalizeModelName(modelName): # "NEEWER-RGB660 PRO" and "RGB660PRO" both become "RGB660PRO" (lights don't always advertise the same spacing)
+    modelName = modelName.upper()
+
+    if modelName.startswith("NEEWER-"):
+        modelName = modelName[7:]
+
+    return modelName.replace(" ", "").replace("-", "")
+
+# CHECK THE LONGEST MODEL NAMES FIRST, SO "RGB660 PRO" ISN'T MISTAKEN FOR "RGB660" (OR "RGB1000" FOR "RGB1")
+lightModelLookup = sorted([[normalizeModelName(light[0]), [light[1], light[2]], light[3]] for light in masterNeewerLightList], key=lambda light: len(light[0]), reverse=True)
+
+def getLightSpecs(lightName, returnParam = "all"):
+    defaultSettings = ["", [3200, 5600], False] # (for lights that aren't in masterNeewerLightList)
+    modelName = normalizeModelName(lightName if lightName != None else "")
+
+    for lightModel, cctRange, cctOnly in lightModelLookup:
+        if lightModel in modelName:
+            defaultSettings = ["", list(cctRange), cctOnly] # (a new list every time, as the light's record changes its range in place)
+            break
+
+    if returnParam == "temp":
+        return defaultSettings[1]
+    else:
+        return defaultSettings
+
+# WRITE A PREFERENCES FILE (ONE ENTRY PER LINE) TO A TEMPORARY FILE FIRST, THEN SWAP IT IN ALL AT ONCE, SO A CRASH NEVER LEAVES A HALF-WRITTEN FILE
+def atomicWriteFile(fileName, fileLines):
+    os.makedirs(os.path.dirname(fileName), exist_ok=True)
+    tempFile = fileName + ".tmp"
+
+    with open(tempFile, mode="w", encoding="utf-8") as theFile:
+        theFile.write("\n".join(fileLines) + ("\n" if len(fileLines) > 0 else ""))
+
+    os.replace(tempFile, fileName)
+
 # FILE LOCKING FOR SINGLE INSTANCE
 def singleInstanceLock():
-    global anotherInstance
+    global anotherInstance, ownsLockFile
 
     if os.path.exists(lockFile): # the lockfile exists, so we have another instance running
         anotherInstance = True
@@ -214,14 +285,20 @@ def singleInstanceLock():
 
             with os.fdopen(lf, 'w') as lockfile:
                 lockfile.write(str(os.getpid())) # write the PID of the current running process to the temporary lockfile
+
+            ownsLockFile = True
         except IOError: # if we had an error acquiring the file descriptor, the file most likely already exists.
             anotherInstance = True
     
 def singleInstanceUnlockandQuit(exitCode):
-    try:
-        os.remove(lockFile) # try to delete the lockfile on exit
-    except FileNotFoundError: # if another process deleted it, then just error out
-        printDebugString("Lockfile not found in temp directory, so we're going to skip deleting it!")
+    flushLightPrefs() # write out any light preferences still waiting to be saved
+    savePresetBank() # and any changes to the preset buttons that haven't made it into the preset library yet
+
+    if ownsLockFile == True:
+        try:
+            os.remove(lockFile) # try to delete the lockfile on exit
+        except FileNotFoundError: # if another process deleted it, then just error out
+            printDebugString("Lockfile not found in temp directory, so we're going to skip deleting it!")
 
     sys.exit(exitCode) # quit out, with the specified exitCode
 
@@ -274,6 +351,10 @@ if PySideGUI != None: # create the GUI if the PySide GUI classes are imported
             self.turnOnButton.setGeometry(QRect(165, 4, 150, 22))
             self.turnOnButton.setText("Turn Light(s) On")
 
+            self.groupChooser = QComboBox(self.centralwidget)
+            self.groupChooser.setGeometry(QRect(320, 4, 91, 22))
+            self.groupChooser.setToolTip("Select (and send the current settings to) a named group of lights")
+
             self.scanCommandButton = QPushButton(self.centralwidget)
             self.scanCommandButton.setGeometry(QRect(416, 4, 81, 22))
             self.scanCommandButton.setText("Scan")
@@ -287,30 +368,15 @@ if PySideGUI != None: # create the GUI if the PySide GUI classes are imported
             self.tryConnectButton.setEnabled(False)
 
             # ============ THE LIGHT TABLE ============
-            self.lightTable = QTableWidget(self.centralwidget)
+            self.lightTable = QTableView(self.centralwidget)
+            self.lightTableModel = lightTableModel() # the table's rows come straight from the light registry
+            self.lightTable.setModel(self.lightTableModel)
 
-            self.lightTable.setColumnCount(4)
             self.lightTable.setColumnWidth(0, 120)
             self.lightTable.setColumnWidth(1, 150)
             self.lightTable.setColumnWidth(2, 94)
             self.lightTable.setColumnWidth(3, 190)
 
-            __QT0 = QTableWidgetItem()
-            __QT0.setText("Light Name")
-            self.lightTable.setHorizontalHeaderItem(0, __QT0)
-
-            __QT1 = QTableWidgetItem()
-            __QT1.setText("MAC Address")
-            self.lightTable.setHorizontalHeaderItem(1, __QT1)
-
-            __QT2 = QTableWidgetItem()
-            __QT2.setText("Linked")
-            self.lightTable.setHorizontalHeaderItem(2, __QT2)
-
-            __QT3 = QTableWidgetItem()
-            __QT3.setText("Status")
-            self.lightTable.setHorizontalHeaderItem(3, __QT3)
-
             self.lightTable.setGeometry(QRect(10, 32, 571, 261))
             self.lightTable.setSizeAdjustPolicy(QAbstractScrollArea.AdjustToContents)
             self.lightTable.setEditTriggers(QAbstractItemView.NoEditTriggers)
@@ -321,7 +387,7 @@ if PySideGUI != None: # create the GUI if the PySide GUI classes are imported
             # ============ THE CUSTOM PRESET BUTTONS ============
 
             self.customPresetButtonsCW = QWidget(self.centralwidget)
-            self.customPresetButtonsCW.setGeometry(QRect(10, 300, 571, 68))
+            self.customPresetButtonsCW.setGeometry(QRect(10, 300, 541, 68))
             self.customPresetButtonsLay = QGridLayout(self.customPresetButtonsCW)
             self.customPresetButtonsLay.setContentsMargins(0, 0, 0, 0) # ensure this widget spans from the left to the right edge of the light table
 
@@ -342,6 +408,16 @@ if PySideGUI != None: # create the GUI if the PySide GUI classes are imported
             self.customPreset_7_Button = customPresetButton(self.centralwidget, text="<strong><font size=+2>8</font></strong><br>PRESET<br>GLOBAL")
             self.customPresetButtonsLay.addWidget(self.customPreset_7_Button, 1, 8)
 
+            # the buttons to flip between banks of 8 presets in the preset library
+            self.presetBankUpButton = QPushButton(self.centralwidget)
+            self.presetBankUpButton.setGeometry(QRect(553, 304, 28, 29))
+            self.presetBankUpButton.setText("▲")
+            self.presetBankUpButton.setToolTip("Show the previous 8 presets")
+            self.presetBankDownButton = QPushButton(self.centralwidget)
+            self.presetBankDownButton.setGeometry(QRect(553, 336, 28, 29))
+            self.presetBankDownButton.setText("▼")
+            self.presetBankDownButton.setToolTip("Show the next 8 presets (Ctrl+P recalls any preset by its number or name)")
+
             # ============ THE MODE TABS ============
             self.ColorModeTabWidget = QTabWidget(self.centralwidget)
             self.ColorModeTabWidget.setGeometry(QRect(10, 385, 571, 254))
@@ -617,6 +693,82 @@ if PySideGUI != None: # create the GUI if the PySide GUI classes are imported
     # = CUSTOM GUI CLASSES
     # =======================================================
 
+    class lightTableModel(QAbstractTableModel): # the light table, read straight from availableLights instead of copying text into table items
+        def __init__(self):
+            super(lightTableModel, self).__init__()
+
+            self.headers = ["Light Name", "MAC Address", "Linked", "Status"]
+            self.numOfRows = 0 # the number of lights the table knows about (availableLights can grow on the BLE thread before the table is told)
+            self.cellText = {} # the "Linked" and "Status" text for each light (keyed by MAC address/GUID)
+            self.changedRows = set() # the rows changed since the last time the table was told to redraw
+            self.changedColumns = set()
+
+            # TELL THE TABLE ABOUT CHANGES AT MOST ~30 TIMES A SECOND, NO MATTER HOW MANY COME IN
+            self.flushTimer = QTimer()
+            self.flushTimer.setSingleShot(True)
+            self.flushTimer.setInterval(33)
+            self.flushTimer.timeout.connect(self.flushChanges)
+
+        def rowCount(self, parent = QModelIndex()):
+            return 0 if parent.isValid() else self.numOfRows
+
+        def columnCount(self, parent = QModelIndex()):
+            return 0 if parent.isValid() else len(self.headers)
+
+        def data(self, index, role = Qt.DisplayRole):
+            if role != Qt.DisplayRole or not index.isValid() or index.row() >= len(availableLights):
+                return None
+
+            return self.cellValue(index.row(), index.column())
+
+        def headerData(self, section, orientation, role = Qt.DisplayRole):
+            if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+                return self.headers[section]
+            else:
+                return super(lightTableModel, self).headerData(section, orientation, role)
+
+        def setHeaderText(self, column, text):
+            self.headers[column] = text
+            self.headerDataChanged.emit(Qt.Horizontal, column, column)
+
+        def cellValue(self, row, column):
+            if column == 0: # the name of the light
+                return lightNameText(row)
+            elif column == 1: # the MAC address of the light
+                return availableLights[row][0].address
+            else: # the Linked status and status message of the light
+                return self.cellText.get(availableLights[row][0].address, ["", ""])[column - 2]
+
+        def setCellText(self, row, column, text):
+            cellText = self.cellText.setdefault(availableLights[row][0].address, ["", ""])
+
+            if cellText[column - 2] != text:
+                cellText[column - 2] = text
+                self.markChanged(row, column)
+
+        def addRows(self, numOfRows): # show the next light(s) in availableLights in the table
+            self.beginInsertRows(QModelIndex(), self.numOfRows, self.numOfRows + numOfRows - 1)
+            self.numOfRows += numOfRows
+            self.endInsertRows()
+
+        def markChanged(self, row, column):
+            self.changedRows.add(row)
+            self.changedColumns.add(column)
+
+            if not self.flushTimer.isActive():
+                self.flushTimer.start()
+
+        def flushChanges(self): # send one dataChanged covering everything that changed since the last one
+            if len(self.changedRows) > 0:
+                firstRow = min(self.changedRows)
+                lastRow = min(max(self.changedRows), self.numOfRows - 1)
+
+                if firstRow <= lastRow:
+                    self.dataChanged.emit(self.index(firstRow, min(self.changedColumns)), self.index(lastRow, max(self.changedColumns)))
+
+            self.changedRows.clear()
+            self.changedColumns.clear()
+
     class parameterWidget(QWidget):
         valueChanged = Signal(int) # return the value that's been changed
 
@@ -1067,6 +1219,10 @@ if PySideGUI != None: # create the GUI if the PySide GUI classes are imported
 
     try: # try to load the GUI
         class MainWindow(QMainWindow, Ui_MainWindow):
+            linkStateChanged = Signal(str, str) # (address, new state) - sent by the connection manager from the BLE thread
+            lightFound = Signal(int, bool) # (index in availableLights, whether or not it's a new light) - sent while scanning
+            configReloaded = Signal() # sent by the preferences file watcher after it applies changed settings
+
             def __init__(self):
                 QMainWindow.__init__(self)
                 self.setupUi(self) # set up the main UI
@@ -1085,7 +1241,10 @@ if PySideGUI != None: # create the GUI if the PySide GUI classes are imported
                     self.statusBar.showMessage("Welcome to NeewerLite-Python!  Hit the Scan button above to scan for lights.")
 
                 if platform.system() == "Darwin": # if we're on MacOS, then change the column text for the 2nd column in the light table
-                    self.lightTable.horizontalHeaderItem(1).setText("Light UUID")
+                    self.lightTableModel.setHeaderText(1, "Light UUID")
+
+                loadPresetBank(0, False) # the preset buttons show the first 8 presets in the preset library
+                self.showPresetNames()
 
                 # IF ANY OF THE CUSTOM PRESETS ARE ACTUALLY CUSTOM, THEN MARK THOSE BUTTONS AS CUSTOM
                 if customLightPresets[0] != defaultLightPresets[0]:
@@ -1139,48 +1298,67 @@ if PySideGUI != None: # create the GUI if the PySide GUI classes are imported
                 self.tryConnectButton.clicked.connect(self.startConnect)
 
                 self.ColorModeTabWidget.currentChanged.connect(self.tabChanged)
-                self.lightTable.itemSelectionChanged.connect(self.selectionChanged)
+                self.lightTable.selectionModel().selectionChanged.connect(lambda: self.selectionChanged())
                 self.effectChooser.currentIndexChanged.connect(self.effectChanged)
+                self.groupChooser.activated.connect(self.groupChosen)
+                self.updateGroupChooser()
 
                 # Allow clicking on the headers for sorting purposes
                 horizHeaders = self.lightTable.horizontalHeader()
                 horizHeaders.setSectionsClickable(True)
                 horizHeaders.sectionClicked.connect(self.sortByHeader)
 
+                # Update the "Linked" column whenever the connection manager changes a light's state
+                self.linkStateChanged.connect(self.updateLinkedColumn)
+                connectionManager.addStateListener(self.linkStateChanged.emit)
+
+                # Pick up keyboard shortcut and preference changes made to the preferences file while we're running
+                self.configReloaded.connect(self.applyReloadedConfig)
+                configListeners.append(lambda oldConfig, newConfig, changedSettings: self.configReloaded.emit())
+
+                # Add (or update) lights in the table as soon as they're found while scanning
+                self.lightFound.connect(self.showFoundLight)
+                lightDiscoveryListeners.append(self.lightFound.emit)
+
                 # COMMENTS ARE THE SAME THE ENTIRE WAY DOWN THIS CHAIN
-                self.customPreset_0_Button.clicked.connect(lambda: recallCustomPreset(0)) # when you click a preset
+                self.customPreset_0_Button.clicked.connect(lambda: self.recallPresetButton(0)) # when you click a preset
                 self.customPreset_0_Button.rightclicked.connect(lambda: self.saveCustomPresetDialog(0)) # when you right-click a preset
                 self.customPreset_0_Button.enteredWidget.connect(lambda: self.highlightLightsForSnapshotPreset(0)) # when the mouse enters the widget
                 self.customPreset_0_Button.leftWidget.connect(lambda: self.highlightLightsForSnapshotPreset(0, True)) # when the mouse leaves the widget
-                self.customPreset_1_Button.clicked.connect(lambda: recallCustomPreset(1))
+                self.customPreset_1_Button.clicked.connect(lambda: self.recallPresetButton(1))
                 self.customPreset_1_Button.rightclicked.connect(lambda: self.saveCustomPresetDialog(1))
                 self.customPreset_1_Button.enteredWidget.connect(lambda: self.highlightLightsForSnapshotPreset(1))
                 self.customPreset_1_Button.leftWidget.connect(lambda: self.highlightLightsForSnapshotPreset(1, True))
-                self.customPreset_2_Button.clicked.connect(lambda: recallCustomPreset(2))
+                self.customPreset_2_Button.clicked.connect(lambda: self.recallPresetButton(2))
                 self.customPreset_2_Button.rightclicked.connect(lambda: self.saveCustomPresetDialog(2))
                 self.customPreset_2_Button.enteredWidget.connect(lambda: self.highlightLightsForSnapshotPreset(2))
                 self.customPreset_2_Button.leftWidget.connect(lambda: self.highlightLightsForSnapshotPreset(2, True))
-                self.customPreset_3_Button.clicked.connect(lambda: recallCustomPreset(3))
+                self.customPreset_3_Button.clicked.connect(lambda: self.recallPresetButton(3))
                 self.customPreset_3_Button.rightclicked.connect(lambda: self.saveCustomPresetDialog(3))
                 self.customPreset_3_Button.enteredWidget.connect(lambda: self.highlightLightsForSnapshotPreset(3))
                 self.customPreset_3_Button.leftWidget.connect(lambda: self.highlightLightsForSnapshotPreset(3, True))
-                self.customPreset_4_Button.clicked.connect(lambda: recallCustomPreset(4))
+                self.customPreset_4_Button.clicked.connect(lambda: self.recallPresetButton(4))
                 self.customPreset_4_Button.rightclicked.connect(lambda: self.saveCustomPresetDialog(4))
                 self.customPreset_4_Button.enteredWidget.connect(lambda: self.highlightLightsForSnapshotPreset(4))
                 self.customPreset_4_Button.leftWidget.connect(lambda: self.highlightLightsForSnapshotPreset(4, True))
-                self.customPreset_5_Button.clicked.connect(lambda: recallCustomPreset(5))
+                self.customPreset_5_Button.clicked.connect(lambda: self.recallPresetButton(5))
                 self.customPreset_5_Button.rightclicked.connect(lambda: self.saveCustomPresetDialog(5))
                 self.customPreset_5_Button.enteredWidget.connect(lambda: self.highlightLightsForSnapshotPreset(5))
                 self.customPreset_5_Button.leftWidget.connect(lambda: self.highlightLightsForSnapshotPreset(5, True))
-                self.customPreset_6_Button.clicked.connect(lambda: recallCustomPreset(6))
+                self.customPreset_6_Button.clicked.connect(lambda: self.recallPresetButton(6))
                 self.customPreset_6_Button.rightclicked.connect(lambda: self.saveCustomPresetDialog(6))
                 self.customPreset_6_Button.enteredWidget.connect(lambda: self.highlightLightsForSnapshotPreset(6))
                 self.customPreset_6_Button.leftWidget.connect(lambda: self.highlightLightsForSnapshotPreset(6, True))
-                self.customPreset_7_Button.clicked.connect(lambda: recallCustomPreset(7))
+                self.customPreset_7_Button.clicked.connect(lambda: self.recallPresetButton(7))
                 self.customPreset_7_Button.rightclicked.connect(lambda: self.saveCustomPresetDialog(7))
                 self.customPreset_7_Button.enteredWidget.connect(lambda: self.highlightLightsForSnapshotPreset(7))
                 self.customPreset_7_Button.leftWidget.connect(lambda: self.highlightLightsForSnapshotPreset(7, True))
 
+                self.presetBankUpButton.clicked.connect(lambda: self.changePresetBank(-1))
+                self.presetBankDownButton.clicked.connect(lambda: self.changePresetBank(1))
+                self.SC_recallPresetByName = QShortcut(QKeySequence("Ctrl+P"), self) # recall any preset in the library by its number or name
+                self.SC_recallPresetByName.activated.connect(self.recallPresetByName)
+
                 # Connect the sliders to the computation function
                 self.colorTempSlider.valueChanged.connect(lambda: self.computeValues())
                 self.brightSlider.valueChanged.connect(lambda: self.computeValues())
@@ -1294,21 +1472,11 @@ if PySideGUI != None: # create the GUI if the PySide GUI classes are imported
                 self.SC_Num9.activated.connect(lambda: self.numberShortcuts(9))
 
             def sortByHeader(self, theHeader):
-                global availableLights
-                global lastSortingField
+                global lastSortingField, lastSortReversed
 
                 if theHeader < 2: # if we didn't click on the "Linked" or "Status" headers, start processing the sort
-                    sortingList = [] # a copy of the availableLights array
-                    checkForCustomNames = False # whether or not to ask to sort by custom names (if there aren't any custom names, then don't allow)
-
-                    for a in range(len(availableLights)): # copy the entire availableLights array into a temporary array to process it
-                        if theHeader == 0 and availableLights[a][2] != "": # if the current light has a custom name (and we clicked on Name)
-                            checkForCustomNames = True # then we need to ask what kind of sorting when we sort
-
-                        sortingList.append([availableLights[a][0], availableLights[a][1], availableLights[a][2], availableLights[a][3], \
-                                            availableLights[a][4], availableLights[a][5], availableLights[a][6], availableLights[a][7], \
-                                            availableLights[a][0].name, availableLights[a][0].address, availableLights[a][0].rssi, \
-                                            availableLights[a][8]])
+                    # whether or not to ask to sort by custom names (if there aren't any custom names, then don't allow)
+                    checkForCustomNames = (theHeader == 0 and registry.hasCustomNames())
                 else: # we clicked on the "Linked" or "Status" headers, which do not allow sorting
                     sortingField = -1
 
@@ -1367,15 +1535,8 @@ if PySideGUI != None: # create the GUI if the PySide GUI classes are imported
                             else:
                                 doReverseSort = True
 
-                    sortedList = sorted(sortingList, key = lambda x: x[sortingField], reverse = doReverseSort) # sort the list
-                    availableLights.clear() # clear the list of available lights
-
-                    for a in range(len(sortedList)): # rebuild the available lights list from the sorted list
-                        availableLights.append([sortedList[a][0], sortedList[a][1], sortedList[a][2], sortedList[a][3], \
-                                                sortedList[a][4], sortedList[a][5], sortedList[a][6], sortedList[a][7], \
-                                                sortedList[a][11]])
-                                            
-                    self.updateLights(False) # redraw the table with the new light list
+                    lastSortReversed = doReverseSort
+                    self.showSortedRows(sortingField, doReverseSort) # only the table's rows move - availableLights stays in the same order
                     lastSortingField = sortingField # keep track of the last field used for sorting, so we know whether or not to switch to ascending
                 else:
                     self.lightTable.horizontalHeader().setSortIndicatorShown(False) # hide the sorting indicator
@@ -1535,13 +1696,8 @@ if PySideGUI != None: # create the GUI if the PySide GUI classes are imported
                             availableLights[selectedRows[0]][2] = "" # clear the old custom name if we've turned this off
                             changedPrefs += 1 # add one to the preferences changed counter
 
-                    # IF A CUSTOM NAME IS SET UP FOR THIS LIGHT, THEN CHANGE THE TABLE TO REFLECT THAT
-                    if availableLights[selectedRows[0]][2] != "":
-                        self.setTheTable([availableLights[selectedRows[0]][2] + " (" + availableLights[selectedRows[0]][0].name + ")" "\n  [ʀssɪ: " + str(availableLights[selectedRows[0]][0].rssi) + " dBm]",
-                                        "", "", ""], selectedRows[0])
-                    else: # if there is no custom name, then reset the table to show that
-                        self.setTheTable([availableLights[selectedRows[0]][0].name + "\n  [ʀssɪ: " + str(availableLights[selectedRows[0]][0].rssi) + " dBm]",
-                                        "", "", ""], selectedRows[0])
+                    # IF A CUSTOM NAME IS SET UP FOR THIS LIGHT, THEN CHANGE THE TABLE TO REFLECT THAT (OR RESET IT IF THERE ISN'T ONE)
+                    self.setTheTable([lightNameText(selectedRows[0]), "", "", ""], selectedRows[0])
 
                     if self.colorTempRange.isChecked(): # if we've asked to save a custom temperature range for this light
                         if availableLights[selectedRows[0]][4] != newRange: # change the range in the available lights table if they are different
@@ -1801,10 +1957,21 @@ if PySideGUI != None: # create the GUI if the PySide GUI classes are imported
                 # CARRY "HIDDEN" DEBUGGING OPTIONS TO PREFERENCES FILE
                 if enableTabsOnLaunch == True:
                     finalPrefs.append("enableTabsOnLaunch=1")
+
+                if maxConcurrentWrites != 8: # the default is writing to 8 lights at the same time
+                    finalPrefs.append("maxConcurrentWrites=" + str(maxConcurrentWrites))
+
+                if useFastWrites == False: # fast (unacknowledged) writes are usually on, so only add on false
+                    finalPrefs.append("useFastWrites=0")
+
+                if maxConcurrentLinks != 3: # the default is linking to 3 lights at the same time
+                    finalPrefs.append("maxConcurrentLinks=" + str(maxConcurrentLinks))
+
+                if writeSuppressionTTL != 10: # the default is trusting a light to hold the last frame for 10 seconds
+                    finalPrefs.append("writeSuppressionTTL=" + str(writeSuppressionTTL))
                 
                 if len(finalPrefs) > 0: # if we actually have preferences to save...
-                    with open(globalPrefsFile, mode="w", encoding="utf-8") as prefsFileToWrite:
-                        prefsFileToWrite.write(("\n").join(finalPrefs)) # then write them to the prefs file
+                    atomicWriteFile(globalPrefsFile, finalPrefs) # then write them to the prefs file (so the config watcher never reads half a file)
 
                     # PRINT THIS INFORMATION WHETHER DEBUG OUTPUT IS TURNED ON OR NOT
                     print(f"New global preferences saved in {globalPrefsFile} - here is the list:")
@@ -1972,32 +2139,3500 @@ if PySideGUI != None: # create the GUI if the PySide GUI classes are imported
                                                 "13 - CCT Loop", "14 - INT Loop (CCT)", "14 - INT Loop (HSI)",
                                                 "15 - TV Screen", "16 - Fireworks", "17 - Party"])
 
-            # ADD A LIGHT TO THE TABLE VIEW
+            # SHOW THE PREVIOUS/NEXT 8 PRESETS FROM THE PRESET LIBRARY ON THE PRESET BUTTONS
+            def changePresetBank(self, direction):
+                if currentPresetBank + direction >= 0:
+                    loadPresetBank(currentPresetBank + direction)
+
+                    for slot in range(presetBankSize):
+                        presetNum = (currentPresetBank * presetBankSize) + slot
+
+                        if customLightPresets[slot] == defaultLightPresets[slot]:
+                            getattr(self, f"customPreset_{slot}_Button").markCustom(presetNum, -1) # the default preset for this button
+                        elif customLightPresets[slot][0][0] == -1:
+                            getattr(self, f"customPreset_{slot}_Button").markCustom(presetNum) # a custom global preset
+                        else:
+                            getattr(self, f"customPreset_{slot}_Button").markCustom(presetNum, 1) # a snapshot preset
+
+                    self.showPresetNames()
+                    self.statusBar.showMessage(f"Showing presets {(currentPresetBank * presetBankSize) + 1} to {(currentPresetBank + 1) * presetBankSize}")
+
+            # SHOW EACH PRESET'S NAME (IF IT HAS ONE) WHEN HOVERING OVER ITS BUTTON
+            def showPresetNames(self):
+                for slot in range(presetBankSize):
+                    presetNum = (currentPresetBank * presetBankSize) + slot + 1
+                    storedPreset = library.getPreset(presetNum)
+
+                    if storedPreset != None and storedPreset[1] != None:
+                        getattr(self, f"customPreset_{slot}_Button").setToolTip(f"Preset {presetNum} - {storedPreset[1]}")
+                    else:
+                        getattr(self, f"customPreset_{slot}_Button").setToolTip(f"Preset {presetNum}")
+
+            # RECALL ANY PRESET IN THE PRESET LIBRARY BY ITS NUMBER OR NAME
+            def recallPresetByName(self):
+                presetKey, clickedOK = QInputDialog.getText(self, "Recall a Preset", "Number or name of the preset to recall:")
+
+                if clickedOK == False or presetKey.strip() == "":
+                    return
+
+                foundPreset = library.getPreset(presetKey)
+
+                if foundPreset == None:
+                    self.statusBar.showMessage(f"There isn't a preset called \"{presetKey.strip()}\" in the preset library")
+                    return
+
+                selectedRows = self.selectedLights()
+
+                if foundPreset[2][0][0] == -1 and len(selectedRows) == 0:
+                    self.statusBar.showMessage("Select the light(s) to send this preset to first!")
+                    return
+
+                recallLibraryPreset(foundPreset[0], selectedRows)
+                self.statusBar.showMessage(f"Recalled preset {foundPreset[0]}" + (f" ({foundPreset[1]})" if foundPreset[1] != None else ""))
+
+            # RETURN THE LIGHTS (INDEXES INTO availableLights) SELECTED IN THE TABLE - AND WITH returnInfinity, THE HIGHEST INFINITY MODE AMONG THEM
+            def selectedLights(self, returnInfinity = False):
+                selectionList = [selectedRow.row() for selectedRow in self.lightTable.selectionModel().selectedRows() if selectedRow.row() < len(availableLights)]
+
+                if returnInfinity == True:
+                    return [selectionList, max([availableLights[lightIdx][8] for lightIdx in selectionList], default=0)]
+                else:
+                    return selectionList
+
+            # SEND THE SETTINGS ON THE CURRENT TAB TO THE SELECTED LIGHTS - THROUGH THE WRITE QUEUE, SO DRAGGING A SLIDER ONLY SENDS THE NEWEST SETTINGS
+            def computeValues(self):
+                global sendValue
+
+                if self.currentSendValue() == None: # one of the preferences tabs is showing, so there's nothing to send
+                    return
+
+                sendValue = self.currentSendValue()
+                selectedRows = self.selectedLights()
+
+                if len(selectedRows) > 0:
+                    queueLightWrite(selectedRows, sendValue)
+                else:
+                    self.statusBar.showMessage("Select the light(s) to send these settings to first!")
+
+            def effectChanged(self, effectIndex):
+                if effectIndex >= 0 and self.ColorModeTabWidget.currentIndex() == 2: # (the list is cleared and re-filled when switching effect lists)
+                    self.computeValues()
+
+            def turnLightOn(self):
+                queueLightWrite(self.selectedLights(), [120, 129, 1, 1])
+
+            def turnLightOff(self):
+                queueLightWrite(self.selectedLights(), [120, 129, 1, 2])
+
+            # SCAN FOR LIGHTS - EACH ONE IS ADDED TO THE TABLE (THROUGH showFoundLight) AS SOON AS ITS ADVERTISEMENT COMES IN
+            def startSelfSearch(self):
+                startDiscovery()
+                self.statusBar.showMessage("Please wait - searching for Neewer lights...")
+
+            # LINK TO THE LIGHTS SELECTED IN THE TABLE - THE "LINKED" COLUMN IS UPDATED BY THE CONNECTION MANAGER AS EACH ONE LINKS
+            def startConnect(self):
+                selectedRows = self.selectedLights()
+
+                if len(selectedRows) > 0:
+                    startLinking(selectedRows)
+                    self.statusBar.showMessage(f"Linking to {len(selectedRows)} light(s)...")
+                else:
+                    self.statusBar.showMessage("Select the light(s) to link to first!")
+
+            # THE SEND VALUE FOR THE SETTINGS ON THE CURRENT TAB (CCT, HSI OR SCENE MODE) - OR NONE IF ONE OF THE PREFERENCES TABS IS SHOWING
+            def currentSendValue(self):
+                currentTab = self.ColorModeTabWidget.currentIndex()
+
+                if currentTab == 0: # CCT mode
+                    return [120, 135, 2, self.brightSlider.value(), self.colorTempSlider.value(), self.GMSlider.value()]
+                elif currentTab == 1: # HSI mode
+                    return [120, 134, 4, self.RGBSlider.value() & 255, self.RGBSlider.value() >> 8, self.colorSatSlider.value(), self.brightSlider.value()]
+                elif currentTab == 2: # scene mode
+                    return [120, 136, 2, self.brightSlider.value(), self.effectChooser.currentIndex() + 1]
+                else:
+                    return None
+
+            # CLICKING ON A PRESET BUTTON RECALLS IT - A GLOBAL PRESET GOES TO THE SELECTED LIGHTS, A SNAPSHOT PRESET TO THE LIGHTS IT WAS SAVED FROM
+            def recallPresetButton(self, numOfPreset):
+                selectedRows = self.selectedLights()
+
+                if customLightPresets[numOfPreset][0][0] == -1 and len(selectedRows) == 0:
+                    self.statusBar.showMessage("Select the light(s) to send this preset to first!")
+                    return
+
+                recallCustomPreset(numOfPreset, selectedRows)
+
+            # RIGHT-CLICKING ON A PRESET BUTTON SAVES THE CURRENT SETTINGS TO IT (OR, WITH ALT HELD DOWN, CLEARS IT BACK TO THE DEFAULT)
+            def saveCustomPresetDialog(self, numOfPreset):
+                presetNum = (currentPresetBank * presetBankSize) + numOfPreset
+
+                if (QApplication.keyboardModifiers() & Qt.AltModifier) == Qt.AltModifier:
+                    clearCustomPreset(numOfPreset)
+                    getattr(self, f"customPreset_{numOfPreset}_Button").markCustom(presetNum, -1)
+                    self.showPresetNames()
+                    self.statusBar.showMessage(f"Preset {presetNum + 1} is back to its default settings")
+                    return
+
+                saveDlg = QMessageBox(self)
+                saveDlg.setWindowTitle("Save a Custom Preset")
+                saveDlg.setTextFormat(Qt.TextFormat.RichText)
+                saveDlg.setText(f"Would you like to save a <em>Global</em> or <em>Snapshot</em> preset for preset {presetNum + 1}?<hr>" \
+                                "A <em>Global Preset</em> saves the settings on the current tab, and sends them to whichever lights are selected when it's recalled.<br><br>" \
+                                "A <em>Snapshot Preset</em> saves the last settings sent to each light, and sends them back to those same lights when it's recalled.")
+                saveDlg.addButton(" Global Preset ", QMessageBox.ButtonRole.YesRole)
+                saveDlg.addButton(" Snapshot Preset ", QMessageBox.ButtonRole.YesRole)
+                saveDlg.addButton(" Cancel ", QMessageBox.ButtonRole.RejectRole)
+                saveDlg.setIcon(QMessageBox.Question)
+
+                if PySideGUI == "PySide2": # PySide2 does exec_(), PySide 6 does plain exec()
+                    clickedButton = saveDlg.exec_()
+                else:
+                    clickedButton = saveDlg.exec()
+
+                if clickedButton == 0: # save a global preset
+                    if self.currentSendValue() == None:
+                        self.statusBar.showMessage("Switch to the CCT, HSI or Scene tab to save a global preset")
+                        return
+
+                    saveCustomPreset(numOfPreset, [[-1, self.currentSendValue()]])
+                    getattr(self, f"customPreset_{numOfPreset}_Button").markCustom(presetNum)
+                elif clickedButton == 1: # save a snapshot preset
+                    thePreset = [[availableLights[lightIdx][0].address, list(availableLights[lightIdx][3])] for lightIdx in range(len(availableLights)) \
+                                 if len(availableLights[lightIdx][3]) > 0]
+
+                    if len(thePreset) == 0:
+                        self.statusBar.showMessage("None of the lights have had anything sent to them yet, so there's nothing to save")
+                        return
+
+                    saveCustomPreset(numOfPreset, thePreset)
+                    getattr(self, f"customPreset_{numOfPreset}_Button").markCustom(presetNum, 1)
+                else:
+                    return
+
+                # A NAME IS OPTIONAL - IT LETS THE PRESET BE RECALLED BY NAME (HERE, OR WITH ?use_preset= FROM THE HTTP SERVER)
+                storedPreset = library.getPreset(presetNum + 1)
+                presetName, clickedOK = QInputDialog.getText(self, "Name this Preset", f"Name for preset {presetNum + 1} (optional):",
+                                                             text=storedPreset[1] if storedPreset != None and storedPreset[1] != None else "")
+
+                if clickedOK == True:
+                    try:
+                        library.renamePreset(presetNum + 1, presetName)
+                    except ValueError as e:
+                        self.statusBar.showMessage(f"Saved preset {presetNum + 1}, but couldn't name it - {e}")
+                        self.showPresetNames()
+                        return
+
+                self.showPresetNames()
+                self.statusBar.showMessage(f"Saved preset {presetNum + 1}")
+
+            # THE PREFERENCES FILE WAS CHANGED (AND RE-LOADED) WHILE WE WERE RUNNING, SO SHOW THE NEW SETTINGS
+            def applyReloadedConfig(self):
+                self.setupShortcutKeys()
+                self.setupGlobalLightPrefsTab()
+
+            # FILL THE GROUP SELECTOR WITH THE SAVED LIGHT GROUPS
+            def updateGroupChooser(self):
+                self.groupChooser.clear()
+                self.groupChooser.addItem("Groups...")
+                self.groupChooser.addItems([lightGroups[groupName][0] for groupName in sorted(getLightGroups())])
+                self.groupChooser.addItem("Save selection as group...")
+
+            def groupChosen(self, chosenIndex):
+                if chosenIndex == self.groupChooser.count() - 1: # save the currently selected lights as a group
+                    selectedRows = self.selectedLights()
+
+                    if len(selectedRows) > 0:
+                        groupName, clickedOK = QInputDialog.getText(self, "Save Light Group", "Name for this group of lights:")
+
+                        if clickedOK == True and groupName.strip() != "" and "=" not in groupName:
+                            setLightGroup(groupName, [availableLights[lightIdx][0].address for lightIdx in selectedRows])
+                            self.statusBar.showMessage(f"Saved {len(selectedRows)} light(s) as the group \"{groupName.strip()}\"")
+                            self.updateGroupChooser()
+                    else:
+                        self.statusBar.showMessage("Select the lights to put in the group first!")
+                elif chosenIndex > 0: # select every light in the group, and send them the current settings all at once
+                    groupName = self.groupChooser.itemText(chosenIndex)
+                    self.lightTable.clearSelection()
+
+                    for lightIdx in resolveLightGroup(groupName):
+                        if lightIdx < self.lightTableModel.rowCount():
+                            self.lightTable.selectionModel().select(self.lightTableModel.index(lightIdx, 0),
+                                                                    QItemSelectionModel.Select | QItemSelectionModel.Rows)
+
+                    if sendToLightGroup(groupName, sendValue) == None:
+                        self.statusBar.showMessage(f"None of the lights in the group \"{groupName}\" are linked right now")
+
+                self.groupChooser.setCurrentIndex(0)
+
+            # UPDATE THE "LINKED" COLUMN FOR A LIGHT WHEN ITS CONNECTION STATE CHANGES
+            def updateLinkedColumn(self, address, state):
+                lightIdx = findLightByAddress(address)
+
+                if lightIdx != -1 and lightIdx < self.lightTableModel.rowCount():
+                    self.setTheTable(["", "", linkedStateText[state], ""], lightIdx)
+
+            # MOVE THE TABLE'S ROWS (NOT THE LIGHTS THEMSELVES) INTO THE ORDER OF ONE OF THE REGISTRY'S SORT VIEWS
+            def showSortedRows(self, sortingField, reverse):
+                verticalHeader = self.lightTable.verticalHeader()
+
+                sortedRows = [lightIdx for lightIdx in registry.sortedOrder(sortingField, reverse) if lightIdx < self.lightTableModel.rowCount()]
+
+                for visualRow, lightIdx in enumerate(sortedRows):
+                    if verticalHeader.visualIndex(lightIdx) != visualRow:
+                        verticalHeader.moveSection(verticalHeader.visualIndex(lightIdx), visualRow)
+
+            # ADD A NEWLY FOUND LIGHT TO THE TABLE (OR UPDATE ITS SIGNAL LEVEL IF IT'S ALREADY THERE)
+            def showFoundLight(self, lightIdx, isNewLight):
+                if lightIdx >= self.lightTableModel.rowCount(): # this light (and any found just before it) doesn't have a row in the table yet
+                    self.lightTableModel.addRows(lightIdx + 1 - self.lightTableModel.rowCount())
+
+                if isNewLight == True:
+                    self.setTheTable([lightNameText(lightIdx), availableLights[lightIdx][0].address,
+                                      linkedStateText[connectionManager.getState(availableLights[lightIdx][0].address)], "Waiting to be linked..."], lightIdx)
+                    self.lightTable.resizeRowToContents(lightIdx)
+                else:
+                    self.setTheTable([lightNameText(lightIdx), "", "", ""], lightIdx)
+
+                if isNewLight == True:
+                    if self.lightTable.horizontalHeader().isSortIndicatorShown() and lastSortingField != -1: # put the new light where the current sort says it goes
+                        self.showSortedRows(lastSortingField, lastSortReversed)
+
+                    self.statusBar.showMessage(f"Found {len(availableLights)} light(s) so far...")
+
+            def returnTableInfo(self, row, column):
+                return self.lightTableModel.cellValue(row, column)
+
+            # ADD A LIGHT TO THE TABLE VIEW (OR CHANGE ITS "LINKED"/STATUS TEXT) - THE NAME AND MAC ADDRESS COLUMNS COME FROM availableLights
             def setTheTable(self, infoArray, rowToChange = -1):
-                if rowToChange == -1:
-                    currentRow = self.lightTable.rowCount()
-                    self.lightTable.insertRow(currentRow) # if rowToChange is not specified, then we'll make a new row at the end
-                    self.lightTable.setItem(currentRow, 0, QTableWidgetItem())
-                    self.lightTable.setItem(currentRow, 1, QTableWidgetItem())
-                    self.lightTable.setItem(currentRow, 2, QTableWidgetItem())
-                    self.lightTable.setItem(currentRow, 3, QTableWidgetItem())
+                if rowToChange == -1: # if rowToChange is not specified, then the next light in availableLights gets a new row at the end
+                    currentRow = self.lightTableModel.rowCount()
+                    self.lightTableModel.addRows(1)
+                    self.lightTable.resizeRowToContents(currentRow)
                 else:
                     currentRow = rowToChange # change data for the specified row
 
-                # THIS SECTION BELOW LIMITS UPDATING THE TABLE **ONLY** IF THE DATA SUPPLIED IS DIFFERENT THAN IT WAS ORIGINALLY
-                if infoArray[0] != "": # the name of the light
-                    if rowToChange == -1 or (rowToChange != -1 and infoArray[0] != self.returnTableInfo(rowToChange, 0)):
-                        self.lightTable.item(currentRow, 0).setText(infoArray[0])
-                if infoArray[1] != "": # the MAC address of the light
-                    if rowToChange == -1 or (rowToChange != -1 and infoArray[1] != self.returnTableInfo(rowToChange, 1)):
-                        self.lightTable.item(currentRow, 1).setText(infoArray[1])
+                if infoArray[0] != "" or infoArray[1] != "": # the name or MAC address of the light changed in availableLights, so redraw them
+                    self.lightTableModel.markChanged(currentRow, 0)
+                    self.lightTableModel.markChanged(currentRow, 1)
                 if infoArray[2] != "": # the Linked status of the light
-                    if rowToChange == -1 or (rowToChange != -1 and infoArray[2] != self.returnTableInfo(rowToChange, 2)):
-                        self.lightTable.item(currentRow, 2).setText(infoArray[2])
+                    self.lightTableModel.setCellText(currentRow, 2, infoArray[2])
                 if infoArray[3] != "": # the current status message of the light
-                    if rowToChange == -1 or (rowToChange != -1 and infoArray[2] != self.returnTableInfo(rowToChange, 3)):
-                        self.lightTable.item(currentRow, 3).setText(infoArray[3])
-                self.lightTable.resizeRowsToContents()
+                    self.lightTableModel.setCellText(currentRow, 3, infoArray[3])
 
     except Exception as e:
-        logging.exception(e)
\ No newline at end of file
+        logging.exception(e)
+
+# =======================================================
+# = OUTBOUND WRITE QUEUE (ONE "LATEST-WINS" SLOT PER LIGHT)
+# =======================================================
+minWriteInterval = 0.02 # the shortest amount of time (in seconds) allowed between 2 writes to the same light
+
+class lightWriteQueue:
+    def __init__(self, minInterval = minWriteInterval):
+        self.minInterval = minInterval # the fastest we'll ever write to one light, even if the link is quicker than that
+        self.pendingFrames = {} # the newest [frame, sendValue] waiting to be written to each light (keyed by the light's MAC address/GUID)
+        self.writerTasks = {} # the task currently draining each light's slot (only one per light at a time)
+        self.writeTimes = {} # the running average of how long one write takes on each light's link
+        self.counters = {} # the number of frames queued/coalesced/dropped/written for each light
+        self.pendingGroup = {} # the newest [frame, sendValue] waiting to go out to each light in a multi-light send (keyed by address)
+        self.groupTask = None # the task fanning pendingGroup out (only one at a time)
+
+    def getCounters(self, address):
+        if address not in self.counters:
+            self.counters[address] = {"queued": 0, "coalesced": 0, "dropped": 0, "written": 0, "suppressed": 0}
+
+        return self.counters[address]
+
+    def queueFrame(self, lightIdx, byteString, sendValue = None): # hand a frame to the queue from ANY thread (the GUI, HTTP server, etc.)
+        # sendValue (if given) is remembered as the light's last settings once the frame is actually written
+        lightEntry = availableLights[lightIdx]
+
+        if asyncioEventLoop == None or asyncioEventLoop.is_closed(): # there's no BLE loop running, so there's nothing to write with
+            self.getCounters(lightEntry[0].address)["dropped"] += 1
+        else:
+            asyncioEventLoop.call_soon_threadsafe(self.submitFrame, lightEntry, byteString, sendValue)
+
+    def submitFrame(self, lightEntry, byteString, sendValue = None): # (runs on asyncioEventLoop) put a frame into a light's slot
+        address = lightEntry[0].address
+        counters = self.getCounters(address)
+        counters["queued"] += 1
+
+        if isRedundantWrite(address, byteString): # the light already holds this frame, so there's nothing to send
+            counters["suppressed"] += 1
+            self.recordWritten(address, sendValue) # (but it is what the light is showing)
+
+            if address in self.pendingFrames: # and anything older that was waiting would just move it away from that state
+                del self.pendingFrames[address]
+                counters["coalesced"] += 1
+
+            return
+
+        if address in self.pendingFrames: # there's already an unsent frame for this light, so the new one replaces it
+            counters["coalesced"] += 1
+
+        if address in self.pendingGroup: # (the same goes for an unsent frame from a multi-light send)
+            del self.pendingGroup[address]
+            counters["coalesced"] += 1
+
+        self.pendingFrames[address] = [byteString, sendValue]
+
+        if address not in self.writerTasks: # if nothing is draining this light's slot right now, then start something that will
+            self.writerTasks[address] = asyncio.ensure_future(self.drainLight(address, lightEntry))
+
+    def queueGroup(self, lightFrames, sendValue): # hand a multi-light send ([[lightIdx, frame], ...]) to the queue from ANY thread
+        if asyncioEventLoop == None or asyncioEventLoop.is_closed():
+            for lightIdx, byteString in lightFrames:
+                self.getCounters(availableLights[lightIdx][0].address)["dropped"] += 1
+        else:
+            asyncioEventLoop.call_soon_threadsafe(self.submitGroup, [[availableLights[lightIdx][0].address, byteString] for lightIdx, byteString in lightFrames], sendValue)
+
+    def submitGroup(self, addressFrames, sendValue): # (runs on asyncioEventLoop) put a multi-light send into pendingGroup
+        for address, byteString in addressFrames:
+            counters = self.getCounters(address)
+            counters["queued"] += 1
+
+            if address in self.pendingFrames: # a newer setting for this light replaces anything waiting in its own slot
+                del self.pendingFrames[address]
+                counters["coalesced"] += 1
+
+            if isRedundantWrite(address, byteString):
+                counters["suppressed"] += 1
+                self.recordWritten(address, sendValue)
+
+                if address in self.pendingGroup:
+                    del self.pendingGroup[address]
+                    counters["coalesced"] += 1
+
+                continue
+
+            if address in self.pendingGroup: # (only the newest frame for each light is sent, just like a light's own slot)
+                counters["coalesced"] += 1
+
+            self.pendingGroup[address] = [byteString, sendValue]
+
+        if self.groupTask == None and len(self.pendingGroup) > 0:
+            self.groupTask = asyncio.ensure_future(self.drainGroup())
+
+    async def drainGroup(self): # send the newest frames to every light in pendingGroup at once, through fanOutToLights
+        try:
+            while len(self.pendingGroup) > 0:
+                pendingGroup, self.pendingGroup = self.pendingGroup, {}
+                lightFrames, sentValues = [], {}
+
+                for address in pendingGroup:
+                    lightIdx = findLightByAddress(address)
+
+                    if lightIdx == -1: # the light was removed while its frame was waiting
+                        self.getCounters(address)["dropped"] += 1
+                    else:
+                        lightFrames.append([lightIdx, pendingGroup[address][0]])
+                        sentValues[address] = pendingGroup[address][1]
+
+                if len(lightFrames) == 0:
+                    continue
+
+                # (lights that are re-linking are skipped here instead of held - the fan-out fails fast, so it doesn't hold up the others)
+                report = await fanOutToLights(lightFrames) # maxConcurrentWrites at a time, with the spread between the first and last light
+
+                for address in sentValues:
+                    if report["latencies"].get(address) != None:
+                        self.getCounters(address)["written"] += 1
+                        self.recordWritten(address, sentValues[address])
+                    else:
+                        self.getCounters(address)["dropped"] += 1
+
+                await asyncio.sleep(self.minInterval) # (so dragging a slider doesn't send faster than the lights' links can keep up)
+        finally:
+            self.groupTask = None
+
+    def resumeLight(self, lightEntry): # (runs on asyncioEventLoop) start writing a held frame again once a light is re-linked
+        address = lightEntry[0].address
+
+        if address in self.pendingFrames and address not in self.writerTasks:
+            self.writerTasks[address] = asyncio.ensure_future(self.drainLight(address, lightEntry))
+
+    def clearLight(self, address): # (runs on asyncioEventLoop) throw away anything waiting to go to a light (disconnects, etc.)
+        if address in self.pendingFrames:
+            del self.pendingFrames[address]
+            self.getCounters(address)["dropped"] += 1
+
+        if address in self.pendingGroup:
+            del self.pendingGroup[address]
+            self.getCounters(address)["dropped"] += 1
+
+    async def drainLight(self, address, lightEntry):
+        counters = self.getCounters(address)
+        startCounters = dict(counters) # a copy of the counters at the start of this burst, to report the difference at the end
+
+        try:
+            while address in self.pendingFrames:
+                byteString, sendValue = self.pendingFrames.pop(address) # take the newest frame - anything older has already been replaced
+
+                if lightEntry[1] == "" or lightEntry[1] == None or not lightEntry[1].is_connected: # the light isn't linked
+                    if connectionManager.isRelinking(address): # the light is being re-linked, so hold on to the frame until it's back
+                        self.pendingFrames[address] = [byteString, sendValue]
+                        printDebugString(f"Light {address} is re-linking - holding its newest frame until it's back")
+                        return
+
+                    counters["dropped"] += 1
+                    continue
+
+                startTime = time.perf_counter()
+
+                try:
+                    await writeFrameToLight(lightEntry, byteString)
+                    counters["written"] += 1
+                    self.recordWritten(address, sendValue)
+                except Exception as e:
+                    counters["dropped"] += 1
+                    printDebugString(f"Error writing to light {address} from the write queue: {e}")
+
+                writeTime = time.perf_counter() - startTime
+
+                if address in self.writeTimes: # smooth the timing out, so one slow write doesn't throttle the light for too long
+                    self.writeTimes[address] = (self.writeTimes[address] * 0.8) + (writeTime * 0.2)
+                else:
+                    self.writeTimes[address] = writeTime
+
+                # PACE THE NEXT WRITE TO WHAT THIS LIGHT'S LINK CAN ACTUALLY CARRY
+                waitTime = max(self.minInterval, self.writeTimes[address]) - writeTime
+
+                if waitTime > 0:
+                    await asyncio.sleep(waitTime)
+        finally:
+            del self.writerTasks[address]
+
+        printDebugString(f"Write queue for {address} is empty - {counters['written'] - startCounters['written']} frame(s) written, " \
+                         f"{counters['coalesced'] - startCounters['coalesced']} coalesced, {counters['dropped'] - startCounters['dropped']} dropped " \
+                         f"(average write time {self.writeTimes.get(address, 0) * 1000:.1f}ms, {getFrameRate(address):.1f} frames/sec)")
+
+    def recordWritten(self, address, sendValue): # remember what a light now holds (frames that were coalesced or dropped never get here)
+        lightIdx = findLightByAddress(address)
+
+        if sendValue != None and lightIdx != -1:
+            recordSentValue(lightIdx, list(sendValue))
+
+    def reportCounters(self): # return a list of lines with the counters for every light we've written to
+        returnList = []
+
+        for address in self.counters:
+            counters = self.counters[address]
+            returnList.append(f"{address}: {counters['queued']} queued, {counters['written']} written, " \
+                              f"{counters['coalesced']} coalesced, {counters['suppressed']} suppressed, {counters['dropped']} dropped")
+
+        return returnList
+
+writeQueue = lightWriteQueue() # the write queue all slider/preset/HTTP changes are sent through
+
+def recordSentValue(lightIdx, sendValue): # remember what a light was just sent (its power state, or its last parameters)
+    if sendValue[1] == 129: # power on/off
+        availableLights[lightIdx][6] = (sendValue[3] == 1)
+    else:
+        availableLights[lightIdx][3] = sendValue
+        if availableLights[lightIdx][6] != True: # (the lights turn themselves on when they're sent new settings)
+            availableLights[lightIdx][6] = True
+
+def queueLightWrite(selectedLights, sendValue): # send one command to a list of lights (indexes into availableLights) through the write queue
+    if len(selectedLights) > 1: # more than one light - send it as one fan-out, so the lights change together (and maxConcurrentWrites is kept to)
+        writeQueue.queueGroup([[lightIdx, getFrameForLight(lightIdx, sendValue)] for lightIdx in selectedLights], list(sendValue))
+    else:
+        for lightIdx in selectedLights: # (each light gets its own frame - Infinity frames have the light's MAC address in them)
+            writeQueue.queueFrame(lightIdx, getFrameForLight(lightIdx, sendValue), list(sendValue))
+
+# =======================================================
+# = CONCURRENT FAN-OUT (ONE COMMAND TO MANY LIGHTS AT ONCE)
+# =======================================================
+maxConcurrentWrites = 8 # the maximum number of lights written to at the same time when sending to a group of lights
+
+async def writeToOneLight(lightIdx, byteString, startTime, limiter):
+    if connectionManager.getState(availableLights[lightIdx][0].address) != "LINKED": # fail fast, so the rest of the group isn't held up
+        printDebugString(f"Light {lightIdx + 1} isn't linked right now, so it's being skipped")
+        return None
+
+    if isRedundantWrite(availableLights[lightIdx][0].address, byteString): # the light already holds this frame
+        printDebugString(f"Light {lightIdx + 1} already has this setting, so it's being skipped")
+        return time.perf_counter() - startTime
+
+    async with limiter: # wait for a free slot if we're already writing to the maximum number of lights
+        for attempt in range(maxNumOfAttempts): # each light retries on its own, without holding up the others
+            try:
+                await writeFrameToLight(availableLights[lightIdx], byteString)
+                return time.perf_counter() - startTime # the time from the start of the fan-out to this light being written to
+            except Exception as e:
+                printDebugString(f"Error writing to light {lightIdx + 1} (attempt {attempt + 1} of {maxNumOfAttempts}): {e}")
+
+    return None # we ran out of attempts, so this light didn't get the command
+
+async def fanOutToLights(lightFrames, maxConcurrent = None):
+    # lightFrames is a list of [lightIdx, byteString] - each light can get a different frame (Infinity frames include the MAC address)
+    if maxConcurrent == None:
+        maxConcurrent = maxConcurrentWrites
+
+    limiter = asyncio.Semaphore(max(1, maxConcurrent))
+    startTime = time.perf_counter()
+
+    results = await asyncio.gather(*[writeToOneLight(lightIdx, byteString, startTime, limiter) for lightIdx, byteString in lightFrames])
+    report = fanOutReport([lightIdx for lightIdx, byteString in lightFrames], results, startTime)
+
+    printDebugString(f"Sent to {len(lightFrames)} light(s) ({maxConcurrent} at a time) in {report['total'] * 1000:.1f}ms - " \
+                     f"spread between first and last light: {report['spread'] * 1000:.1f}ms, {report['failed']} failed")
+
+    for address in report["latencies"]:
+        if report["latencies"][address] != None:
+            printDebugString(f" > {address}: {report['latencies'][address] * 1000:.1f}ms")
+        else:
+            printDebugString(f" > {address}: FAILED")
+
+    return report
+
+def fanOutReport(lightIdxs, results, startTime):
+    # results has the completion time (in seconds since startTime) for each light - None if the write failed, False if it was cancelled
+    latencies = {} # the completion time for each light, keyed by address - None if it didn't change
+    successfulTimes = []
+
+    for a in range(len(lightIdxs)):
+        if results[a] is None or results[a] is False: # (checked with "is", as 0.0 == False)
+            latencies[availableLights[lightIdxs[a]][0].address] = None
+        else:
+            latencies[availableLights[lightIdxs[a]][0].address] = results[a]
+            successfulTimes.append(results[a])
+
+    if len(successfulTimes) > 0:
+        spread = max(successfulTimes) - min(successfulTimes) # the time between the first light and the last light changing
+    else:
+        spread = 0
+
+    return {"latencies": latencies, "spread": spread, "total": time.perf_counter() - startTime,
+            "failed": sum(1 for result in results if result is None), "cancelled": sum(1 for result in results if result is False)}
+
+def startFanOut(lightFrames, maxConcurrent = None): # start a fan-out on asyncioEventLoop from another thread (the GUI, HTTP server, etc.)
+    return asyncio.run_coroutine_threadsafe(fanOutToLights(lightFrames, maxConcurrent), asyncioEventLoop)
+
+# =======================================================
+# = SIMULATED LIGHT BACKEND (--simulate)
+# =======================================================
+# Stand-ins for BleakScanner and BleakClient that act like Neewer lights, for testing on machines without Bluetooth
+# --simulate            - 5 lights, a mix of old-style, Infinity and Infinity-style (protocol, but not Infinity) lights
+# --simulate=16         - 16 lights, cycling through the same mix of lights as above
+# --simulate=SL80:0,RGB62:1 - one light per name (advertised as NEEWER-SL80, etc.), with the protocol type from availableLights[n][8] after the colon (0, 1 or 2)
+defaultSimulatedLights = [["NEEWER-SL80", 0], ["NEEWER-RGB660 PRO", 0], ["NEEWER-RGB176", 0], ["NW-20220016&RGB62", 1], ["NEEWER-CB60 RGB", 2]]
+simulatedLights = [] # the list of simulated lights (set up below if --simulate is used)
+simulatedLog = None # the file every applied frame is logged to (if --sim_log is used)
+
+def logSimulatedEvent(light, event, params = []): # one line per event - "[time.time()] [address] [event] [params]"
+    if simulatedLog != None:
+        simulatedLog.write(f"{time.time():.6f} {light.address} {event} {','.join(str(x) for x in params)}\n")
+
+class simulatedBleakError(Exception):
+    pass
+
+class simulatedCharacteristic:
+    def __init__(self, uuid, properties):
+        self.uuid = uuid.lower()
+        self.properties = properties
+
+class simulatedServices:
+    def __init__(self):
+        self.characteristics = {setLightUUID.lower(): simulatedCharacteristic(setLightUUID, ["write-without-response", "write"]),
+                                notifyLightUUID.lower(): simulatedCharacteristic(notifyLightUUID, ["notify"])}
+
+    def get_characteristic(self, uuid):
+        return self.characteristics.get(str(uuid).lower())
+
+class simulatedAdvertisement: # the same fields bleak's AdvertisementData has that we use
+    def __init__(self, local_name, rssi):
+        self.local_name = local_name
+        self.rssi = rssi
+
+class simulatedLight:
+    def __init__(self, name, address, protocol = 0):
+        self.name = name
+        self.address = address
+        self.rssi = -40 - (len(simulatedLights) % 50) # give each light a different (but stable) signal level
+        self.protocol = protocol # the same values as availableLights[n][8] - 0: old-style light, 1: Infinity light, 2: Infinity-style light
+        self.macBytes = [int(x, 16) for x in address.split(":")] # the MAC address as a list of bytes (sent in Infinity frames)
+        self.advertiseDelay = 0.05 + ((len(simulatedLights) * 0.037) % 0.5) # how long after a scan starts that this light shows up
+
+        self.client = None # the simulated client currently linked to this light
+        self.powerOn = True
+        self.channel = 1
+        self.mode = "" # the current mode (CCT/HSI/ANM) and its parameters
+        self.params = []
+        self.framesReceived = 0
+        self.framesRejected = 0 # frames with bad checksums, or frames this kind of light doesn't understand
+        self.lastFrameTime = 0 # the time.time() the last frame was applied
+
+    def applyFrame(self, frame):
+        frame = list(frame)
+
+        if len(frame) < 4 or frame[0] != 120 or (sum(frame[:-1]) & 0xFF) != frame[-1]: # not a Neewer frame, or the checksum's wrong
+            self.framesRejected += 1
+            return
+
+        if len(frame) >= 11 and frame[3:9] == self.macBytes: # an Infinity frame - [120, command, length, MAC (6 bytes), tag, params..., checksum]
+            if self.protocol == 0: # old-style lights don't understand the Infinity protocol
+                self.rejectFrame(frame, "an Infinity frame sent to an old-style light")
+                return
+
+            tag = frame[9]
+            params = frame[10:-1]
+        else: # an old-style frame - [120, command, length, params..., checksum]
+            if self.protocol > 0 and frame[1] not in [132, 133]: # Infinity (and Infinity-style) lights only take status queries in the old format
+                self.rejectFrame(frame, f"an old-style frame sent to a protocol {self.protocol} light")
+                return
+
+            tag = frame[1]
+            params = frame[3:-1]
+
+        self.framesReceived += 1
+        self.lastFrameTime = time.time()
+
+        if tag in [135, 134, 136, 139, 129, 130, 131]: # log the frames that change the light
+            logSimulatedEvent(self, {135: "CCT", 134: "HSI", 136: "ANM", 139: "ANM", 129: "POWER", 130: "BRI", 131: "TEMP"}[tag], params)
+
+        if tag == 133: # power status query
+            self.sendNotify([120, 2, 1, 1 if self.powerOn else 2])
+        elif tag == 132: # channel query
+            self.sendNotify([120, 1, 1, self.channel])
+        elif tag == 129: # power on/off
+            self.powerOn = (params[0] == 1)
+        elif tag == 135: # CCT mode
+            self.mode, self.params, self.powerOn = "CCT", params, True
+        elif tag in [130, 131]: # brightness or temperature on its own (how CCT-only lights are sent CCT)
+            if self.mode != "CCT" or len(self.params) < 2:
+                self.mode, self.params = "CCT", [100, 56]
+
+            self.params = list(self.params)
+            self.params[0 if tag == 130 else 1] = params[0]
+            self.powerOn = True
+        elif tag == 134: # HSI mode
+            self.mode, self.params, self.powerOn = "HSI", params, True
+        elif tag in [136, 139]: # ANM/SCENE mode (old-style and Infinity)
+            self.mode, self.params, self.powerOn = "ANM", params, True
+        else:
+            self.framesReceived -= 1
+            self.framesRejected += 1
+
+    def rejectFrame(self, frame, reason): # a frame in the wrong format for this kind of light - a real light would just ignore it
+        self.framesRejected += 1
+        logSimulatedEvent(self, "REJECTED", frame)
+        printDebugString(f"Simulated light {self.address} ({self.name}) rejected {reason}: {frame}")
+
+    def sendNotify(self, reply):
+        if self.client != None and self.client.notifyCallback != None:
+            reply.append(sum(reply) & 0xFF) # add the checksum to the reply
+            self.client.notifyCallback(self.client.notifyCharacteristic, bytearray(reply))
+
+class simulatedBleakScanner:
+    def __init__(self, detection_callback = None, **kwargs):
+        self.detectionCallback = detection_callback
+        self.advertiseTasks = []
+
+    @staticmethod
+    async def discover(timeout = 5.0, return_adv = False, **kwargs):
+        await asyncio.sleep(timeout) # a real scan always lasts the entire timeout
+
+        if return_adv == True: # return the same {address: (device, advertisement)} dictionary bleak does
+            return {light.address: (light, simulatedAdvertisement(light.name, light.rssi)) for light in simulatedLights}
+        else:
+            return simulatedLights[:]
+
+    async def advertise(self, light):
+        await asyncio.sleep(light.advertiseDelay)
+
+        while True: # keep advertising every second (with a bit of signal level drift) until the scan stops
+            if self.detectionCallback != None:
+                self.detectionCallback(light, simulatedAdvertisement(light.name, light.rssi + random.randint(-3, 3)))
+
+            await asyncio.sleep(1)
+
+    async def start(self):
+        self.advertiseTasks = [asyncio.ensure_future(self.advertise(light)) for light in simulatedLights]
+
+    async def stop(self):
+        for task in self.advertiseTasks:
+            task.cancel()
+
+        self.advertiseTasks = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.stop()
+
+class simulatedBleakClient:
+    def __init__(self, address_or_ble_device, disconnected_callback = None, **kwargs):
+        if isinstance(address_or_ble_device, str):
+            self.address = address_or_ble_device
+        else:
+            self.address = address_or_ble_device.address
+
+        self.disconnectedCallback = disconnected_callback
+        self.light = None
+        self.notifyCallback = None
+        self.notifyCharacteristic = simulatedCharacteristic(notifyLightUUID, ["notify"])
+        self.services = simulatedServices()
+
+        for light in simulatedLights:
+            if light.address == self.address:
+                self.light = light
+
+    @property
+    def is_connected(self):
+        return self.light != None and self.light.client == self
+
+    async def connect(self, **kwargs):
+        await asyncio.sleep(simArgs.sim_latency * 5) # linking takes a few round trips
+
+        if self.light == None:
+            raise simulatedBleakError(f"Simulated device with address {self.address} was not found.")
+        if random.random() < simArgs.sim_loss:
+            raise simulatedBleakError(f"Simulated connection to {self.address} was lost while linking.")
+
+        self.light.client = self
+        logSimulatedEvent(self.light, "LINKED")
+        return True
+
+    async def disconnect(self):
+        if self.is_connected:
+            self.light.client = None
+            self.notifyCallback = None
+
+        return True
+
+    def simulateDisconnect(self): # drop the link from the light's side (like the light being turned off at the switch)
+        if self.is_connected:
+            self.light.client = None
+            self.notifyCallback = None
+
+            if self.disconnectedCallback != None:
+                self.disconnectedCallback(self)
+
+    async def write_gatt_char(self, char_specifier, data, response = False):
+        if not self.is_connected:
+            raise simulatedBleakError(f"Simulated device {self.address} is not connected.")
+
+        frame = bytes(data)
+
+        if response == True: # an acknowledged write takes one whole round trip, and errors if it's lost
+            await asyncio.sleep(simArgs.sim_latency)
+
+            if random.random() < simArgs.sim_loss:
+                raise simulatedBleakError(f"Simulated write to {self.address} was lost.")
+
+            self.light.applyFrame(frame)
+        else: # an unacknowledged write returns right away, and if it's lost, nobody knows
+            await asyncio.sleep(0)
+
+            if random.random() >= simArgs.sim_loss:
+                asyncio.get_running_loop().call_later(simArgs.sim_latency, self.light.applyFrame, frame)
+
+    async def start_notify(self, char_specifier, callback, **kwargs):
+        self.notifyCallback = callback
+
+    async def stop_notify(self, char_specifier):
+        self.notifyCallback = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.disconnect()
+
+if simArgs.simulate != None: # set up the simulated lights, and use them instead of Bleak's Bluetooth devices
+    if simArgs.simulate == "":
+        lightsToSimulate = defaultSimulatedLights
+    elif simArgs.simulate.isdigit(): # a number of lights to simulate
+        lightsToSimulate = [defaultSimulatedLights[a % len(defaultSimulatedLights)] for a in range(int(simArgs.simulate))]
+    else: # a list of light names (with their protocol type after a colon)
+        lightsToSimulate = []
+
+        for lightSpec in simArgs.simulate.split(","):
+            lightSpec = lightSpec.split(":")
+
+            # (real lights advertise as NEEWER-(model) or NW-(serial number) - anything else isn't picked up when scanning)
+            if "NEEWER" not in lightSpec[0].upper() and not lightSpec[0].upper().startswith("NW-"):
+                lightSpec[0] = "NEEWER-" + lightSpec[0]
+
+            if len(lightSpec) > 1:
+                lightsToSimulate.append([lightSpec[0], int(lightSpec[1])])
+            else:
+                lightsToSimulate.append([lightSpec[0], 0])
+
+    for a in range(len(lightsToSimulate)):
+        simulatedLights.append(simulatedLight(lightsToSimulate[a][0], "C4:AC:05:" + ":".join(f"{x:02X}" for x in (a + 1).to_bytes(3, "big")), lightsToSimulate[a][1]))
+
+    if simArgs.sim_log != None:
+        simulatedLog = open(simArgs.sim_log, mode="a", encoding="utf-8", buffering=1) # line-buffered, so readers see each event right away
+
+    BleakScanner = simulatedBleakScanner
+    BleakClient = simulatedBleakClient
+
+    print(f"Simulating {len(simulatedLights)} light(s) with {simArgs.sim_latency * 1000:.1f}ms writes and a {simArgs.sim_loss * 100:.1f}% loss rate")
+
+# =======================================================
+# = COMMAND FRAME ENCODER (MEMOIZED READY-TO-SEND FRAMES)
+# =======================================================
+# sendValue-style lists (what availableLights[n][3] and the presets hold) look like this:
+# [120, 135, 2, BRI, TEMP, GM] - CCT mode (GM is only sent to Infinity and Infinity-style lights)
+# [120, 134, 4, HUE (low byte), HUE (high byte), SAT, BRI] - HSI mode
+# [120, 136, 2, BRI, SCENE] - ANM/SCENE mode (old-style lights)
+# [120, 139, ..., SCENE, ...] - ANM/SCENE mode (Infinity lights, with extra effect parameters)
+# [120, 129, 1, 1 (ON) or 2 (OFF)] - power on/off
+# [120, 130, 1, BRI] / [120, 131, 1, TEMP] - brightness/temperature on their own (CCT for lights that are CCT-only)
+# [120, 133, 0] / [120, 132, 0] - power status/channel queries
+#
+# The frames actually sent to the lights have a checksum at the end, and Infinity (and Infinity-style) lights also
+# need the light's MAC address in the frame - [120, COMMAND, LENGTH, (6 MAC address bytes), MODE, PARAMS..., CHECKSUM]
+# CCT-only lights (availableLights[n][5]) take CCT as 2 frames instead - a (brightness frame, temperature frame) tuple
+infinityCommands = {135: 144, 134: 143, 136: 145, 139: 145, 129: 141} # the Infinity command byte for each mode byte
+frameIndex = {} # reverse index - every frame/sendValue the encoder has built -> the parameters that built it
+maxFrameIndexSize = 16384 # the most entries to keep in the reverse index before throwing out the oldest ones
+splitFrameDelay = 0.05 # how long (in seconds) to wait between the brightness and temperature frames for CCT-only lights
+
+def tagChecksum(theFrame): # add the checksum (the sum of all of the bytes, cut down to one byte) to the end of a frame
+    return theFrame + [sum(theFrame) & 0xFF]
+
+def macAddressBytes(address): # return the 6 bytes of a MAC address - or None if it isn't one (MacOS gives us UUIDs instead)
+    addressParts = address.split(":")
+
+    if len(addressParts) != 6:
+        return None
+
+    try:
+        return [int(x, 16) for x in addressParts]
+    except ValueError:
+        return None
+
+def parseSendValue(sendValue): # turn a sendValue-style list back into the parameters it was made from
+    if sendValue[1] == 135:
+        returnDict = {"colorMode": "CCT", "brightness": sendValue[3], "temp": sendValue[4]}
+
+        if len(sendValue) > 5:
+            returnDict["GM"] = sendValue[5]
+        else:
+            returnDict["GM"] = 50
+    elif sendValue[1] == 134:
+        returnDict = {"colorMode": "HSI", "hue": sendValue[3] + (256 * sendValue[4]), "saturation": sendValue[5], "brightness": sendValue[6]}
+    elif sendValue[1] == 136:
+        returnDict = {"colorMode": "ANM", "brightness": sendValue[3], "scene": sendValue[4]}
+    elif sendValue[1] == 139:
+        returnDict = {"colorMode": "ANM", "scene": sendValue[3], "specialOptions": list(sendValue[4:])}
+    elif sendValue[1] == 129:
+        returnDict = {"colorMode": "POWER", "power": sendValue[3] == 1}
+    elif sendValue[1] == 130:
+        returnDict = {"colorMode": "CCT", "brightness": sendValue[3]}
+    elif sendValue[1] == 131:
+        returnDict = {"colorMode": "CCT", "temp": sendValue[3]}
+    else:
+        returnDict = {"colorMode": "UNKNOWN", "sendValue": list(sendValue)}
+
+    return returnDict
+
+def indexFrame(key, params):
+    if len(frameIndex) >= maxFrameIndexSize: # throw out the oldest quarter of the index to make room
+        for oldKey in list(frameIndex)[:maxFrameIndexSize // 4]:
+            del frameIndex[oldKey]
+
+    frameIndex[key] = params
+
+@lru_cache(maxsize=65536)
+def encodeFrame(sendValue, infinityMode = 0, address = ""): # (sendValue has to be a tuple) return the ready-to-send bytes for a light
+    sendValue = list(sendValue)
+    macBytes = macAddressBytes(address) if infinityMode > 0 else None
+
+    if macBytes != None and sendValue[1] in infinityCommands: # Infinity (or Infinity-style) light, so use the Infinity frame
+        params = sendValue[3:]
+        theFrame = tagChecksum([120, infinityCommands[sendValue[1]], 7 + len(params)] + macBytes + [sendValue[1]] + params)
+    elif sendValue[1] == 135: # old-style lights don't know about GM compensation, so only send brightness and temperature
+        theFrame = tagChecksum(sendValue[0:5])
+    elif sendValue[1] in [132, 133]: # status queries
+        theFrame = tagChecksum([120, sendValue[1], 0])
+    else:
+        theFrame = tagChecksum(sendValue)
+
+    theFrame = bytes(theFrame)
+    params = parseSendValue(sendValue)
+
+    indexFrame(tuple(sendValue), params)
+    indexFrame(theFrame, params)
+
+    return theFrame
+
+@lru_cache(maxsize=65536)
+def encodeSplitFrames(sendValue): # (sendValue has to be a CCT tuple) return the (brightness, temperature) frames for a CCT-only light
+    theFrames = (bytes(tagChecksum([120, 130, 1, sendValue[3]])), bytes(tagChecksum([120, 131, 1, sendValue[4]])))
+    params = parseSendValue(list(sendValue))
+
+    indexFrame(tuple(sendValue), params)
+    indexFrame(theFrames, params)
+
+    return theFrames
+
+def isSplitFrame(byteString): # whether or not this is a (brightness frame, temperature frame) tuple from encodeSplitFrames
+    return isinstance(byteString, tuple) and len(byteString) > 0 and isinstance(byteString[0], (bytes, bytearray))
+
+def getFrameForLight(lightIdx, sendValue): # return the ready-to-send bytes of a sendValue for one light in availableLights
+    if availableLights[lightIdx][5] == True and sendValue[1] == 135: # CCT-only lights need brightness and temperature sent separately
+        return encodeSplitFrames(tuple(sendValue))
+
+    return encodeFrame(tuple(sendValue), availableLights[lightIdx][8], getattr(availableLights[lightIdx][0], "HWMACaddr", availableLights[lightIdx][0].address))
+
+def translateByteString(byteString): # return the parameters a sendValue list (or a ready-to-send frame) was made from
+    if isinstance(byteString, (bytes, bytearray)):
+        key = bytes(byteString)
+    elif isSplitFrame(byteString):
+        key = tuple(bytes(theFrame) for theFrame in byteString)
+    else:
+        key = tuple(byteString)
+
+    if key not in frameIndex: # we haven't built this one, so work it out once and remember it
+        if isSplitFrame(key): # (brightness frame, temperature frame) - put both halves together
+            params = {}
+
+            for theFrame in key:
+                params.update(translateByteString(theFrame))
+
+            indexFrame(key, params)
+        elif isinstance(key, bytes) and len(key) >= 11 and key[1] in infinityCommands.values(): # an Infinity frame - take the MAC address out
+            indexFrame(key, parseSendValue([120, key[9], key[2] - 7] + list(key[10:-1])))
+        elif isinstance(key, bytes): # an old-style frame - take the checksum off
+            indexFrame(key, parseSendValue(list(key[:-1])))
+        else:
+            indexFrame(key, parseSendValue(list(key)))
+
+    return dict(frameIndex[key]) # return a copy, so the caller can add to it (selectionChanged adds "infinityMode")
+
+for preset in defaultLightPresets: # build the default preset frames ahead of time, as they're the most used ones
+    encodeFrame(tuple(preset[0][1]))
+
+# =======================================================
+# = WRITE-WITHOUT-RESPONSE FAST PATH
+# =======================================================
+useFastWrites = True # whether or not to use unacknowledged writes for lights that support them (power on/off is always acknowledged)
+writeWithoutResponse = {} # whether or not each light (keyed by address) supports unacknowledged writes - checked once when linking
+frameRates = {} # the frame rate meter for each light (keyed by address)
+
+class frameRateMeter:
+    def __init__(self, window = 1.0):
+        self.window = window # the number of seconds to average the frame rate over
+        self.frameTimes = deque()
+
+    def forgetOldFrames(self, currentTime):
+        while len(self.frameTimes) > 0 and self.frameTimes[0] < currentTime - self.window: # forget frames older than the window
+            self.frameTimes.popleft()
+
+    def tick(self):
+        currentTime = time.perf_counter()
+        self.frameTimes.append(currentTime)
+        self.forgetOldFrames(currentTime)
+
+    def rate(self):
+        self.forgetOldFrames(time.perf_counter())
+        return len(self.frameTimes) / self.window
+
+def getFrameRate(address): # the number of frames per second written to a light recently
+    if address in frameRates:
+        return frameRates[address].rate()
+    else:
+        return 0.0
+
+def detectWriteCapability(lightEntry): # check (once) whether or not a light can take unacknowledged writes
+    address = lightEntry[0].address
+
+    try:
+        lightCharacteristic = lightEntry[1].services.get_characteristic(setLightUUID)
+    except Exception as e: # the light isn't linked, or its services haven't been found yet
+        printDebugString(f"Couldn't check write capabilities for light {address} - {e}")
+        return False
+
+    if lightCharacteristic == None:
+        return False
+
+    writeWithoutResponse[address] = "write-without-response" in lightCharacteristic.properties
+    printDebugString(f"Light {address} {'supports' if writeWithoutResponse[address] else 'does not support'} unacknowledged writes")
+
+    return writeWithoutResponse[address]
+
+def isStateChangingFrame(byteString): # commands we have to know arrived (power on/off) always get acknowledged writes
+    return translateByteString(byteString)["colorMode"] == "POWER"
+
+async def writeFrameToLight(lightEntry, byteString, stateChanging = None, isStatusQuery = False):
+    address = lightEntry[0].address
+
+    if address not in writeWithoutResponse:
+        detectWriteCapability(lightEntry)
+
+    if stateChanging == None:
+        stateChanging = isStateChangingFrame(byteString)
+
+    # USE AN ACKNOWLEDGED WRITE IF FAST WRITES ARE OFF, THIS COMMAND HAS TO ARRIVE, OR THE LIGHT DOESN'T SUPPORT UNACKNOWLEDGED WRITES
+    useResponse = useFastWrites == False or stateChanging == True or writeWithoutResponse.get(address, False) == False
+
+    rememberSentFrame(address, byteString) # (before the write, so a repeat of this frame that comes in while it's in flight is suppressed)
+
+    try:
+        if isSplitFrame(byteString): # a CCT-only light - brightness first, then temperature (the light misses the second one if it comes too soon)
+            await lightEntry[1].write_gatt_char(setLightUUID, bytearray(byteString[0]), useResponse)
+            await asyncio.sleep(splitFrameDelay)
+            await lightEntry[1].write_gatt_char(setLightUUID, bytearray(byteString[1]), useResponse)
+        else:
+            await lightEntry[1].write_gatt_char(setLightUUID, bytearray(byteString), useResponse)
+    except Exception:
+        forgetSentFrame(address) # we don't know what the light holds now
+        raise
+
+    if isStatusQuery == True: # a status query isn't a setting sent to the light, so it doesn't count as the first write or towards the frame rate
+        return
+
+    if address in startupTimings and "firstWrite" not in startupTimings[address]:
+        recordStartupTiming(address, "firstWrite")
+
+    if address not in frameRates:
+        frameRates[address] = frameRateMeter()
+
+    frameRates[address].tick()
+
+# =======================================================
+# = IDEMPOTENT WRITE SUPPRESSION (SKIP FRAMES A LIGHT ALREADY HOLDS)
+# =======================================================
+writeSuppressionTTL = 10 # how long (in seconds) a light is trusted to still hold the last frame sent to it - 0 turns suppression off
+lastSentFrames = {} # the last frame that changed each light, and when it was sent - [frame (as a tuple), time.time()]
+
+def isRedundantWrite(address, byteString):
+    if writeSuppressionTTL <= 0 or address not in lastSentFrames:
+        return False
+
+    lastFrame, sentTime = lastSentFrames[address]
+
+    # AFTER THE TTL, SEND IT ANYWAY - THE LIGHT MAY HAVE DRIFTED, OR BEEN CHANGED FROM ITS OWN PANEL
+    return lastFrame == tuple(byteString) and (time.time() - sentTime) < writeSuppressionTTL
+
+def rememberSentFrame(address, byteString):
+    if translateByteString(byteString)["colorMode"] != "UNKNOWN": # status queries and the like don't change what the light holds
+        lastSentFrames[address] = [tuple(byteString), time.time()]
+
+def forgetSentFrame(address):
+    lastSentFrames.pop(address, None)
+
+# =======================================================
+# = LIGHT NOTIFICATIONS (DECODED REPLIES FROM notifyLightUUID, PER LIGHT)
+# =======================================================
+notificationBufferSize = 32 # the number of replies kept for each light
+powerStatusText = {1: "ON", 2: "STANDBY"} # the power states a light can report
+
+class lightNotification: # one decoded reply from a light
+    __slots__ = ("address", "time", "kind", "value", "raw")
+
+    def __init__(self, address, kind, value, raw):
+        self.address = address # the light the reply came from
+        self.time = time.time()
+        self.kind = kind # "POWER", "CHANNEL" or "UNKNOWN"
+        self.value = value # "ON"/"STANDBY" for POWER, the channel number for CHANNEL, None for anything else
+        self.raw = raw # the reply itself (as a list of bytes)
+
+def decodeNotification(address, data):
+    data = list(data)
+
+    if len(data) >= 5 and data[0] == 120 and (sum(data[:-1]) & 0xFF) == data[-1]:
+        if data[1] == 2: # [120, 2, 1, power, checksum] - the reply to a power status query
+            return lightNotification(address, "POWER", powerStatusText.get(data[3], None), data)
+        elif data[1] == 1: # [120, 1, 1, channel, checksum] - the reply to a channel query
+            return lightNotification(address, "CHANNEL", data[3], data)
+
+    return lightNotification(address, "UNKNOWN", None, data)
+
+class lightNotificationHub:
+    def __init__(self, bufferSize = notificationBufferSize):
+        self.bufferSize = bufferSize
+        self.buffers = {} # the last bufferSize replies from each light (keyed by the light's MAC address/GUID)
+        self.subscribers = [] # [callback, address (or None for every light)] - callbacks run on asyncioEventLoop
+        self.lock = threading.Lock() # the GUI and HTTP threads read the buffers while the BLE thread fills them
+
+    def handlerFor(self, address): # the callback to give to start_notify for one light (so every reply knows where it came from)
+        return lambda sender, data: self.publish(decodeNotification(address, data))
+
+    def publish(self, notification):
+        with self.lock:
+            if notification.address not in self.buffers:
+                self.buffers[notification.address] = deque(maxlen=self.bufferSize)
+
+            self.buffers[notification.address].append(notification)
+            subscribers = [subscriber[0] for subscriber in self.subscribers if subscriber[1] in [None, notification.address]]
+
+        lightIdx = findLightByAddress(notification.address)
+
+        if lightIdx != -1 and notification.kind in ["POWER", "CHANNEL"]: # keep the light's power/channel field up to date
+            powerChannel = list(availableLights[lightIdx][7]) + [None] * (2 - len(availableLights[lightIdx][7]))
+            powerChannel[0 if notification.kind == "POWER" else 1] = notification.value
+            availableLights[lightIdx][7] = powerChannel
+
+            # [6] is the one power state everything else reads - what the light says now beats whatever we last sent it
+            if notification.kind == "POWER" and notification.value != None and availableLights[lightIdx][6] != (notification.value == "ON"):
+                availableLights[lightIdx][6] = (notification.value == "ON")
+
+        for callbackFunction in subscribers:
+            try:
+                callbackFunction(notification)
+            except Exception as e:
+                printDebugString(f"Error in a light notification subscriber: {e}")
+
+    def subscribe(self, callbackFunction, address = None):
+        with self.lock:
+            self.subscribers.append([callbackFunction, address])
+
+    def unsubscribe(self, callbackFunction):
+        with self.lock:
+            self.subscribers = [subscriber for subscriber in self.subscribers if subscriber[0] != callbackFunction]
+
+    def latest(self, address, kind = None): # the newest reply from this light (of one kind, if kind is given)
+        with self.lock:
+            for notification in reversed(self.buffers.get(address, [])):
+                if kind == None or notification.kind == kind:
+                    return notification
+
+        return None
+
+    async def waitFor(self, address, kind, timeout = 1.0): # (runs on asyncioEventLoop) wait for the next reply of this kind from a light
+        replyFuture = asyncio.get_running_loop().create_future()
+
+        def gotReply(notification):
+            if notification.kind == kind and not replyFuture.done():
+                replyFuture.set_result(notification)
+
+        self.subscribe(gotReply, address)
+
+        try:
+            return await asyncio.wait_for(replyFuture, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self.unsubscribe(gotReply)
+
+notificationHub = lightNotificationHub()
+
+# IF A LIGHT SAYS IT'S IN STANDBY, THEN WHATEVER WE LAST SENT IT ISN'T WHAT IT'S SHOWING ANYMORE
+notificationHub.subscribe(lambda notification: forgetSentFrame(notification.address) if notification.kind == "POWER" and notification.value == "STANDBY" else None)
+
+async def startNotifications(lightEntry): # ask a newly linked light to send us its replies
+    try:
+        await lightEntry[1].start_notify(notifyLightUUID, notificationHub.handlerFor(lightEntry[0].address))
+    except Exception as e: # some lights don't have the notify characteristic, so we just won't get status from them
+        printDebugString(f"Couldn't start notifications from light {lightEntry[0].address}: {e}")
+
+async def queryLightStatus(lightIdx, timeout = 1.0): # (runs on asyncioEventLoop) ask a light for its power and channel status
+    lightEntry = availableLights[lightIdx]
+    address = lightEntry[0].address
+
+    for queryFrame, kind in [[[120, 133, 0, 253], "POWER"], [[120, 132, 0, 252], "CHANNEL"]]:
+        replyTask = asyncio.ensure_future(notificationHub.waitFor(address, kind, timeout)) # listen before asking, so a quick reply isn't missed
+        await asyncio.sleep(0)
+
+        try:
+            await writeFrameToLight(lightEntry, queryFrame, True, True)
+        except Exception as e:
+            printDebugString(f"Error asking light {address} for its {kind.lower()} status: {e}")
+
+        await replyTask
+
+    return availableLights[lightIdx][7]
+
+async def queryStatusSweep(): # (runs on asyncioEventLoop) ask every linked light that hasn't told us its power status lately for it
+    lightsToQuery = []
+
+    for lightIdx in range(len(availableLights)):
+        address = availableLights[lightIdx][0].address
+        lastReply = notificationHub.latest(address, "POWER")
+
+        if connectionManager.getState(address) == "LINKED" and (lastReply == None or time.time() - lastReply.time >= statusQueryInterval):
+            lightsToQuery.append(lightIdx)
+
+    await asyncio.gather(*[queryLightStatus(lightIdx) for lightIdx in lightsToQuery], return_exceptions=True)
+
+# =======================================================
+# = CONNECTION MANAGER (BACKGROUND RE-LINKING WITH BACKOFF)
+# =======================================================
+linkedStateText = {"UNLINKED": "NOT LINKED", "LINKING": "LINKING...", "LINKED": "LINKED", "RELINKING": "RE-LINKING..."}
+reconnectBaseDelay = 0.5 # the delay (in seconds) before the first re-link attempt - doubled after every failed attempt
+reconnectMaxDelay = 30 # the longest delay (in seconds) between 2 re-link attempts
+healthCheckInterval = 5 # how often (in seconds) to check that every linked light is still linked
+statusQueryInterval = 30 # how often (in seconds) to ask the linked lights for their power and channel status
+
+def findLightByAddress(address): # return the index in availableLights of the light with this address (or -1 if it isn't there)
+    return registry.indexOf(address)
+
+class lightConnectionManager:
+    def __init__(self):
+        self.states = {} # the connection state of each light (keyed by address) - UNLINKED, LINKING, LINKED or RELINKING
+        self.relinkTasks = {} # the background re-linking task for each light that's been dropped
+        self.unlinkRequested = set() # lights we disconnected on purpose (so they shouldn't be re-linked)
+        self.stateListeners = [] # functions to call with (address, state) whenever a light's state changes
+        self.healthCheckTask = None
+
+    def addStateListener(self, listenerFunction):
+        self.stateListeners.append(listenerFunction)
+
+    def getState(self, address):
+        return self.states.get(address, "UNLINKED")
+
+    def isRelinking(self, address):
+        return self.states.get(address) in ["LINKING", "RELINKING"]
+
+    def setState(self, address, state):
+        if self.states.get(address) != state:
+            self.states[address] = state
+
+            for listenerFunction in self.stateListeners:
+                try:
+                    listenerFunction(address, state)
+                except Exception as e:
+                    printDebugString(f"Error telling a listener that {address} is now {state}: {e}")
+
+    async def linkLight(self, lightIdx): # (runs on asyncioEventLoop) try to link to a light once - if that fails, keep trying in the background
+        lightEntry = availableLights[lightIdx]
+        address = lightEntry[0].address
+        self.unlinkRequested.discard(address)
+
+        if self.getState(address) == "LINKED" and lightEntry[1] != "" and lightEntry[1].is_connected:
+            return True
+
+        if self.isRelinking(address): # another link attempt (from the link queue, or the background re-linking) is already running
+            return False
+
+        self.setState(address, "LINKING")
+
+        if await self.tryLinking(lightEntry) == True:
+            return True
+        else:
+            self.startRelinking(lightEntry)
+            return False
+
+    async def tryLinking(self, lightEntry):
+        address = lightEntry[0].address
+
+        if lightEntry[1] != "" and lightEntry[1] != None and lightEntry[1].is_connected: # (linked already - don't connect the same client twice)
+            if self.getState(address) != "LINKED":
+                self.setState(address, "LINKED")
+                writeQueue.resumeLight(lightEntry)
+
+            return True
+
+        try:
+            if lightEntry[1] == "" or lightEntry[1] == None: # make a client for this light (the same client is re-used after that)
+                # (bleak's own BLEDevice links faster, as bleak doesn't have to find the light again - the address is for lights that haven't advertised yet)
+                bleakDevice = lightEntry[0].device if lightEntry[0].device != None else address
+                lightEntry[1] = BleakClient(bleakDevice, disconnected_callback=lambda client: self.onDisconnect(address))
+
+            await lightEntry[1].connect()
+        except Exception as e:
+            printDebugString(f"Error linking to light {address}: {e}")
+            return False
+
+        if lightEntry[1].is_connected:
+            if address not in writeWithoutResponse:
+                detectWriteCapability(lightEntry)
+
+            forgetSentFrame(address) # the light may have been reset (or changed from its own panel) while it was unlinked
+            await startNotifications(lightEntry)
+            self.setState(address, "LINKED")
+            writeQueue.resumeLight(lightEntry) # send anything that was held while the light was re-linking
+            asyncio.ensure_future(queryLightStatus(findLightByAddress(address))) # find out if the light is on (without holding up the link)
+            return True
+        else:
+            return False
+
+    def onDisconnect(self, address): # called by bleak when a light drops - this can come in from another thread
+        if asyncioEventLoop != None and not asyncioEventLoop.is_closed():
+            asyncioEventLoop.call_soon_threadsafe(self.handleDisconnect, address)
+
+    def handleDisconnect(self, address): # (runs on asyncioEventLoop)
+        if address in self.unlinkRequested: # we asked for this light to be disconnected, so leave it that way
+            self.setState(address, "UNLINKED")
+            return
+
+        lightIdx = findLightByAddress(address)
+
+        if lightIdx != -1:
+            printDebugString(f"Light {address} dropped its link - re-linking in the background")
+            self.startRelinking(availableLights[lightIdx])
+
+    def startRelinking(self, lightEntry):
+        address = lightEntry[0].address
+
+        if address not in self.relinkTasks:
+            self.setState(address, "RELINKING")
+            self.relinkTasks[address] = asyncio.ensure_future(self.relink(lightEntry))
+
+    async def relink(self, lightEntry):
+        address = lightEntry[0].address
+        attempt = 0
+
+        try:
+            while address not in self.unlinkRequested:
+                # EXPONENTIAL BACKOFF WITH JITTER, SO A ROOM FULL OF LIGHTS DOESN'T ALL TRY TO RE-LINK AT THE SAME MOMENT
+                delay = min(reconnectMaxDelay, reconnectBaseDelay * (2 ** attempt)) * random.uniform(0.5, 1.5)
+                await asyncio.sleep(delay)
+
+                attempt += 1
+                printDebugString(f"Re-linking to light {address} (attempt {attempt})...")
+
+                if await self.tryLinking(lightEntry) == True:
+                    printDebugString(f"Light {address} is re-linked after {attempt} attempt(s)")
+                    return
+        finally:
+            del self.relinkTasks[address]
+
+        self.setState(address, "UNLINKED")
+
+    async def unlinkLight(self, lightIdx): # (runs on asyncioEventLoop) disconnect from a light on purpose
+        lightEntry = availableLights[lightIdx]
+        address = lightEntry[0].address
+        self.unlinkRequested.add(address)
+
+        if address in self.relinkTasks:
+            self.relinkTasks[address].cancel()
+
+        writeQueue.clearLight(address)
+
+        try:
+            if lightEntry[1] != "" and lightEntry[1] != None:
+                await lightEntry[1].disconnect()
+        except Exception as e:
+            printDebugString(f"Error unlinking from light {address}: {e}")
+
+        self.setState(address, "UNLINKED")
+
+    async def healthCheck(self): # catch lights that dropped without bleak telling us about it (and keep their power status fresh)
+        lastStatusSweep = time.perf_counter()
+
+        while True:
+            await asyncio.sleep(healthCheckInterval)
+
+            for lightEntry in availableLights[:]:
+                address = lightEntry[0].address
+
+                if self.getState(address) == "LINKED" and (lightEntry[1] == "" or not lightEntry[1].is_connected):
+                    self.handleDisconnect(address)
+
+            if time.perf_counter() - lastStatusSweep >= statusQueryInterval:
+                lastStatusSweep = time.perf_counter()
+                asyncio.ensure_future(queryStatusSweep()) # (in the background, so a slow light doesn't hold up the next health check)
+
+    def startHealthChecks(self): # (runs on asyncioEventLoop)
+        if self.healthCheckTask == None:
+            self.healthCheckTask = asyncio.ensure_future(self.healthCheck())
+
+    async def shutdown(self): # stop re-linking and disconnect from every light (when quitting)
+        if self.healthCheckTask != None:
+            self.healthCheckTask.cancel()
+
+        for lightIdx in range(len(availableLights)):
+            await self.unlinkLight(lightIdx)
+
+connectionManager = lightConnectionManager()
+
+def startLinking(selectedLights): # link to a list of lights (indexes into availableLights) from another thread
+    connectionFutures = []
+
+    for lightIdx in selectedLights:
+        connectionFutures.append(asyncio.run_coroutine_threadsafe(connectionManager.linkLight(lightIdx), asyncioEventLoop))
+
+    return connectionFutures
+
+# =======================================================
+# = STREAMING DISCOVERY (ADD LIGHTS AS THEY'RE SEEN)
+# =======================================================
+scanTime = 5 # how long (in seconds) a scan keeps listening for new lights
+lightDiscoveryListeners = [] # functions to call with (index in availableLights, whether or not it's a new light) when a light is seen
+
+class UpdatedBLEInformation: # bleak's device for each light, along with the information bleak doesn't keep on it (the signal level, etc.)
+    def __init__(self, name, address, rssi, HWMACaddr = None, device = None):
+        self.device = device # bleak's BLEDevice from the last advertisement (None for lights from the discovery cache that haven't been seen yet)
+        self.name = name # the name shown for this light
+        self.realname = name # the name the light actually advertises
+        self.address = address # the MAC address (or on MacOS, the GUID) used to link to the light
+        self.rssi = rssi # the last signal level we heard from the light
+        self.HWMACaddr = HWMACaddr if HWMACaddr != None else address # the light's hardware MAC address (used in Infinity frames)
+
+def isNeewerLight(name, address): # whether or not an advertised device is a light we should add to the list
+    if address.upper() in [mac.upper() for mac in whiteListedMACs]:
+        return True
+
+    if name == None:
+        return False
+
+    return "NEEWER" in name.upper() or name.upper().startswith("NW-")
+
+def getInfinityMode(name, address = None): # Infinity lights advertise themselves as NW-(serial number)
+    for light in simulatedLights: # (--simulate) a simulated light says which protocol it uses, as Infinity-style lights can't be told apart by name
+        if light.address == address:
+            return light.protocol
+
+    if name != None and name.upper().startswith("NW-"):
+        return 1
+    else:
+        return 0
+
+def lightNameText(lightIdx): # the text shown in the "Light Name" column of the light table
+    if availableLights[lightIdx][2] != "": # if this light has a custom name, show that first
+        return availableLights[lightIdx][2] + " (" + availableLights[lightIdx][0].name + ")" + "\n  [ʀssɪ: " + str(availableLights[lightIdx][0].rssi) + " dBm]"
+    else:
+        return availableLights[lightIdx][0].name + "\n  [ʀssɪ: " + str(availableLights[lightIdx][0].rssi) + " dBm]"
+
+def addFoundLight(device, advertisementData): # (runs on asyncioEventLoop) add or update a light as soon as its advertisement comes in
+    name = advertisementData.local_name if advertisementData.local_name != None else device.name
+
+    if not isNeewerLight(name, device.address):
+        return
+
+    lightIdx = findLightByAddress(device.address)
+
+    if lightIdx != -1: # we already know about this light, so just keep its device, name and signal level up to date
+        registry.updateAdvertisement(availableLights[lightIdx], device, name, advertisementData.rssi)
+        isNewLight = False
+    else:
+        if name == None: # a whitelisted light that hasn't advertised a name yet, so show its address until it does
+            name = device.address
+
+        lightIdx = registry.addLight(lightRecord(UpdatedBLEInformation(name, device.address, advertisementData.rssi, device=device),
+                                                 cctRange=getLightSpecs(name, "temp"), cctOnly=getLightSpecs(name)[2], infinityMode=getInfinityMode(name, device.address)))
+        applyLightPrefs(lightIdx) # custom name, CCT range and CCT-only setting from the light preferences store
+        isNewLight = True
+
+        printDebugString(f"Found a new light - {name} [{device.address}] ({advertisementData.rssi} dBm)")
+
+        recordStartupTiming(device.address, "found")
+
+        if autoConnectToLights == True: # start linking to this light right away, instead of waiting for the scan to end
+            linkQueue.queueLink(lightIdx)
+
+    for listenerFunction in lightDiscoveryListeners:
+        listenerFunction(lightIdx, isNewLight)
+
+async def discoverLights(timeToScan = None): # (runs on asyncioEventLoop) scan for lights, adding them as they're seen
+    if timeToScan == None:
+        timeToScan = scanTime
+
+    lightsBeforeScan = len(availableLights)
+    startTime = time.perf_counter()
+
+    scanner = BleakScanner(detection_callback=addFoundLight)
+    await scanner.start()
+
+    try:
+        await asyncio.sleep(timeToScan)
+    finally:
+        await scanner.stop()
+
+    printDebugString(f"Scan finished in {time.perf_counter() - startTime:.2f} seconds - found {len(availableLights) - lightsBeforeScan} new light(s)")
+    return len(availableLights) - lightsBeforeScan
+
+def startDiscovery(timeToScan = None): # start a scan on asyncioEventLoop from another thread
+    return asyncio.run_coroutine_threadsafe(discoverLights(timeToScan), asyncioEventLoop)
+
+# =======================================================
+# = DISCOVERY CACHE (LINK TO KNOWN LIGHTS WITHOUT SCANNING FIRST)
+# =======================================================
+# Every light we've linked to is saved in this file, one light per line:
+# [MAC address/GUID]|[advertised name]|[last RSSI]|[Infinity mode - availableLights[n][8]]|[CCT range minimum],[CCT range maximum]|[failed links]
+discoveryCacheFile = os.path.dirname(os.path.abspath(sys.argv[0])) + os.sep + "light_prefs" + os.sep + "discoveredLights.prefs"
+useDiscoveryCache = simArgs.simulate == None # (simulated lights are never cached, so they can't end up in a real startup - and real ones aren't linked while simulating)
+discoveryCache = {} # the cached information for each light (keyed by address), loaded from discoveryCacheFile
+maxCachedLinkFailures = 3 # a cached light is dropped from the cache after running out of link attempts this many times in a row
+discoveryCacheWriter = None # the task writing discoveryCacheFile off of asyncioEventLoop (only one at a time, so writes never land out of order)
+discoveryCacheChanged = False # whether or not the cache has changed since the writer last took a copy of it
+
+def loadDiscoveryCache():
+    discoveryCache.clear()
+
+    if useDiscoveryCache == True and os.path.exists(discoveryCacheFile):
+        with open(discoveryCacheFile, mode="r", encoding="utf-8") as cacheFile:
+            for line in cacheFile.read().splitlines():
+                try:
+                    cacheEntry = line.split("|")
+
+                    if len(cacheEntry) == 5: # (caches saved before failed links were counted)
+                        cacheEntry.append("0")
+
+                    address, name, rssi, infinityMode, tempRange, linkFailures = cacheEntry
+                    discoveryCache[address] = [name, int(rssi), int(infinityMode), [int(x) for x in tempRange.split(",")], int(linkFailures)]
+                except ValueError: # skip any lines that aren't in the right format
+                    printDebugString(f"Skipping a malformed line in the discovery cache: {line}")
+
+    return discoveryCache
+
+def saveDiscoveryCache(): # (runs on asyncioEventLoop) write the cache out in the background, so the loop never waits on the disk
+    global discoveryCacheWriter, discoveryCacheChanged
+    discoveryCacheChanged = True
+
+    if discoveryCacheWriter == None or discoveryCacheWriter.done():
+        discoveryCacheWriter = asyncio.ensure_future(writeDiscoveryCache())
+
+async def writeDiscoveryCache():
+    global discoveryCacheChanged
+
+    while discoveryCacheChanged == True: # (if the cache changes while it's being written, write it again)
+        discoveryCacheChanged = False
+        cacheLines = [f"{address}|{name}|{rssi}|{infinityMode}|{tempRange[0]},{tempRange[1]}|{linkFailures}"
+                      for address, (name, rssi, infinityMode, tempRange, linkFailures) in discoveryCache.items()]
+
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, atomicWriteFile, discoveryCacheFile, cacheLines)
+        except Exception as e:
+            printDebugString(f"Error saving the discovery cache: {e}")
+
+def cacheLinkedLight(address, state): # (connection manager listener) remember every light that links successfully
+    if state == "LINKED":
+        lightIdx = findLightByAddress(address)
+
+        if lightIdx != -1:
+            newEntry = [availableLights[lightIdx][0].realname, availableLights[lightIdx][0].rssi, availableLights[lightIdx][8], list(availableLights[lightIdx][4]), 0]
+
+            if discoveryCache.get(address) != newEntry: # only re-write the file if something's actually changed
+                discoveryCache[address] = newEntry
+                saveDiscoveryCache()
+
+def cacheLinkFailed(address): # (runs on asyncioEventLoop) a light ran out of link attempts - forget it if it keeps happening (it's gone or moved away)
+    if address in discoveryCache:
+        discoveryCache[address][4] += 1
+
+        if discoveryCache[address][4] >= maxCachedLinkFailures:
+            del discoveryCache[address]
+            printDebugString(f"Couldn't link to light {address} {maxCachedLinkFailures} times in a row - dropping it from the discovery cache")
+
+        saveDiscoveryCache()
+
+if useDiscoveryCache == True:
+    connectionManager.addStateListener(cacheLinkedLight)
+
+def addCachedLights(): # add every light in the discovery cache to availableLights, returning the list of indexes added
+    addedLights = []
+
+    for address in loadDiscoveryCache():
+        if findLightByAddress(address) == -1:
+            name, rssi, infinityMode, tempRange, linkFailures = discoveryCache[address]
+            addedLights.append(registry.addLight(lightRecord(UpdatedBLEInformation(name, address, rssi), cctRange=tempRange, infinityMode=infinityMode)))
+            applyLightPrefs(addedLights[-1])
+            recordStartupTiming(address, "found")
+
+            for listenerFunction in lightDiscoveryListeners:
+                listenerFunction(len(availableLights) - 1, True)
+
+    return addedLights
+
+async def findLightsAtStartup(): # (runs on asyncioEventLoop) link to cached lights right away, while a scan looks for new (or moved) lights
+    global startupStartTime
+    startupStartTime = time.perf_counter()
+
+    cachedLights = addCachedLights()
+
+    if len(cachedLights) > 0:
+        printDebugString(f"Linking to {len(cachedLights)} light(s) from the discovery cache while scanning for new ones...")
+
+    scanTask = asyncio.ensure_future(discoverLights())
+
+    if autoConnectToLights == True:
+        for lightIdx in cachedLights:
+            linkQueue.queueLink(lightIdx)
+
+    await scanTask
+
+    if autoConnectToLights == True:
+        await linkQueue.waitUntilIdle() # wait for every light found (cached or scanned) to be linked (or to have run out of attempts)
+
+    printStartupTimings()
+
+# =======================================================
+# = BOUNDED-PARALLEL LINKING (WITH A STARTUP TIMING REPORT)
+# =======================================================
+maxConcurrentLinks = 3 # the maximum number of lights to link to at the same time (BlueZ adapters choke on too many at once)
+startupStartTime = time.perf_counter() # the time the current startup began (reset by findLightsAtStartup)
+startupTimings = {} # the time (in seconds since startupStartTime) each light was found, started linking, linked and was first written to
+
+def recordStartupTiming(address, event):
+    if address not in startupTimings:
+        startupTimings[address] = {"attempts": 0}
+
+    if event not in startupTimings[address]: # only keep the first time each event happened
+        startupTimings[address][event] = time.perf_counter() - startupStartTime
+
+        if event == "firstWrite":
+            printDebugString(f"First write to light {address} at +{startupTimings[address][event]:.2f} seconds")
+
+def printStartupTimings():
+    printDebugString(f"Startup timing for {len(startupTimings)} light(s) (linking {maxConcurrentLinks} at a time):")
+
+    for address in startupTimings:
+        lightTimes = startupTimings[address]
+        timeText = []
+
+        for event, description in [["found", "found"], ["linkStart", "link started"], ["linked", "linked"], ["firstWrite", "first write"]]:
+            if event in lightTimes:
+                timeText.append(f"{description} +{lightTimes[event]:.2f}s")
+            else:
+                timeText.append(f"{description} -")
+
+        if "linkStart" in lightTimes and "linked" in lightTimes:
+            timeText.append(f"(linking took {lightTimes['linked'] - lightTimes['linkStart']:.2f}s over {lightTimes['attempts']} attempt(s))")
+        elif lightTimes["attempts"] > 0:
+            timeText.append(f"(not linked after {lightTimes['attempts']} attempt(s))")
+
+        printDebugString(f" > {address}: " + ", ".join(timeText))
+
+class lightLinkQueue:
+    def __init__(self):
+        self.queue = None # the queue of lights (indexes into availableLights) waiting to be linked - made on asyncioEventLoop
+        self.workers = [] # the tasks doing the linking (at least maxConcurrentLinks of them - there can be more if the limit was lowered)
+        self.linkSlots = None # the workers wait on this until fewer than maxConcurrentLinks lights are linking - made on asyncioEventLoop
+        self.linking = 0 # the number of lights being linked right now
+        self.attempts = {} # the number of times we've tried to link to each light (keyed by address)
+
+    def queueLink(self, lightIdx): # (runs on asyncioEventLoop) add a light to the end of the queue
+        if self.queue == None:
+            self.queue = asyncio.Queue()
+            self.linkSlots = asyncio.Condition()
+            self.resize()
+
+        address = availableLights[lightIdx][0].address
+        connectionManager.unlinkRequested.discard(address)
+
+        if connectionManager.getState(address) not in ["LINKING", "LINKED", "RELINKING"]: # (a re-linking light already has a task trying to link it)
+            connectionManager.setState(address, "LINKING")
+            self.attempts[address] = 0
+            self.queue.put_nowait(lightIdx)
+
+    def resize(self): # (runs on asyncioEventLoop) start linking more (or fewer) lights at once after maxConcurrentLinks changes
+        if self.queue == None: # (nothing's been queued yet, so the workers will be made at the new size)
+            return
+
+        while len(self.workers) < max(1, maxConcurrentLinks):
+            self.workers.append(asyncio.ensure_future(self.linkWorker()))
+
+        asyncio.ensure_future(self.wakeWorkers()) # workers waiting for a slot check the new limit
+
+    async def wakeWorkers(self):
+        async with self.linkSlots:
+            self.linkSlots.notify_all()
+
+    async def linkWorker(self):
+        while True:
+            lightIdx = await self.queue.get()
+
+            try:
+                async with self.linkSlots: # wait for a free slot (checked here, so the limit can change while we're running)
+                    await self.linkSlots.wait_for(lambda: self.linking < max(1, maxConcurrentLinks))
+                    self.linking += 1
+
+                try:
+                    await self.tryLight(lightIdx)
+                finally:
+                    async with self.linkSlots:
+                        self.linking -= 1
+                        self.linkSlots.notify_all()
+            except Exception as e:
+                printDebugString(f"Error in the link queue: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def tryLight(self, lightIdx):
+        lightEntry = availableLights[lightIdx]
+        address = lightEntry[0].address
+
+        if address in connectionManager.unlinkRequested: # the light was unlinked while it was waiting in the queue
+            return
+
+        self.attempts[address] += 1
+        recordStartupTiming(address, "linkStart")
+        startupTimings[address]["attempts"] = self.attempts[address]
+
+        if await connectionManager.tryLinking(lightEntry) == True:
+            recordStartupTiming(address, "linked")
+        elif self.attempts[address] < maxNumOfAttempts: # put it at the back of the queue, so the lights behind it get their turn
+            printDebugString(f"Linking to light {address} failed (attempt {self.attempts[address]} of {maxNumOfAttempts}) - trying again later")
+            self.queue.put_nowait(lightIdx)
+        else: # we've run out of attempts here, so hand it over to the background re-linking
+            printDebugString(f"Couldn't link to light {address} after {maxNumOfAttempts} attempts - re-linking in the background")
+            cacheLinkFailed(address)
+            connectionManager.startRelinking(lightEntry)
+
+    async def waitUntilIdle(self):
+        if self.queue != None:
+            await self.queue.join()
+
+linkQueue = lightLinkQueue()
+
+# =======================================================
+# = LIGHT REGISTRY (TYPED LIGHT RECORDS, INDEXED BY ADDRESS AND NAME)
+# =======================================================
+class lightRecord:
+    # the fields, in the same order as the old positional availableLights[n] lists (so availableLights[n][2] still works)
+    fieldOrder = ("info", "client", "customName", "lastParams", "cctRange", "cctOnly", "isOn", "powerChannel", "infinityMode")
+    __slots__ = ("info", "client", "_customName", "lastParams", "cctRange", "cctOnly", "isOn", "powerChannel", "infinityMode", "registry")
+
+    def __init__(self, info, client = "", customName = "", lastParams = None, cctRange = None, cctOnly = False, isOn = False, powerChannel = None, infinityMode = 0):
+        self.registry = None # the registry this light is in (set when it's added, so custom name changes update the index)
+        self.info = info
+        self.client = client
+        self._customName = customName
+        self.lastParams = lastParams if lastParams != None else []
+        self.cctRange = cctRange if cctRange != None else [3200, 5600]
+        self.cctOnly = cctOnly
+        self.isOn = isOn
+        self.powerChannel = powerChannel if powerChannel != None else []
+        self.infinityMode = infinityMode
+
+    @property
+    def address(self):
+        return self.info.address
+
+    @property
+    def customName(self):
+        return self._customName
+
+    @customName.setter
+    def customName(self, newName):
+        if self.registry != None:
+            self.registry.renameLight(self, newName)
+        else:
+            self._customName = newName
+
+    def __getitem__(self, position):
+        return getattr(self, lightRecord.fieldOrder[position])
+
+    def __setitem__(self, position, value):
+        setattr(self, lightRecord.fieldOrder[position], value)
+
+        if self.registry != None and lightRecord.fieldOrder[position] != "customName": # (a new custom name already told the registry, through renameLight)
+            self.registry.listChanged(self)
+
+    def __len__(self):
+        return len(lightRecord.fieldOrder)
+
+    def __iter__(self):
+        return (getattr(self, fieldName) for fieldName in lightRecord.fieldOrder)
+
+class lightSortView: # one sort order of the lights (by RSSI, name, etc.), kept up to date as lights change instead of re-sorting
+    def __init__(self, sortKey):
+        self.sortKey = sortKey
+        self.entries = [] # sorted list of (sort key, position in availableLights)
+        self.keys = {} # position in availableLights -> the sort key it's filed under in self.entries
+
+    def update(self, position, record): # file (or re-file) one light under its current sort key
+        newKey = self.sortKey(record)
+
+        if position in self.keys:
+            if self.keys[position] == newKey: # nothing changed, so the light stays where it is
+                return
+
+            del self.entries[bisect_left(self.entries, (self.keys[position], position))]
+
+        insort(self.entries, (newKey, position))
+        self.keys[position] = newKey
+
+    def clear(self):
+        self.entries = []
+        self.keys = {}
+
+    def order(self, reverse = False): # the positions in availableLights, in sorted order
+        positions = [entry[1] for entry in self.entries]
+        return positions[::-1] if reverse == True else positions
+
+class lightRegistry:
+    def __init__(self, lightList):
+        self.lights = lightList # the ordered list of lights (this is the same list object as availableLights)
+        self.byAddress = {} # address (upper-case) -> light record
+        self.positions = {} # address (upper-case) -> position of the light in self.lights
+        self.byCustomName = {} # custom name (lower-case) -> light record
+        self.byName = {} # advertised name (lower-case) -> list of light records (more than one light can have the same name)
+        self.lock = threading.RLock() # the GUI, HTTP server and BLE thread can all change the registry
+        self.sortViews = {sortingField: lightSortView(lightSortingKeys[sortingField]) for sortingField in lightSortingKeys}
+        self.version = 0 # bumped every time a light is added, removed or renamed (so anything built from the list knows when to rebuild)
+        self.listVersion = 0 # bumped whenever anything shown in the light list changes (lights, names, signal levels, link states or last settings)
+        self.changeListeners = [] # functions to call with the light record (or None) whenever listVersion is bumped - these can run on any thread
+
+    def addLight(self, record): # add a light to the end of the list, returning its position
+        with self.lock:
+            address = record.address.upper()
+
+            if address in self.byAddress: # we already have this light, so don't add it twice
+                return self.positions[address]
+
+            # work out every index key before changing anything, so a bad record can't leave the list and indexes out of step
+            nameKey = record.info.name.lower()
+            customNameKey = record.customName.lower() if record.customName != "" else None
+
+            record.registry = self
+            self.lights.append(record)
+            self.byAddress[address] = record
+            self.positions[address] = len(self.lights) - 1
+            self.byName.setdefault(nameKey, []).append(record)
+
+            if customNameKey != None:
+                self.byCustomName[customNameKey] = record
+
+            self.version += 1 # (before telling the listeners, so they see the new version)
+            self.lightChanged(record)
+            return self.positions[address]
+
+    def removeLight(self, address):
+        with self.lock:
+            record = self.byAddress.pop(address.upper(), None)
+
+            if record != None:
+                self.lights.remove(record)
+                self.byName[record.info.name.lower()].remove(record)
+
+                if record.customName != "" and self.byCustomName.get(record.customName.lower()) == record:
+                    del self.byCustomName[record.customName.lower()]
+
+                record.registry = None
+                self.rebuildPositions()
+                self.version += 1
+                self.listChanged(record)
+
+            return record
+
+    def renameLight(self, record, newName): # change a light's custom name, and keep the custom name index up to date
+        with self.lock:
+            if record.customName != "" and self.byCustomName.get(record.customName.lower()) == record:
+                del self.byCustomName[record.customName.lower()]
+
+            record._customName = newName
+
+            if newName != "":
+                self.byCustomName[newName.lower()] = record
+
+            self.version += 1
+            self.lightChanged(record)
+
+    def updateAdvertisement(self, record, device, name, rssi): # a light we already know about advertised again
+        with self.lock:
+            record.info.device = device
+            record.info.rssi = rssi
+
+            if name != None and name != record.info.realname: # (lights from the discovery cache can have an older name)
+                self.byName[record.info.name.lower()].remove(record)
+                record.info.name = name
+                record.info.realname = name
+                self.byName.setdefault(name.lower(), []).append(record)
+                self.version += 1
+
+            self.lightChanged(record) # keep the RSSI sort view up to date
+
+    def lightChanged(self, record): # re-file a light in the sort views after its signal level/name changes
+        with self.lock:
+            position = self.positions.get(record.address.upper())
+
+            if position != None:
+                for sortView in self.sortViews.values():
+                    sortView.update(position, record)
+
+            self.listChanged(record)
+
+    def listChanged(self, record = None): # something shown in the light list changed, so any cached rendering of it is out of date
+        self.listVersion += 1
+
+        for listenerFunction in self.changeListeners:
+            listenerFunction(record)
+
+    def rebuildPositions(self): # (only needed when a light is removed, as lights never change places otherwise)
+        self.positions = {self.lights[a].address.upper(): a for a in range(len(self.lights))}
+
+        for sortView in self.sortViews.values():
+            sortView.clear()
+
+            for a in range(len(self.lights)):
+                sortView.update(a, self.lights[a])
+
+    def sortedOrder(self, sortingField, reverse = False): # the positions of the lights, in the order the light table should show them
+        with self.lock:
+            return self.sortViews[sortingField].order(reverse)
+
+    def get(self, address): # the light record for an address (or None)
+        return self.byAddress.get(address.upper())
+
+    def indexOf(self, address): # the position of a light in availableLights (or -1 if it isn't there)
+        return self.positions.get(address.upper(), -1)
+
+    def hasCustomNames(self):
+        return len(self.byCustomName) > 0
+
+    def resolve(self, lightName): # find the light(s) for an HTTP light= value - a MAC address/GUID, custom name, group name, light number or advertised name
+        lightName = lightName.strip()
+
+        if lightName.upper() in self.byAddress:
+            return [self.positions[lightName.upper()]]
+        elif lightName.lower() in self.byCustomName:
+            return [self.indexOf(self.byCustomName[lightName.lower()].address)]
+        elif lightName.lower() in getLightGroups(): # every light in a named group
+            return resolveLightGroup(lightName)
+        elif lightName.isdigit() and 1 <= int(lightName) <= len(self.lights): # the light's number in the list (starting from 1)
+            return [int(lightName) - 1]
+        elif lightName.lower() in self.byName: # every light with this advertised name
+            return [self.indexOf(record.address) for record in self.byName[lightName.lower()]]
+        else:
+            return []
+
+# the sort keys for MainWindow.sortByHeader (the numbers are the old sortingList positions)
+lightSortingKeys = {10: lambda record: record.info.rssi, 8: lambda record: record.info.name,
+                    2: lambda record: record.customName, 9: lambda record: record.info.address}
+
+registry = lightRegistry(availableLights)
+
+# =======================================================
+# = NAMED LIGHT GROUPS ("key", "fill", "back-wall", ETC.)
+# =======================================================
+# Every group is saved in this file, one group per line:
+# [group name]=[MAC address/GUID],[MAC address/GUID],...
+lightGroupsFile = os.path.dirname(os.path.abspath(sys.argv[0])) + os.sep + "light_prefs" + os.sep + "lightGroups.prefs"
+lightGroups = None # group name (lower-case) -> [group name, [member addresses]] - loaded from lightGroupsFile the first time it's needed
+resolvedGroups = {} # group name (lower-case) -> [registry.version, [indexes in availableLights]] - rebuilt only when the registry changes
+
+def loadLightGroups():
+    global lightGroups
+    lightGroups = {}
+    resolvedGroups.clear()
+
+    if os.path.exists(lightGroupsFile):
+        with open(lightGroupsFile, mode="r", encoding="utf-8") as groupsFile:
+            for line in groupsFile.read().splitlines():
+                if "=" in line:
+                    groupName, members = line.split("=", 1)
+                    lightGroups[groupName.strip().lower()] = [groupName.strip(), [x.strip().upper() for x in members.split(",") if x.strip() != ""]]
+                elif line.strip() != "":
+                    printDebugString(f"Skipping a malformed line in the light groups file: {line}")
+
+    return lightGroups
+
+def saveLightGroups():
+    atomicWriteFile(lightGroupsFile, [f"{groupName}={','.join(members)}" for groupName, members in getLightGroups().values()])
+
+def getLightGroups():
+    if lightGroups == None:
+        loadLightGroups()
+
+    return lightGroups
+
+def setLightGroup(groupName, members): # make (or replace) a group - members can be anything light= accepts (addresses, custom names, numbers)
+    addresses = []
+
+    for member in members:
+        for lightIdx in registry.resolve(member):
+            if availableLights[lightIdx][0].address.upper() not in addresses:
+                addresses.append(availableLights[lightIdx][0].address.upper())
+
+    getLightGroups()[groupName.strip().lower()] = [groupName.strip(), addresses]
+    resolvedGroups.pop(groupName.strip().lower(), None)
+    saveLightGroups()
+
+    return addresses
+
+def deleteLightGroup(groupName):
+    if getLightGroups().pop(groupName.strip().lower(), None) != None:
+        resolvedGroups.pop(groupName.strip().lower(), None)
+        saveLightGroups()
+
+def resolveLightGroup(groupName): # the indexes in availableLights of every light in a group (that we know about right now)
+    groupName = groupName.strip().lower()
+
+    if groupName not in getLightGroups():
+        return []
+
+    if groupName not in resolvedGroups or resolvedGroups[groupName][0] != registry.version:
+        resolvedGroups[groupName] = [registry.version, [registry.indexOf(address) for address in lightGroups[groupName][1] if registry.indexOf(address) != -1]]
+
+    return resolvedGroups[groupName][1]
+
+def groupLightFrames(groupName, sendValue): # the [lightIdx, frame] list for a fan-out to every linked light in a group
+    return [[lightIdx, getFrameForLight(lightIdx, sendValue)] for lightIdx in resolveLightGroup(groupName)
+            if connectionManager.getState(availableLights[lightIdx][0].address) == "LINKED"]
+
+async def fanOutToLightGroup(lightFrames, sendValue): # (runs on asyncioEventLoop) write to every light in a group at once
+    report = await fanOutToLights(lightFrames)
+
+    for lightIdx, frame in lightFrames: # remember what each light was sent (only the ones that got it)
+        if report["latencies"].get(availableLights[lightIdx][0].address) != None:
+            recordSentValue(lightIdx, list(sendValue))
+
+    return report
+
+def sendToLightGroup(groupName, sendValue): # send one command to a whole group from any thread, as a single concurrent fan-out
+    lightFrames = groupLightFrames(groupName, sendValue)
+
+    if len(lightFrames) == 0:
+        printDebugString(f"None of the lights in the group \"{groupName}\" are linked right now")
+        return None
+
+    return asyncio.run_coroutine_threadsafe(fanOutToLightGroup(lightFrames, sendValue), asyncioEventLoop)
+
+# =======================================================
+# = COMPILED PRESETS (TIME-ALIGNED RECALL ACROSS LIGHTS)
+# =======================================================
+presetSkewTarget = 0.05 # the most time (in seconds) we want between the first and last light changing when a preset is recalled
+maxCompiledPresets = 64 # the number of compiled snapshot presets kept around (the least recently used ones are thrown out first)
+compiledPresets = OrderedDict() # ("slot"/"library", number) -> [copy of the preset, registry.version, (Infinity mode, CCT-only) of its lights, [[lightIdx, frame], ...]]
+compiledPresetsLock = threading.Lock() # presets are compiled (and thrown out) from the GUI, the HTTP server and asyncioEventLoop
+
+def compilePresetData(presetKey, thePreset, selectedLights = None): # return the ready-to-send [lightIdx, frame] list for a preset
+    if thePreset[0][0] == -1: # a global preset has the same settings for every light, so it goes to the lights asked for (or all of them)
+        if selectedLights == None:
+            selectedLights = range(len(availableLights))
+
+        return [[lightIdx, getFrameForLight(lightIdx, thePreset[0][1])] for lightIdx in selectedLights]
+
+    # A SNAPSHOT PRESET HAS SETTINGS FOR EACH LIGHT - ONLY RE-COMPILE IT IF THE PRESET OR THE LIST OF LIGHTS HAS CHANGED SINCE LAST TIME
+    with compiledPresetsLock:
+        compiledPreset = compiledPresets.get(presetKey)
+
+        if compiledPreset == None or compiledPreset[0] != thePreset or compiledPreset[1] != registry.version or \
+           compiledPreset[2] != [(availableLights[lightIdx][8], availableLights[lightIdx][5]) for lightIdx, frame in compiledPreset[3]]:
+            lightFrames = []
+
+            for address, presetValue in thePreset:
+                lightIdx = registry.indexOf(address)
+
+                if lightIdx != -1: # skip lights in the preset that we don't know about right now
+                    lightFrames.append([lightIdx, getFrameForLight(lightIdx, presetValue)])
+
+            compiledPreset = [[[address, list(presetValue)] for address, presetValue in thePreset], registry.version,
+                              [(availableLights[lightIdx][8], availableLights[lightIdx][5]) for lightIdx, frame in lightFrames], lightFrames]
+            compiledPresets[presetKey] = compiledPreset
+
+            if len(compiledPresets) > maxCompiledPresets:
+                compiledPresets.popitem(last=False)
+        else:
+            compiledPresets.move_to_end(presetKey)
+
+        return compiledPreset[3]
+
+def compilePreset(numOfPreset, selectedLights = None): # compile one of the 8 custom preset slots
+    return compilePresetData(("slot", numOfPreset), customLightPresets[numOfPreset], selectedLights)
+
+def compileAllPresets(): # compile every snapshot preset ahead of time, so the first recall doesn't have to
+    global compiledRegistryVersion
+    compiledRegistryVersion = registry.version
+
+    for numOfPreset in range(len(customLightPresets)):
+        if customLightPresets[numOfPreset][0][0] != -1:
+            compilePreset(numOfPreset)
+
+compiledRegistryVersion = -1 # the registry.version the preset buttons were last compiled against
+presetCompileScheduled = False # whether or not a re-compile is already waiting to run on asyncioEventLoop
+
+def schedulePresetCompile(record = None): # (a registry change listener - can run on any thread) re-compile the presets after lights are added, removed or renamed
+    global presetCompileScheduled
+
+    if registry.version == compiledRegistryVersion or presetCompileScheduled == True:
+        return
+
+    if asyncioEventLoop != None and not asyncioEventLoop.is_closed(): # (one re-compile for a burst of changes, like a scan finding many lights)
+        presetCompileScheduled = True
+        asyncioEventLoop.call_soon_threadsafe(runScheduledPresetCompile)
+
+def runScheduledPresetCompile():
+    global presetCompileScheduled
+    presetCompileScheduled = False
+    compileAllPresets()
+
+registry.changeListeners.append(schedulePresetCompile)
+
+async def recallPresetBurst(presetName, lightFrames, lightValues): # (runs on asyncioEventLoop) write a compiled preset to every light at once
+    # lightValues is the sendValue each light is being sent (keyed by lightIdx), remembered for the lights that actually change
+    # PRE-STAGE THE BURST - ONLY LINKED LIGHTS, AND NOTHING OLDER LEFT IN THE WRITE QUEUE THAT COULD LAND AFTER THE PRESET
+    lightFrames = [[lightIdx, frame] for lightIdx, frame in lightFrames if connectionManager.getState(availableLights[lightIdx][0].address) == "LINKED"]
+
+    if len(lightFrames) == 0:
+        printDebugString(f"None of the lights in {presetName} are linked right now")
+        return None
+
+    for lightIdx, frame in lightFrames:
+        writeQueue.clearLight(availableLights[lightIdx][0].address)
+
+    report = await fanOutToLights(lightFrames, len(lightFrames)) # every light gets its frame at the same time (no concurrency limit)
+
+    for lightIdx, frame in lightFrames: # remember the last parameters sent to each light (only the ones that got them)
+        if report["latencies"].get(availableLights[lightIdx][0].address) != None:
+            recordSentValue(lightIdx, list(lightValues[lightIdx]))
+
+    printDebugString(f"Recalled {presetName} on {len(lightFrames)} light(s) - skew between the first and last light: {report['spread'] * 1000:.1f}ms")
+
+    if report["spread"] > presetSkewTarget:
+        printDebugString(f"That's more than the {presetSkewTarget * 1000:.0f}ms we aim for - the lights may have visibly changed one after the other")
+
+    return report
+
+def startPresetRecall(presetName, presetKey, thePreset, selectedLights = None): # recall a preset from any thread (the GUI, HTTP server, etc.)
+    if asyncioEventLoop == None or asyncioEventLoop.is_closed():
+        printDebugString(f"Can't recall {presetName}, as the Bluetooth loop isn't running")
+        return None
+
+    lightFrames = compilePresetData(presetKey, thePreset, selectedLights)
+    presetValues = {str(address).upper(): presetValue for address, presetValue in thePreset}
+
+    lightValues = {lightIdx: presetValues.get("-1", presetValues.get(availableLights[lightIdx][0].address.upper())) for lightIdx, frame in lightFrames}
+
+    return asyncio.run_coroutine_threadsafe(recallPresetBurst(presetName, lightFrames, lightValues), asyncioEventLoop)
+
+def recallCustomPreset(numOfPreset, selectedLights = None): # recall one of the 8 preset buttons
+    return startPresetRecall(f"preset {(currentPresetBank * presetBankSize) + numOfPreset + 1}", ("slot", numOfPreset), customLightPresets[numOfPreset], selectedLights)
+
+# =======================================================
+# = PRESET LIBRARY (AS MANY PRESETS AS YOU WANT, STORED IN SQLITE)
+# =======================================================
+presetLibraryFile = os.path.dirname(os.path.abspath(sys.argv[0])) + os.sep + "light_prefs" + os.sep + "presetLibrary.db"
+presetBankSize = 8 # the number of preset buttons - each "bank" is the next 8 presets in the library
+currentPresetBank = 0 # the bank shown on the preset buttons (bank 0 is presets 1-8, bank 1 is presets 9-16, etc.)
+presetBankLoaded = False # whether or not the preset buttons have been loaded from the library yet (if not, there's nothing to save back)
+sessionPresets = {} # with rememberPresetsOnExit off, the changes made to the preset buttons (preset number -> preset) - only kept until we quit
+
+def parseOldCustomPreset(presetText): # one preset from customLightPresetsFile - [[-1, sendValue]] (global) or [[address, sendValue], ...] (snapshot)
+    if presetText.startswith("["): # saved as a list
+        presetEntries = ast.literal_eval(presetText)
+    else: # saved as entries split by ; - each one is [-1 or address]|[sendValue, split by commas] (or just the sendValue for a global preset)
+        presetEntries = [presetEntry.split("|", 1) if "|" in presetEntry else ["-1", presetEntry] for presetEntry in presetText.split(";") if presetEntry.strip() != ""]
+        presetEntries = [[presetEntry[0].strip(), [int(x) for x in presetEntry[1].strip("[] ").split(",")]] for presetEntry in presetEntries]
+
+    thePreset = []
+
+    for address, presetValue in presetEntries:
+        presetValue = [int(x) for x in presetValue]
+
+        if presetValue[0] != 120: # (some older presets were saved without the 120 every command starts with)
+            presetValue = [120] + presetValue
+
+        if presetValue[1] not in [135, 134, 136, 129]:
+            raise ValueError(f"{presetValue} isn't a light command")
+
+        thePreset.append([-1 if str(address).strip() == "-1" else str(address).strip(), presetValue])
+
+    if len(thePreset) == 0 or (thePreset[0][0] == -1 and len(thePreset) > 1):
+        raise ValueError("a preset needs either one global setting, or a setting for each light")
+
+    return thePreset
+
+def loadOldCustomPresets(): # {preset slot: preset} for the 8 presets saved in customLightPresetsFile (from before the preset library)
+    oldPresets = {}
+
+    if os.path.exists(customLightPresetsFile):
+        with open(customLightPresetsFile, mode="r", encoding="utf-8") as presetsFile:
+            presetLines = [line.strip() for line in presetsFile.read().splitlines() if line.strip() != "" and not line.startswith("numOfPresets=")]
+
+        for a in range(len(presetLines)):
+            presetSlot, presetText = a, presetLines[a]
+
+            if presetText.startswith("customPreset") and "=" in presetText: # customPreset[slot]=[preset]
+                presetSlot, presetText = presetText.split("=", 1)
+                presetSlot = int(presetSlot.replace("customPreset", "")) if presetSlot.replace("customPreset", "").isdigit() else a
+
+            try:
+                thePreset = parseOldCustomPreset(presetText.strip())
+            except (ValueError, SyntaxError, TypeError, IndexError) as e: # skip anything that isn't in a format we know
+                printDebugString(f"Skipping preset {presetSlot + 1} in {customLightPresetsFile}: {e}")
+                continue
+
+            if presetSlot < len(defaultLightPresets) and thePreset != defaultLightPresets[presetSlot]:
+                oldPresets[presetSlot] = thePreset
+
+    return oldPresets
+
+class presetLibrary:
+    def __init__(self, fileName, cacheSize = 128):
+        self.fileName = fileName
+        self.cacheSize = cacheSize # the number of presets kept in memory (the least recently used ones are thrown out first)
+        self.cache = OrderedDict() # preset number -> [name, preset]
+        self.connection = None # opened the first time the library is used
+        self.lock = threading.Lock() # the GUI, HTTP server and BLE thread can all use the library
+
+    def connect(self):
+        if self.connection == None:
+            os.makedirs(os.path.dirname(self.fileName), exist_ok=True)
+            isNewLibrary = not os.path.exists(self.fileName)
+
+            self.connection = sqlite3.connect(self.fileName, check_same_thread=False)
+            self.connection.execute("CREATE TABLE IF NOT EXISTS presets (number INTEGER PRIMARY KEY, name TEXT, preset TEXT NOT NULL)")
+            self.connection.execute("CREATE UNIQUE INDEX IF NOT EXISTS presetNames ON presets (name COLLATE NOCASE)")
+
+            if isNewLibrary: # start the library off with the presets saved before there was a library (or the 8 presets we already have)
+                startingPresets = loadOldCustomPresets()
+
+                for a in range(len(customLightPresets)):
+                    if a not in startingPresets and customLightPresets[a] != defaultLightPresets[a]:
+                        startingPresets[a] = customLightPresets[a]
+
+                for a in sorted(startingPresets):
+                    self.connection.execute("INSERT INTO presets (number, preset) VALUES (?, ?)", (a + 1, json.dumps(startingPresets[a])))
+
+                if len(startingPresets) > 0:
+                    printDebugString(f"Started the preset library with {len(startingPresets)} saved custom preset(s)")
+
+            self.connection.commit()
+
+        return self.connection
+
+    def findNumber(self, presetKey): # the number of a preset, from either its number or its name (or None if there isn't one)
+        if isinstance(presetKey, int) or str(presetKey).strip().isdigit():
+            return int(presetKey)
+
+        with self.lock:
+            foundPreset = self.connect().execute("SELECT number FROM presets WHERE name = ? COLLATE NOCASE", (str(presetKey).strip(),)).fetchone()
+
+        return foundPreset[0] if foundPreset != None else None
+
+    def getPreset(self, presetKey): # [number, name, preset] for a preset number or name (or None if there isn't one)
+        presetNum = self.findNumber(presetKey)
+
+        if presetNum == None:
+            return None
+
+        with self.lock:
+            if presetNum in self.cache:
+                self.cache.move_to_end(presetNum)
+            else:
+                foundPreset = self.connect().execute("SELECT name, preset FROM presets WHERE number = ?", (presetNum,)).fetchone()
+
+                if foundPreset == None:
+                    return None
+
+                self.cache[presetNum] = [foundPreset[0], json.loads(foundPreset[1])]
+
+                if len(self.cache) > self.cacheSize:
+                    self.cache.popitem(last=False)
+
+            return [presetNum, self.cache[presetNum][0], [[presetEntry[0], list(presetEntry[1])] for presetEntry in self.cache[presetNum][1]]]
+
+    def savePreset(self, presetNum, thePreset, presetName = None): # add (or replace) a preset - the name is kept if one isn't given
+        with self.lock:
+            self.connect().execute("INSERT INTO presets (number, name, preset) VALUES (?, ?, ?) " \
+                                   "ON CONFLICT(number) DO UPDATE SET preset = excluded.preset, name = COALESCE(excluded.name, presets.name)",
+                                   (presetNum, presetName, json.dumps(thePreset)))
+            self.connection.commit()
+            self.cache.pop(presetNum, None)
+
+    def renamePreset(self, presetNum, presetName): # (a name of "" takes the name off of the preset)
+        presetName = presetName.strip()
+
+        if presetName.isdigit(): # (a name made of digits would be read as a preset number instead)
+            raise ValueError(f"A preset can't be called {presetName}, as that's a preset number")
+
+        with self.lock:
+            try:
+                self.connect().execute("UPDATE presets SET name = ? WHERE number = ?", (presetName if presetName != "" else None, presetNum))
+                self.connection.commit()
+            except sqlite3.IntegrityError: # the names are unique (ignoring case)
+                self.connection.rollback()
+                raise ValueError(f"There's already another preset called {presetName}")
+
+            self.cache.pop(presetNum, None)
+
+    def deletePreset(self, presetNum):
+        with self.lock:
+            self.connect().execute("DELETE FROM presets WHERE number = ?", (presetNum,))
+            self.connection.commit()
+            self.cache.pop(presetNum, None)
+
+        with compiledPresetsLock:
+            compiledPresets.pop(("library", presetNum), None)
+
+    def nextFreeNumber(self): # the number after the highest preset in the library
+        with self.lock:
+            return self.connect().execute("SELECT COALESCE(MAX(number), 0) + 1 FROM presets").fetchone()[0]
+
+    def listPresets(self, firstNum = 1, lastNum = None): # [[number, name], ...] for the presets between firstNum and lastNum
+        with self.lock:
+            return [list(foundPreset) for foundPreset in self.connect().execute("SELECT number, name FROM presets WHERE number >= ? AND number <= ? ORDER BY number",
+                                                                                (firstNum, lastNum if lastNum != None else sys.maxsize))]
+
+library = presetLibrary(presetLibraryFile)
+
+def recallLibraryPreset(presetKey, selectedLights = None): # recall any preset in the library by its number or name, from any thread
+    foundPreset = library.getPreset(presetKey)
+
+    if foundPreset == None:
+        printDebugString(f"There isn't a preset called {presetKey} in the preset library")
+        return None
+
+    presetName = f"preset {foundPreset[0]}" + (f" ({foundPreset[1]})" if foundPreset[1] != None else "")
+    return startPresetRecall(presetName, ("library", foundPreset[0]), foundPreset[2], selectedLights)
+
+def presetListHTML(): # the table of every preset in the library (for ?list_presets)
+    tableRows = [f"<tr><td>{presetNum}</td><td>{escapeHTML(presetName) if presetName != None else ''}</td></tr>" for presetNum, presetName in library.listPresets()]
+    return "<table border=1 cellpadding=4><tr><th>#</th><th>Name</th></tr>" + "".join(tableRows) + "</table>"
+
+def savePresetBank(): # put any changes made to the 8 preset buttons back into the library
+    if presetBankLoaded == False: # (the buttons still have the default presets, which would write over the ones in the library)
+        return
+
+    for slot in range(presetBankSize):
+        presetNum = (currentPresetBank * presetBankSize) + slot + 1
+
+        if rememberPresetsOnExit == False: # the changes only last until we quit, so keep them out of the library
+            sessionPresets[presetNum] = json.loads(json.dumps(customLightPresets[slot]))
+            continue
+
+        storedPreset = library.getPreset(presetNum)
+
+        if customLightPresets[slot] != (storedPreset[2] if storedPreset != None else defaultLightPresets[slot]):
+            library.savePreset(presetNum, customLightPresets[slot])
+
+def loadPresetBank(bankNum, saveCurrentBank = True): # show a different set of 8 presets from the library on the preset buttons
+    global currentPresetBank, presetBankLoaded
+
+    if saveCurrentBank == True:
+        savePresetBank()
+
+    currentPresetBank = max(0, bankNum)
+
+    for slot in range(presetBankSize): # presets that aren't in the library yet show up as the default preset for that button
+        presetNum = (currentPresetBank * presetBankSize) + slot + 1
+
+        if presetNum in sessionPresets: # (changed this session, with rememberPresetsOnExit off)
+            customLightPresets[slot] = json.loads(json.dumps(sessionPresets[presetNum]))
+            continue
+
+        storedPreset = library.getPreset(presetNum)
+        customLightPresets[slot] = storedPreset[2] if storedPreset != None else json.loads(json.dumps(defaultLightPresets[slot]))
+
+    presetBankLoaded = True
+    compileAllPresets()
+
+def storeBankPreset(slot): # write one of the 8 preset buttons to the library as soon as it's changed, so it's never recalled (or loaded) stale
+    presetNum = (currentPresetBank * presetBankSize) + slot + 1
+
+    if rememberPresetsOnExit == False: # the change only lasts until we quit
+        sessionPresets[presetNum] = json.loads(json.dumps(customLightPresets[slot]))
+        return
+
+    if customLightPresets[slot] == defaultLightPresets[slot]: # a cleared button shows the default preset, which doesn't need to be in the library
+        if library.getPreset(presetNum) != None:
+            library.deletePreset(presetNum)
+    else:
+        library.savePreset(presetNum, customLightPresets[slot])
+
+def saveCustomPreset(numOfPreset, thePreset): # save a preset to one of the 8 preset buttons ([[-1, sendValue]] for global, [[address, sendValue], ...] for snapshot)
+    customLightPresets[numOfPreset] = thePreset
+    storeBankPreset(numOfPreset)
+    compileAllPresets()
+
+def clearCustomPreset(numOfPreset): # put one of the 8 preset buttons back to its default preset
+    customLightPresets[numOfPreset] = json.loads(json.dumps(defaultLightPresets[numOfPreset]))
+    storeBankPreset(numOfPreset)
+
+# =======================================================
+# = LIGHT PREFERENCES STORE (ONE FILE FOR EVERY LIGHT'S CUSTOM SETTINGS)
+# =======================================================
+# Every light with custom settings is saved in this file, one light per line:
+# [MAC address/GUID]|[custom name]|[CCT range minimum],[CCT range maximum]|[CCT only - 0 or 1]
+lightPrefsFile = os.path.dirname(os.path.abspath(sys.argv[0])) + os.sep + "light_prefs" + os.sep + "lightPrefs.prefs"
+lightPrefsSaveDelay = 1.0 # how long (in seconds) to wait after a change before writing the file, so a burst of changes is one write
+lightPrefsStore = None # address (upper-case) -> [custom name, [CCT range minimum, maximum], CCT only] - read once, the first time it's needed
+lightPrefsLock = threading.RLock() # (re-entrant, as the first load can write the file while holding it)
+lightPrefsTimer = None # the pending (debounced) write of lightPrefsFile
+
+def loadLightPrefsStore():
+    global lightPrefsStore
+    lightPrefsStore = {}
+
+    if os.path.exists(lightPrefsFile):
+        with open(lightPrefsFile, mode="r", encoding="utf-8") as prefsFile:
+            for line in prefsFile.read().splitlines():
+                try:
+                    # (the custom name is the only field that can have a | in it, so split the fields around it off from each end)
+                    address, lineRest = line.split("|", 1)
+                    customName, tempRange, cctOnly = lineRest.rsplit("|", 2)
+                    lightPrefsStore[address.upper()] = [customName, [int(x) for x in tempRange.split(",")], cctOnly == "1"]
+                except ValueError: # skip any lines that aren't in the right format
+                    printDebugString(f"Skipping a malformed line in the light preferences file: {line}")
+    elif os.path.isdir(os.path.dirname(lightPrefsFile)): # the first time through, bring in the old one-file-per-light preferences
+        for fileName in os.listdir(os.path.dirname(lightPrefsFile)):
+            if len(fileName) in [12, 32] and all(x in "0123456789ABCDEFabcdef" for x in fileName): # old files are named after the light's address
+                try:
+                    with open(os.path.dirname(lightPrefsFile) + os.sep + fileName, mode="r", encoding="utf-8") as oldPrefsFile:
+                        oldPrefs = oldPrefsFile.read().splitlines()[0].split("|")
+
+                    if len(fileName) == 12: # a MAC address
+                        address = ":".join(fileName[a:a + 2] for a in range(0, 12, 2)).upper()
+                    else: # a MacOS GUID
+                        address = "-".join([fileName[0:8], fileName[8:12], fileName[12:16], fileName[16:20], fileName[20:32]]).upper()
+
+                    tempRange = [int(x) for x in oldPrefs[1].strip("[] ").split(",")] if len(oldPrefs) > 1 and oldPrefs[1].strip("[] ") != "" else [3200, 5600]
+                    lightPrefsStore[address] = [oldPrefs[0], tempRange, len(oldPrefs) > 2 and oldPrefs[2].strip() in ["1", "True"]]
+                except Exception as e:
+                    printDebugString(f"Couldn't bring in the old preferences file {fileName}: {e}")
+
+        if len(lightPrefsStore) > 0:
+            printDebugString(f"Moved the preferences for {len(lightPrefsStore)} light(s) into {lightPrefsFile}")
+            writeLightPrefsStore()
+
+    return lightPrefsStore
+
+def getLightPrefsStore():
+    if lightPrefsStore == None:
+        loadLightPrefsStore()
+
+    return lightPrefsStore
+
+def writeLightPrefsStore():
+    global lightPrefsTimer
+
+    with lightPrefsLock:
+        lightPrefsTimer = None
+        prefsLines = [f"{address}|{customName}|{tempRange[0]},{tempRange[1]}|{1 if cctOnly else 0}"
+                      for address, (customName, tempRange, cctOnly) in getLightPrefsStore().items()]
+
+        atomicWriteFile(lightPrefsFile, prefsLines)
+
+def flushLightPrefs(): # write any pending changes right now (when quitting)
+    with lightPrefsLock:
+        pendingWrite = lightPrefsTimer
+
+    if pendingWrite != None:
+        pendingWrite.cancel()
+        writeLightPrefsStore()
+
+def saveLightPrefs(lightIdx, deleteFile = False): # store a light's custom settings (or take them out of the store if deleteFile is True)
+    global lightPrefsTimer
+    address = availableLights[lightIdx][0].address.upper()
+
+    with lightPrefsLock:
+        if deleteFile == True:
+            getLightPrefsStore().pop(address, None)
+        else:
+            getLightPrefsStore()[address] = [availableLights[lightIdx][2], list(availableLights[lightIdx][4]), availableLights[lightIdx][5] == True]
+
+        if lightPrefsTimer != None: # a write is already waiting - push it back, so this change is written along with it
+            lightPrefsTimer.cancel()
+
+        lightPrefsTimer = threading.Timer(lightPrefsSaveDelay, writeLightPrefsStore)
+        lightPrefsTimer.daemon = True
+        lightPrefsTimer.start()
+
+def applyLightPrefs(lightIdx): # give a newly added light its custom name, CCT range and CCT-only setting (if it has any)
+    with lightPrefsLock:
+        savedPrefs = getLightPrefsStore().get(availableLights[lightIdx][0].address.upper())
+
+    if savedPrefs != None:
+        availableLights[lightIdx][2] = savedPrefs[0]
+        availableLights[lightIdx][4] = list(savedPrefs[1])
+        availableLights[lightIdx][5] = savedPrefs[2]
+
+# =======================================================
+# = GLOBAL CONFIGURATION (TYPED, AND RELOADED WHEN THE PREFS FILE CHANGES)
+# =======================================================
+# [name in globalPrefsFile, type, default] - each setting is also the global variable of the same name
+globalConfigSchema = [
+    ["findLightsOnStartup", "bool", True],
+    ["autoConnectToLights", "bool", True],
+    ["printDebug", "bool", True],
+    ["rememberLightsOnExit", "bool", False],
+    ["rememberPresetsOnExit", "bool", True],
+    ["maxNumOfAttempts", "int", 6],
+    ["acceptable_HTTP_IPs", "list", ("127.0.0.1", "192.168.", "10.")],
+    ["whiteListedMACs", "list", ()],
+    ["enableTabsOnLaunch", "bool", False],
+    ["maxConcurrentWrites", "int", 8],
+    ["useFastWrites", "bool", True],
+    ["maxConcurrentLinks", "int", 3],
+    ["writeSuppressionTTL", "float", 10]
+    ]
+
+# the keyboard shortcuts, in customKeys order - [name in globalPrefsFile, default]
+shortcutKeySchema = [
+    ["SC_turnOffButton", "Ctrl+PgDown"], ["SC_turnOnButton", "Ctrl+PgUp"], ["SC_scanCommandButton", "Ctrl+Shift+S"], ["SC_tryConnectButton", "Ctrl+Shift+C"],
+    ["SC_Tab_CCT", "Alt+1"], ["SC_Tab_HSI", "Alt+2"], ["SC_Tab_SCENE", "Alt+3"], ["SC_Tab_PREFS", "Alt+4"],
+    ["SC_Dec_Bri_Small", "/"], ["SC_Inc_Bri_Small", "*"], ["SC_Dec_Bri_Large", "Ctrl+/"], ["SC_Inc_Bri_Large", "Ctrl+*"],
+    ["SC_Dec_1_Small", "7"], ["SC_Inc_1_Small", "9"], ["SC_Dec_2_Small", "4"], ["SC_Inc_2_Small", "6"], ["SC_Dec_3_Small", "1"], ["SC_Inc_3_Small", "3"],
+    ["SC_Dec_1_Large", "Ctrl+7"], ["SC_Inc_1_Large", "Ctrl+9"], ["SC_Dec_2_Large", "Ctrl+4"], ["SC_Inc_2_Large", "Ctrl+6"], ["SC_Dec_3_Large", "Ctrl+1"], ["SC_Inc_3_Large", "Ctrl+3"]
+    ]
+
+globalConfig = namedtuple("globalConfig", [setting[0] for setting in globalConfigSchema] + ["customKeys"]) # (immutable - lists are stored as tuples)
+configWatchInterval = 2 # how often (in seconds) to check globalPrefsFile for changes
+currentConfig = None # the globalConfig in effect right now
+configListeners = [] # functions called with (the old config, the new config, [names of the settings that changed]) after a reload
+
+def parseConfigValue(valueType, valueText):
+    if valueType == "bool":
+        if valueText.strip() not in ["0", "1", "True", "False", "true", "false"]:
+            raise ValueError(f"{valueText} isn't 0 or 1")
+
+        return valueText.strip() in ["1", "True", "true"]
+    elif valueType == "int":
+        return int(valueText)
+    elif valueType == "float":
+        return float(valueText)
+    else: # a list - kept as a tuple, so the config can't be changed behind our back
+        return tuple(x for x in valueText.strip().split(";") if x != "")
+
+def parseGlobalPrefs(prefsFile = None): # read the prefs file once, into a globalConfig (anything not in the file gets its default)
+    if prefsFile == None:
+        prefsFile = globalPrefsFile
+
+    settingTypes = {setting[0]: setting[1] for setting in globalConfigSchema}
+    shortcutKeys = {shortcutKeySchema[a][0]: a for a in range(len(shortcutKeySchema))}
+
+    configValues = {setting[0]: setting[2] for setting in globalConfigSchema}
+    keyValues = [shortcutKey[1] for shortcutKey in shortcutKeySchema]
+
+    if os.path.exists(prefsFile):
+        with open(prefsFile, mode="r", encoding="utf-8") as prefsFileToRead:
+            for line in prefsFileToRead.read().splitlines():
+                if "=" not in line:
+                    continue
+
+                settingName, valueText = line.split("=", 1)
+                settingName = settingName.strip()
+
+                if settingName in settingTypes:
+                    try:
+                        configValues[settingName] = parseConfigValue(settingTypes[settingName], valueText)
+                    except ValueError as e:
+                        printDebugString(f"Ignoring the value for {settingName} in the preferences file ({e}) - using the default instead")
+                elif settingName in shortcutKeys:
+                    keyValues[shortcutKeys[settingName]] = valueText.strip()
+                else:
+                    printDebugString(f"Ignoring an unknown setting in the preferences file: {settingName}")
+
+    return globalConfig(customKeys=tuple(keyValues), **configValues)
+
+def applyGlobalConfig(newConfig): # swap in the settings that changed (and only those), returning their names
+    global currentConfig
+    oldConfig = currentConfig
+
+    changedSettings = [settingName for settingName in globalConfig._fields if oldConfig == None or getattr(oldConfig, settingName) != getattr(newConfig, settingName)]
+
+    for settingName in changedSettings:
+        if settingName == "customKeys": # change the list in place, as the GUI holds on to it
+            customKeys[:] = list(newConfig.customKeys)
+        elif isinstance(getattr(newConfig, settingName), tuple):
+            globals()[settingName] = list(getattr(newConfig, settingName))
+        else:
+            globals()[settingName] = getattr(newConfig, settingName)
+
+    currentConfig = newConfig
+
+    if oldConfig != None and len(changedSettings) > 0:
+        printDebugString(f"Preferences file changed - applied the new value(s) for: {', '.join(changedSettings)}")
+
+        for listenerFunction in configListeners:
+            try:
+                listenerFunction(oldConfig, newConfig, changedSettings)
+            except Exception as e:
+                printDebugString(f"Error applying the new preferences: {e}")
+
+    return changedSettings
+
+def getPrefsFileStamp(): # what we compare to see if the prefs file has changed (None if there isn't one)
+    try:
+        fileStats = os.stat(globalPrefsFile)
+        return (fileStats.st_mtime_ns, fileStats.st_size)
+    except FileNotFoundError:
+        return None
+
+def watchGlobalPrefs(lastStamp):
+    while True:
+        time.sleep(configWatchInterval)
+        newStamp = getPrefsFileStamp()
+
+        if newStamp != lastStamp: # re-read the file if it's been changed, added or deleted (back to the defaults)
+            lastStamp = newStamp
+
+            try:
+                applyGlobalConfig(parseGlobalPrefs())
+            except Exception as e: # keep the settings we have if the file can't be read (it may be half-way through being saved)
+                printDebugString(f"Couldn't reload the preferences file: {e}")
+                lastStamp = None
+
+def resizeLinkQueue(oldConfig, newConfig, changedSettings): # (runs on the config watcher's thread)
+    if "maxConcurrentLinks" in changedSettings and asyncioEventLoop != None and not asyncioEventLoop.is_closed():
+        asyncioEventLoop.call_soon_threadsafe(linkQueue.resize)
+
+configListeners.append(resizeLinkQueue)
+
+def startConfigWatcher(): # load the preferences, then keep watching the file so changes are applied without restarting
+    lastStamp = getPrefsFileStamp()
+    applyGlobalConfig(parseGlobalPrefs())
+
+    threading.Thread(target=watchGlobalPrefs, args=(lastStamp,), name="configWatcher", daemon=True).start()
+
+# =======================================================
+# = HTTP SERVER (ASYNCIO, ON THE SAME LOOP AS THE LIGHTS)
+# =======================================================
+httpPort = 8080 # the port the HTTP server listens on
+httpRequestTimeout = 30 # how long (in seconds) to wait for a client to finish sending its request
+httpServer = None # the asyncio server, once it's running
+httpStatusText = {200: "OK", 304: "Not Modified", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+                  408: "Request Timeout", 409: "Conflict", 413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error"}
+maxHTTPBodySize = 1048576 # the largest request body we'll accept (1MB)
+httpKeepAliveTimeout = 5 # how long (in seconds) an idle keep-alive connection is held open waiting for the next request
+httpMaxKeepAliveRequests = 100 # how many requests one connection can make before we close it
+lightListCache = {} # list format ("html" or "json") -> [registry.listVersion it was made from, the rendered response, its ETag]
+lightListETagPrefix = f"{random.getrandbits(32):08x}" # so an ETag from before a restart never matches a list from after it
+streamTickInterval = 0.1 # how often (in seconds) the changes to the lights are gathered up and pushed to /events clients
+streamPingInterval = 15 # how often (in seconds) an idle /events client is sent a comment, so dead connections are found
+streamDrainTimeout = 10 # how long (in seconds) a slow /events client has to take its data before it's disconnected
+maxQueuedCommands = 64 # the most light commands that can be waiting at once before new ones get a 429 (power off/panic are always let in)
+commandPriorityNames = ["off", "power", "color"] # the priorities of queued commands, most urgent first
+
+def isAllowedHTTPClient(clientIP): # the client has to match one of the acceptable IPs (an entry like "192.168." matches 192.168.*.*)
+    return any(clientIP.startswith(acceptableIP) for acceptableIP in acceptable_HTTP_IPs if acceptableIP != "")
+
+def resolveLightList(lightNames): # the indexes in availableLights for a light= value (more than one light can be given, split by ;)
+    lightList = []
+
+    for lightName in lightNames.split(";"):
+        for lightIdx in registry.resolve(lightName):
+            if lightIdx not in lightList:
+                lightList.append(lightIdx)
+
+    return lightList
+
+def clampValue(valueName, valueText, minValue, maxValue):
+    try:
+        return max(minValue, min(maxValue, int(float(valueText))))
+    except ValueError:
+        raise ValueError(f"{valueName} has to be a number (not {valueText})")
+
+def buildSendValue(actionParams): # turn the mode= parameters of a doAction request into a sendValue list
+    colorMode = actionParams.get("mode", "CCT").upper()
+
+    if colorMode == "CCT":
+        colorTemp = clampValue("temp", actionParams.get("temp", "56"), 0, 10000)
+        colorTemp = colorTemp // 100 if colorTemp > 100 else colorTemp # the temperature can be given as 5600 or 56
+
+        return [120, 135, 2, clampValue("bri", actionParams.get("bri", "100"), 0, 100), max(25, colorTemp), clampValue("gm", actionParams.get("gm", "50"), 0, 100)]
+    elif colorMode == "HSI":
+        hue = clampValue("hue", actionParams.get("hue", "240"), 0, 360)
+        return [120, 134, 4, hue & 255, hue >> 8, clampValue("sat", actionParams.get("sat", "100"), 0, 100), clampValue("bri", actionParams.get("bri", "100"), 0, 100)]
+    elif colorMode in ["ANM", "SCENE"]:
+        return [120, 136, 2, clampValue("bri", actionParams.get("bri", "100"), 0, 100), clampValue("scene", actionParams.get("scene", actionParams.get("animation", "1")), 1, 18)]
+    elif colorMode in ["ON", "OFF"]:
+        return [120, 129, 1, 1 if colorMode == "ON" else 2]
+    else:
+        raise ValueError(f"{colorMode} isn't a mode NeewerLite-Python knows about (use CCT, HSI, ANM/SCENE, ON or OFF)")
+
+def parseDoAction(queryString): # split a doAction query into the action to take and its parameters
+    actionParams = {}
+
+    for paramName, paramValue in urllib.parse.parse_qsl(queryString, keep_blank_values=True):
+        paramName = paramName.strip().lower()
+
+        if paramName in ["on", "off"]: # ?light=1&on is the same as ?light=1&mode=on
+            actionParams["mode"] = paramName
+        else:
+            actionParams[paramName] = paramValue.strip()
+
+    for actionName in ["list", "list_presets", "discover", "link", "use_preset", "save_preset", "rename_preset", "delete_preset", "panic"]:
+        if actionName in actionParams:
+            return actionName, actionParams
+
+    if "mode" in actionParams:
+        return "send", actionParams
+    else:
+        raise ValueError("There's nothing to do in this request - try ?list, ?list_presets, ?discover, ?link=, or ?light=...&mode=...")
+
+connectionManager.addStateListener(lambda address, state: registry.listChanged(registry.get(address))) # the list shows each light's link state
+
+def lightListHTML(): # the table of every light we know about (for ?list)
+    tableRows = []
+
+    for lightIdx in range(len(availableLights)):
+        lightEntry = availableLights[lightIdx]
+        tableRows.append(f"<tr><td>{lightIdx + 1}</td><td>{escapeHTML(lightEntry[2])}</td><td>{escapeHTML(lightEntry[0].name)}</td>" \
+                         f"<td>{lightEntry[0].address}</td><td>{lightEntry[0].rssi} dBm</td><td>{linkedStateText[connectionManager.getState(lightEntry[0].address)]}</td>" \
+                         f"<td>{escapeHTML(str(lightEntry[3]))}</td></tr>")
+
+    return "<table border=1 cellpadding=4><tr><th>#</th><th>Custom Name</th><th>Light Type</th><th>MAC Address/GUID</th><th>RSSI</th><th>Linked</th>" \
+           "<th>Last Sent Parameters</th></tr>" + "".join(tableRows) + "</table>"
+
+def commandPriority(sendValue): # power off beats power on, which beats colour changes
+    if sendValue[1] == 129:
+        return 0 if sendValue[3] == 2 else 1
+    else:
+        return 2
+
+class commandAdmissionQueue: # the HTTP server's light commands wait here, most urgent first, with repeated commands to a light merged
+    def __init__(self):
+        self.queued = {} # (address, "power" or "color") -> the queued command for that light and parameter
+        self.order = [] # heap of [priority, sequence number, key] - entries that were merged or already run are skipped
+        self.runningLights = set() # the lights (by address) with a command being written right now - each light only gets one at a time
+        self.sequence = 0
+        self.serviceTime = 0.05 # running average of how long (in seconds) a command takes to write, for Retry-After
+        self.waitTimes = [deque(maxlen=200) for priority in commandPriorityNames] # the most recent queue wait times, for each priority
+        self.counters = {"admitted": 0, "merged": 0, "rejected": 0, "completed": 0, "failed": 0, "cancelled": 0}
+
+    def depth(self):
+        return len(self.queued)
+
+    def retryAfter(self): # a guess (in whole seconds) at how long it'll take for the queue to drain
+        return max(1, math.ceil(self.depth() * self.serviceTime / max(1, maxConcurrentWrites)))
+
+    def submit(self, lightCommands): # lightCommands is a list of [lightIdx, sendValue] - returns a future for each one, or None if the queue is full
+        newCommands = [lightCommand for lightCommand in lightCommands if self.commandKey(*lightCommand) not in self.queued]
+
+        # (the limit is on commands already waiting - a request for more lights than maxQueuedCommands still gets in if the queue's empty)
+        if len(newCommands) > 0 and self.depth() > 0 and self.depth() + len(newCommands) > maxQueuedCommands and \
+           min(commandPriority(sendValue) for lightIdx, sendValue in newCommands) > 0:
+            self.counters["rejected"] += len(lightCommands)
+            return None
+
+        commandFutures = []
+
+        for lightIdx, sendValue in lightCommands:
+            commandKey = self.commandKey(lightIdx, sendValue)
+            commandFuture = asyncio.get_running_loop().create_future()
+            priority = commandPriority(sendValue)
+
+            if commandKey in self.queued: # this light already has the same kind of command waiting, so just change what it'll send
+                queuedCommand = self.queued[commandKey]
+                queuedCommand["sendValue"] = sendValue
+                queuedCommand["futures"].append(commandFuture)
+                self.counters["merged"] += 1
+
+                if priority < queuedCommand["priority"]: # (the merged command keeps its place in the queue, unless it's now more urgent)
+                    queuedCommand["priority"] = priority
+                    self.sequence += 1
+                    queuedCommand["sequence"] = self.sequence
+                    heapq.heappush(self.order, [priority, self.sequence, commandKey])
+            else:
+                self.sequence += 1
+                self.queued[commandKey] = {"address": commandKey[0], "sendValue": sendValue, "priority": priority, "sequence": self.sequence,
+                                           "queuedAt": time.perf_counter(), "futures": [commandFuture]}
+                heapq.heappush(self.order, [priority, self.sequence, commandKey])
+                self.counters["admitted"] += 1
+
+            commandFutures.append(commandFuture)
+
+        self.dispatch()
+        return commandFutures
+
+    def commandKey(self, lightIdx, sendValue):
+        return (availableLights[lightIdx][0].address, "power" if sendValue[1] == 129 else "color")
+
+    def cancelColorCommands(self, addresses): # drop any colour changes still waiting for these lights (for panic)
+        for commandKey in [commandKey for commandKey in self.queued if commandKey[0] in addresses and commandKey[1] == "color"]:
+            for commandFuture in self.queued.pop(commandKey)["futures"]:
+                commandFuture.set_result(False) # (False is "cancelled", None is "failed")
+
+            self.counters["cancelled"] += 1
+
+    def dispatch(self): # start as many waiting commands as there are free slots (skipping lights that are already being written to)
+        skippedEntries = []
+
+        while len(self.runningLights) < max(1, maxConcurrentWrites) and len(self.order) > 0:
+            orderEntry = heapq.heappop(self.order)
+            queuedCommand = self.queued.get(orderEntry[2])
+
+            if queuedCommand == None or queuedCommand["sequence"] != orderEntry[1]: # merged into a newer entry, or already run
+                continue
+
+            if queuedCommand["address"] in self.runningLights:
+                skippedEntries.append(orderEntry)
+                continue
+
+            del self.queued[orderEntry[2]]
+            self.runningLights.add(queuedCommand["address"])
+            asyncio.create_task(self.runCommand(queuedCommand))
+
+        for orderEntry in skippedEntries:
+            heapq.heappush(self.order, orderEntry)
+
+    async def runCommand(self, queuedCommand):
+        startTime = time.perf_counter()
+        self.waitTimes[queuedCommand["priority"]].append(startTime - queuedCommand["queuedAt"])
+        finishTime = None
+
+        try:
+            lightIdx = registry.indexOf(queuedCommand["address"])
+
+            if lightIdx != -1:
+                # (writeToOneLight needs a limiter, but the number of commands running at once is already limited by dispatch)
+                writeTime = await writeToOneLight(lightIdx, getFrameForLight(lightIdx, queuedCommand["sendValue"]), startTime, asyncio.Semaphore(1))
+
+                if writeTime != None:
+                    finishTime = time.perf_counter()
+                    recordSentValue(lightIdx, queuedCommand["sendValue"])
+        except Exception as e:
+            printDebugString(f"Error running a queued command for {queuedCommand['address']}: {e}")
+        finally:
+            self.serviceTime = (self.serviceTime * 0.9) + ((time.perf_counter() - startTime) * 0.1)
+            self.counters["completed" if finishTime != None else "failed"] += 1
+
+            for commandFuture in queuedCommand["futures"]:
+                if not commandFuture.done():
+                    commandFuture.set_result(finishTime) # (the time the light changed, or None if it didn't)
+
+            self.runningLights.discard(queuedCommand["address"])
+            self.dispatch()
+
+    async def runCommands(self, lightCommands): # queue commands and wait for them - returns a fanOutToLights-style report, or None if the queue is full
+        startTime = time.perf_counter()
+        commandFutures = self.submit(lightCommands)
+
+        if commandFutures == None:
+            return None
+
+        finishTimes = await asyncio.gather(*commandFutures)
+
+        return fanOutReport([lightIdx for lightIdx, sendValue in lightCommands],
+                            [finishTime if finishTime is None or finishTime is False else finishTime - startTime for finishTime in finishTimes], startTime)
+
+    def stats(self): # queue depth and wait times (in ms), to see when a flood of commands is holding up the important ones
+        queuedByPriority = [0] * len(commandPriorityNames)
+
+        for queuedCommand in self.queued.values():
+            queuedByPriority[queuedCommand["priority"]] += 1
+
+        waitStats = {}
+
+        for priority in range(len(commandPriorityNames)):
+            waitTimes = sorted(self.waitTimes[priority])
+
+            if len(waitTimes) > 0:
+                waitStats[commandPriorityNames[priority]] = {"p50": round(waitTimes[len(waitTimes) // 2] * 1000, 2),
+                                                             "p95": round(waitTimes[min(len(waitTimes) - 1, int(len(waitTimes) * 0.95))] * 1000, 2),
+                                                             "max": round(waitTimes[-1] * 1000, 2), "samples": len(waitTimes)}
+
+        oldestCommand = min([queuedCommand["queuedAt"] for queuedCommand in self.queued.values()], default=None)
+
+        return {"depth": self.depth(), "max_depth": maxQueuedCommands, "running": len(self.runningLights),
+                "queued": {commandPriorityNames[priority]: queuedByPriority[priority] for priority in range(len(commandPriorityNames))},
+                "oldest_wait_ms": round((time.perf_counter() - oldestCommand) * 1000, 2) if oldestCommand != None else 0,
+                "wait_ms": waitStats, "retry_after": self.retryAfter(), **self.counters}
+
+commandQueue = commandAdmissionQueue()
+
+def lightListJSON(): # the same list as lightListHTML, for scripts and dashboards (for ?list=json)
+    return json.dumps({"lights": [{"number": lightIdx + 1, "custom_name": availableLights[lightIdx][2], "name": availableLights[lightIdx][0].name,
+                                   "address": availableLights[lightIdx][0].address, "rssi": availableLights[lightIdx][0].rssi,
+                                   "linked": connectionManager.getState(availableLights[lightIdx][0].address), "power": availableLights[lightIdx][6],
+                                   "last_params": list(availableLights[lightIdx][3])} for lightIdx in range(len(availableLights))]})
+
+def renderLightList(listFormat): # [the response body, its ETag] for ?list - only rebuilt when something in the list has changed
+    listVersion = registry.listVersion
+    cachedList = lightListCache.get(listFormat)
+
+    if cachedList == None or cachedList[0] != listVersion:
+        if listFormat == "json":
+            listBody = lightListJSON()
+        else:
+            listBody = httpPage(f"{len(availableLights)} light(s) available", lightListHTML())
+
+        cachedList = [listVersion, listBody.encode("utf-8"), f'"{listFormat}-{lightListETagPrefix}-{listVersion}"']
+        lightListCache[listFormat] = cachedList
+
+    return cachedList[1:]
+
+def isUnchangedForClient(requestHeaders, currentETag): # does the client's If-None-Match say it already has this version?
+    clientETags = [clientETag.strip() for clientETag in requestHeaders.get("if-none-match", "").split(",")]
+    return "*" in clientETags or any((clientETag[2:] if clientETag.startswith("W/") else clientETag) == currentETag for clientETag in clientETags)
+
+def httpPage(pageTitle, pageBody):
+    return f"<html><head><title>NeewerLite-Python</title></head><body><h2>{escapeHTML(pageTitle)}</h2>{pageBody}</body></html>"
+
+async def runDoAction(queryString): # (runs on asyncioEventLoop) do what a doAction request asks, returning [HTTP status, page title, page body]
+    try:
+        actionName, actionParams = parseDoAction(queryString)
+
+        if "light" in actionParams:
+            selectedLights = resolveLightList(actionParams["light"])
+
+            if len(selectedLights) == 0:
+                return [400, "No lights matched", f"No lights matched {escapeHTML(actionParams['light'])} - use ?list to see the lights available."]
+        else:
+            selectedLights = None
+
+        if actionName == "send":
+            sendValue = buildSendValue(actionParams)
+    except ValueError as e:
+        return [400, "Bad request", escapeHTML(str(e))]
+
+    if actionName == "list":
+        return [200, f"{len(availableLights)} light(s) available", lightListHTML()]
+    elif actionName == "list_presets":
+        return [200, f"{len(library.listPresets())} preset(s) in the preset library", presetListHTML()]
+    elif actionName == "discover":
+        newLights = await discoverLights()
+        return [200, f"Found {newLights} new light(s)", lightListHTML()]
+    elif actionName == "link":
+        lightsToLink = resolveLightList(actionParams["link"]) if actionParams["link"] not in ["", "all"] else list(range(len(availableLights)))
+
+        for lightIdx in lightsToLink:
+            linkQueue.queueLink(lightIdx)
+
+        return [200, f"Linking to {len(lightsToLink)} light(s)", lightListHTML()]
+    elif actionName == "use_preset":
+        if library.getPreset(actionParams["use_preset"]) == None:
+            return [404, "No such preset", f"There isn't a preset called {escapeHTML(actionParams['use_preset'])} in the preset library."]
+
+        report = await asyncio.wrap_future(recallLibraryPreset(actionParams["use_preset"], selectedLights))
+        return [200, f"Recalled preset {escapeHTML(actionParams['use_preset'])}", f"Skew between the first and last light: {report['spread'] * 1000:.1f}ms" if report != None else "None of the lights are linked."]
+    elif actionName == "panic": # turn every light (or just the ones given) off, ahead of anything else waiting
+        lightsToTurnOff = selectedLights if selectedLights != None else list(range(len(availableLights)))
+        commandQueue.cancelColorCommands(set(availableLights[lightIdx][0].address for lightIdx in lightsToTurnOff))
+        report = await commandQueue.runCommands([[lightIdx, [120, 129, 1, 2]] for lightIdx in lightsToTurnOff])
+
+        return [200 if report["failed"] == 0 else 500, f"Turned off {len(lightsToTurnOff) - report['failed']} of {len(lightsToTurnOff)} light(s)", ""]
+    elif actionName == "save_preset":
+        lightsToSave = selectedLights if selectedLights != None else range(len(availableLights))
+        thePreset = [[availableLights[lightIdx][0].address, list(availableLights[lightIdx][3])] for lightIdx in lightsToSave if len(availableLights[lightIdx][3]) > 0]
+
+        if len(thePreset) == 0:
+            return [400, "Nothing to save", "None of those lights have had anything sent to them yet, so there's nothing to save."]
+
+        presetNum = library.findNumber(actionParams["save_preset"])
+
+        if presetNum == None: # a new named preset goes after the last one in the library
+            presetNum = library.nextFreeNumber()
+            library.savePreset(presetNum, thePreset, actionParams["save_preset"])
+        else:
+            library.savePreset(presetNum, thePreset)
+
+        if (presetNum - 1) // presetBankSize == currentPresetBank: # the preset is on the buttons right now, so show the new version
+            customLightPresets[(presetNum - 1) % presetBankSize] = thePreset
+            compileAllPresets()
+
+        return [200, f"Saved preset {presetNum}", f"Saved the settings of {len(thePreset)} light(s) as preset {presetNum}."]
+    elif actionName in ["rename_preset", "delete_preset"]:
+        presetNum = library.findNumber(actionParams[actionName])
+
+        if presetNum == None or library.getPreset(presetNum) == None:
+            return [404, "No such preset", f"There isn't a preset called {escapeHTML(actionParams[actionName])} in the preset library."]
+
+        if actionName == "rename_preset":
+            try:
+                library.renamePreset(presetNum, actionParams.get("name", ""))
+            except ValueError as e:
+                return [409, "Couldn't rename the preset", escapeHTML(str(e))]
+
+            return [200, f"Renamed preset {presetNum}", presetListHTML()]
+
+        library.deletePreset(presetNum)
+
+        if (presetNum - 1) // presetBankSize == currentPresetBank: # the preset is on the buttons right now, so they go back to the default
+            customLightPresets[(presetNum - 1) % presetBankSize] = json.loads(json.dumps(defaultLightPresets[(presetNum - 1) % presetBankSize]))
+
+        return [200, f"Deleted preset {presetNum}", presetListHTML()]
+    else: # send new settings (or power on/off) to the lights
+        if selectedLights == None:
+            return [400, "No lights given", "Use light= to say which light(s) to send this to."]
+
+        report = await commandQueue.runCommands([[lightIdx, sendValue] for lightIdx in selectedLights])
+
+        if report == None:
+            return [429, "Too many commands waiting", f"There are already {commandQueue.depth()} commands waiting to be sent - try again in a moment."]
+        elif report["cancelled"] > 0:
+            return [409, "Cancelled", f"{report['cancelled']} of {len(selectedLights)} light(s) were turned off (panic) before this could be sent."]
+
+        resultLines = [f"{availableLights[lightIdx][0].address}: " + (f"{report['latencies'][availableLights[lightIdx][0].address] * 1000:.1f}ms" \
+                       if report["latencies"].get(availableLights[lightIdx][0].address) != None else "FAILED") for lightIdx in selectedLights]
+
+        return [200 if report["failed"] == 0 else 500, f"Sent to {len(selectedLights) - report['failed']} of {len(selectedLights)} light(s)", "<br>".join(resultLines)]
+
+async def runBatchForLight(lightIdx, lightOperations, startTime, batchResults): # every operation for one light, in the order they were given
+    address = availableLights[lightIdx][0].address
+
+    for itemNum, sendValue in lightOperations: # (each one is queued only once the one before it is done, so they can't be merged or reordered)
+        commandFutures = commandQueue.submit([[lightIdx, sendValue]])
+
+        if commandFutures == None:
+            batchResults[itemNum]["status"] = "rejected"
+            batchResults[itemNum]["lights"][address] = None
+            continue
+
+        finishTime = await commandFutures[0]
+        batchResults[itemNum]["lights"][address] = round((finishTime - startTime) * 1000, 2) if finishTime not in [None, False] else None
+
+        if finishTime == False: # a panic turned the light off before this got to it
+            batchResults[itemNum]["status"] = "cancelled"
+
+async def runBatch(requestBody): # (runs on asyncioEventLoop) do a doBatch request, returning [HTTP status, result dictionary]
+    try:
+        batchItems = json.loads(requestBody.decode("utf-8"))
+    except (UnicodeDecodeError, ValueError) as e:
+        return [400, {"error": f"The request body isn't valid JSON: {e}"}]
+
+    if not isinstance(batchItems, list):
+        return [400, {"error": "The request body has to be a JSON array of {\"light\", \"mode\", \"params\"} operations"}]
+
+    batchResults = []
+    operationsForLight = {} # lightIdx -> [[item number, sendValue], ...] in the order the items were given
+
+    for itemNum in range(len(batchItems)):
+        batchItem = batchItems[itemNum]
+        batchResults.append({"item": itemNum, "light": batchItem.get("light") if isinstance(batchItem, dict) else None, "status": "ok", "lights": {}})
+
+        try:
+            if not isinstance(batchItem, dict) or "light" not in batchItem or "mode" not in batchItem:
+                raise ValueError("every operation needs a light and a mode")
+
+            actionParams = {paramName.lower(): str(paramValue) for paramName, paramValue in dict(batchItem.get("params") or {}).items()}
+            actionParams["mode"] = str(batchItem["mode"])
+            sendValue = buildSendValue(actionParams)
+
+            lightNames = batchItem["light"] if isinstance(batchItem["light"], list) else [batchItem["light"]]
+            selectedLights = resolveLightList(";".join(str(lightName) for lightName in lightNames))
+
+            if len(selectedLights) == 0:
+                raise ValueError(f"no lights matched {batchItem['light']}")
+        except (ValueError, TypeError, AttributeError) as e:
+            batchResults[itemNum]["status"] = "error"
+            batchResults[itemNum]["error"] = str(e)
+            continue
+
+        for lightIdx in selectedLights:
+            operationsForLight.setdefault(lightIdx, []).append([itemNum, sendValue])
+
+    if len(operationsForLight) > 0 and commandQueue.depth() >= maxQueuedCommands:
+        return [429, {"error": f"There are already {commandQueue.depth()} commands waiting to be sent - try again in a moment."}]
+
+    # EVERY LIGHT RUNS AT THE SAME TIME (THROUGH THE COMMAND QUEUE), BUT EACH LIGHT GETS ITS OPERATIONS IN ORDER
+    startTime = time.perf_counter()
+
+    await asyncio.gather(*[runBatchForLight(lightIdx, operationsForLight[lightIdx], startTime, batchResults) for lightIdx in operationsForLight])
+
+    for batchResult in batchResults:
+        if batchResult["status"] == "ok":
+            writeTimes = list(batchResult["lights"].values())
+            batchResult["ms"] = max([writeTime for writeTime in writeTimes if writeTime != None], default=None) # when the last light in this operation changed
+
+            if None in writeTimes:
+                batchResult["status"] = "failed" if writeTimes.count(None) == len(writeTimes) else "partial"
+
+    return [200, {"results": batchResults, "total_ms": round((time.perf_counter() - startTime) * 1000, 2),
+                  "failed": len([batchResult for batchResult in batchResults if batchResult["status"] != "ok"])}]
+
+async def readHTTPRequest(reader): # read one request - [method, path, version, headers (lower-case names), body], or None if the client's gone
+    requestLine = await reader.readline()
+
+    if requestLine == b"":
+        return None
+
+    requestParts = requestLine.decode("latin-1").split()
+
+    if len(requestParts) != 3:
+        raise ValueError("malformed request line")
+
+    requestHeaders = {}
+
+    while True:
+        headerLine = (await reader.readline()).decode("latin-1").rstrip("\r\n")
+
+        if headerLine == "":
+            break
+
+        if ":" in headerLine:
+            headerName, headerValue = headerLine.split(":", 1)
+            requestHeaders[headerName.strip().lower()] = headerValue.strip()
+
+    if "transfer-encoding" in requestHeaders:
+        raise ValueError("chunked request bodies aren't supported - send a Content-Length instead")
+
+    bodyLength = int(requestHeaders.get("content-length", "0"))
+
+    if bodyLength > maxHTTPBodySize:
+        raise OverflowError("request body too large")
+
+    requestBody = await reader.readexactly(bodyLength) if bodyLength > 0 else b""
+    return [requestParts[0].upper(), requestParts[1], requestParts[2].upper(), requestHeaders, requestBody]
+
+async def sendHTTPResponse(writer, statusCode, responseBody, contentType = "text/html; charset=utf-8", extraHeaders = None, headOnly = False, keepAlive = False):
+    if isinstance(responseBody, str):
+        responseBody = responseBody.encode("utf-8")
+
+    responseHeaders = [f"HTTP/1.1 {statusCode} {httpStatusText.get(statusCode, '')}", "Server: NeewerLite-Python"]
+
+    if statusCode == 304: # a 304 never has a body (the client uses the copy it already has)
+        responseBody = b""
+    else:
+        responseHeaders.extend([f"Content-Type: {contentType}", f"Content-Length: {len(responseBody)}"])
+
+    if keepAlive == True:
+        responseHeaders.extend(["Connection: keep-alive", f"Keep-Alive: timeout={httpKeepAliveTimeout}, max={httpMaxKeepAliveRequests}"])
+    else:
+        responseHeaders.append("Connection: close")
+
+    if extraHeaders != None:
+        responseHeaders.extend(f"{headerName}: {headerValue}" for headerName, headerValue in extraHeaders.items())
+
+    # (a HEAD request gets the headers, with the real Content-Length, but not the body itself)
+    writer.write(("\r\n".join(responseHeaders) + "\r\n\r\n").encode("latin-1") + (responseBody if headOnly == False else b""))
+    await writer.drain()
+
+async def routeHTTPRequest(httpRequest): # return [status, body, content type, extra headers] for a request
+    method, requestPath = httpRequest[0], urllib.parse.urlsplit(httpRequest[1])
+
+    if requestPath.path.rstrip("/") == "/NeewerLite-Python/doAction":
+        if method not in ["GET", "HEAD"]:
+            return [405, httpPage("Method not allowed", "doAction only takes GET requests."), "text/html; charset=utf-8", {"Allow": "GET, HEAD"}]
+
+        try:
+            actionName, actionParams = parseDoAction(requestPath.query)
+        except ValueError as e:
+            actionName, actionParams = [None, {}] # (runDoAction sends back the error)
+
+            if method == "HEAD":
+                return [400, httpPage("Bad request", escapeHTML(str(e))), "text/html; charset=utf-8", None]
+
+        if method == "HEAD" and actionName not in ["list", "list_presets"]: # HEAD can't change anything, so only the lists are answered in full
+            return [200, httpPage("Not run", "A HEAD request only gets the headers - send a GET request to do this."), "text/html; charset=utf-8", None]
+
+        if actionName == "list": # the list is polled all the time, so it's sent from a cache, and not at all if the client has it already
+            listFormat = "json" if "json" in [actionParams["list"].lower(), actionParams.get("format", "").lower()] else "html"
+            listBody, listETag = renderLightList(listFormat)
+            listHeaders = {"ETag": listETag, "Cache-Control": "no-cache"}
+
+            if isUnchangedForClient(httpRequest[3], listETag):
+                return [304, b"", None, listHeaders]
+            else:
+                return [200, listBody, "application/json" if listFormat == "json" else "text/html; charset=utf-8", listHeaders]
+
+        statusCode, pageTitle, pageBody = await runDoAction(requestPath.query)
+        return [statusCode, httpPage(pageTitle, pageBody), "text/html; charset=utf-8", {"Retry-After": commandQueue.retryAfter()} if statusCode == 429 else None]
+    elif requestPath.path.rstrip("/") == "/NeewerLite-Python/doBatch":
+        if method != "POST":
+            return [405, httpPage("Method not allowed", "doBatch only takes POST requests, with a JSON array of operations."), "text/html; charset=utf-8", {"Allow": "POST"}]
+
+        statusCode, batchResult = await runBatch(httpRequest[4])
+        return [statusCode, json.dumps(batchResult), "application/json", {"Retry-After": commandQueue.retryAfter()} if statusCode == 429 else None]
+    elif requestPath.path.rstrip("/") == "/NeewerLite-Python/queue": # how busy the command queue is (and how long commands are waiting)
+        return [200, json.dumps(commandQueue.stats()), "application/json", {"Cache-Control": "no-cache"}]
+    elif requestPath.path.rstrip("/") in ["", "/NeewerLite-Python"]:
+        return [200, httpPage("NeewerLite-Python HTTP server", "Send commands to /NeewerLite-Python/doAction - for example, " \
+                              "<em>/NeewerLite-Python/doAction?light=1&amp;mode=CCT&amp;temp=5600&amp;bri=50</em><br><br>" \
+                              "To send a lot of commands at once, POST a JSON array to /NeewerLite-Python/doBatch - for example, " \
+                              "<em>[{\"light\": \"1;2\", \"mode\": \"CCT\", \"params\": {\"temp\": 5600, \"bri\": 50}}, {\"light\": \"3\", \"mode\": \"OFF\"}]</em><br><br>" \
+                              "To be told when the lights change instead of polling ?list, listen to /NeewerLite-Python/events (Server-Sent Events, " \
+                              "add <em>?light=1;2</em> to only hear about some lights)<br><br>" \
+                              "<em>?panic</em> turns every light off ahead of anything else waiting, and /NeewerLite-Python/queue shows how many commands are waiting"), "text/html; charset=utf-8", None]
+    else:
+        return [404, httpPage("Not found", f"There's nothing at {escapeHTML(requestPath.path)}"), "text/html; charset=utf-8", None]
+
+async def handleHTTPClient(reader, writer): # (runs on asyncioEventLoop) one task for each connection, so many requests can be in flight at once
+    clientIP = writer.get_extra_info("peername")[0]
+
+    try:
+        if not isAllowedHTTPClient(clientIP):
+            printDebugString(f"HTTP request from {clientIP} refused - it isn't in the list of acceptable IPs")
+            await sendHTTPResponse(writer, 403, httpPage("Forbidden", f"{clientIP} isn't allowed to use this server."))
+            return
+
+        # HTTP/1.1 CLIENTS (AND HTTP/1.0 ONES THAT ASK FOR IT) CAN SEND MORE REQUESTS ON THE SAME CONNECTION
+        for requestNum in range(1, httpMaxKeepAliveRequests + 1):
+            try:
+                # (the first request gets the full timeout, an idle connection waiting for another one only gets httpKeepAliveTimeout)
+                httpRequest = await asyncio.wait_for(readHTTPRequest(reader), httpRequestTimeout if requestNum == 1 else httpKeepAliveTimeout)
+            except asyncio.TimeoutError:
+                if requestNum == 1:
+                    await sendHTTPResponse(writer, 408, httpPage("Request timeout", "The request took too long to arrive."))
+
+                return
+            except OverflowError:
+                await sendHTTPResponse(writer, 413, httpPage("Request too large", "The request body is too large."))
+                return
+            except ValueError as e:
+                await sendHTTPResponse(writer, 400, httpPage("Bad request", escapeHTML(str(e))))
+                return
+
+            if httpRequest == None: # the client closed the connection
+                return
+
+            connectionHeader = [headerValue.strip().lower() for headerValue in httpRequest[3].get("connection", "").split(",")]
+
+            if httpRequest[2] == "HTTP/1.0":
+                keepAlive = "keep-alive" in connectionHeader
+            else:
+                keepAlive = "close" not in connectionHeader
+
+            keepAlive = keepAlive and requestNum < httpMaxKeepAliveRequests
+            requestPath = urllib.parse.urlsplit(httpRequest[1])
+
+            if httpRequest[0] == "GET" and requestPath.path.rstrip("/") == "/NeewerLite-Python/events": # this connection becomes an event stream
+                await eventStream.serve(reader, writer, urllib.parse.parse_qs(requestPath.query).get("light", [""])[0])
+                return
+
+            try:
+                statusCode, responseBody, contentType, extraHeaders = await routeHTTPRequest(httpRequest)
+            except Exception as e:
+                logging.exception(e)
+                statusCode, responseBody, contentType, extraHeaders = [500, httpPage("Error", escapeHTML(str(e))), "text/html; charset=utf-8", None]
+
+            await sendHTTPResponse(writer, statusCode, responseBody, contentType, extraHeaders, httpRequest[0] == "HEAD", keepAlive)
+
+            if keepAlive == False:
+                return
+    except (ConnectionError, asyncio.IncompleteReadError): # the client went away part-way through
+        pass
+    finally:
+        writer.close()
+
+# STREAMING LIGHT CHANGES (SERVER-SENT EVENTS) - CLIENTS SUBSCRIBE TO /NeewerLite-Python/events INSTEAD OF POLLING ?list
+def lightStateSnapshot(lightIdx): # everything an /events client is told about one light
+    lightEntry = availableLights[lightIdx]
+    lightSnapshot = {"light": lightIdx + 1, "address": lightEntry[0].address, "name": lightEntry[0].name, "custom_name": lightEntry[2],
+                     "linked": connectionManager.getState(lightEntry[0].address), "rssi": lightEntry[0].rssi, "mode": None, "params": {}}
+
+    # (whichever came last - what we sent the light, or what it told us about itself - is in [6])
+    lightSnapshot["power"] = "ON" if lightEntry[6] == True else "OFF"
+
+    if len(lightEntry[3]) > 0:
+        try:
+            lightParams = translateByteString(lightEntry[3])
+            lightSnapshot["mode"] = lightParams.pop("colorMode", None)
+            lightSnapshot["params"] = lightParams
+        except (IndexError, KeyError, TypeError):
+            pass
+
+    return lightSnapshot
+
+class lightEventClient: # one /events connection - changes waiting to be sent are merged, so a slow client gets the latest values, not a backlog
+    def __init__(self, writer, addresses):
+        self.writer = writer
+        self.addresses = addresses # the lights this client wants to hear about (or None for every light)
+        self.pending = {} # address -> the changes that haven't been sent yet
+        self.wakeUp = asyncio.Event()
+        self.closed = False
+
+    async def watchForClose(self, reader): # an event stream client never sends anything else, so anything from it means it's gone
+        try:
+            await reader.read()
+        except ConnectionError:
+            pass
+
+        self.closed = True
+        self.wakeUp.set()
+
+    def addChanges(self, lightChanges):
+        for address, lightChange in lightChanges.items():
+            if self.addresses == None or address in self.addresses:
+                self.pending.setdefault(address, {}).update(lightChange)
+
+        if len(self.pending) > 0:
+            self.wakeUp.set()
+
+class lightEventStream:
+    def __init__(self):
+        self.clients = set()
+        self.changedLights = set() # the (upper-case) addresses of the lights that have changed since the last tick
+        self.lastSnapshots = {} # address -> what the clients were last told about that light
+        self.tickTask = None
+
+        registry.changeListeners.append(self.lightChanged)
+
+    def lightChanged(self, record): # (can run on any thread) just note the light - the work is done once per tick on asyncioEventLoop
+        if len(self.clients) > 0:
+            if record != None:
+                self.changedLights.add(record.address.upper())
+            else:
+                self.changedLights.update(lightEntry.address.upper() for lightEntry in list(availableLights))
+
+    def gatherChanges(self): # address -> the fields of each light that changed since the clients were last told
+        changedLights, self.changedLights = self.changedLights, set()
+        lightChanges = {}
+
+        for address in changedLights:
+            lightIdx = registry.indexOf(address)
+
+            if lightIdx == -1: # the light was removed
+                if self.lastSnapshots.pop(address, None) != None:
+                    lightChanges[address] = {"address": address, "removed": True}
+
+                continue
+
+            lightSnapshot = lightStateSnapshot(lightIdx)
+            lastSnapshot = self.lastSnapshots.get(address, {})
+            lightChange = {fieldName: fieldValue for fieldName, fieldValue in lightSnapshot.items() if lastSnapshot.get(fieldName) != fieldValue}
+
+            if len(lightChange) > 0:
+                lightChange["light"], lightChange["address"] = lightSnapshot["light"], lightSnapshot["address"]
+                lightChanges[address] = lightChange
+                self.lastSnapshots[address] = lightSnapshot
+
+        return lightChanges
+
+    async def runTicks(self): # (runs on asyncioEventLoop while anyone is listening) gather the changes, and hand them to every client at once
+        while len(self.clients) > 0:
+            await asyncio.sleep(streamTickInterval)
+            lightChanges = self.gatherChanges()
+
+            if len(lightChanges) > 0:
+                for eventClient in list(self.clients):
+                    eventClient.addChanges(lightChanges)
+
+        self.tickTask = None
+
+    async def sendEvent(self, eventClient, eventName, eventData):
+        eventClient.writer.write(f"event: {eventName}\ndata: {json.dumps(eventData)}\n\n".encode("utf-8"))
+        await asyncio.wait_for(eventClient.writer.drain(), streamDrainTimeout) # (a client that can't keep up is dropped)
+
+    async def serve(self, reader, writer, lightNames = ""): # (runs on asyncioEventLoop) stream changes to one client until it goes away
+        eventClient = lightEventClient(writer, set(availableLights[lightIdx][0].address.upper() for lightIdx in resolveLightList(lightNames)) if lightNames != "" else None)
+
+        writer.write(("HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\nConnection: close\r\n" \
+                      "X-Accel-Buffering: no\r\nServer: NeewerLite-Python\r\n\r\nretry: 2000\n\n").encode("latin-1"))
+
+        if len(self.clients) == 0: # nobody's been listening, so start from what the lights look like right now
+            self.changedLights = set()
+            self.lastSnapshots = {availableLights[lightIdx][0].address.upper(): lightStateSnapshot(lightIdx) for lightIdx in range(len(availableLights))}
+
+        self.clients.add(eventClient)
+
+        if self.tickTask == None:
+            self.tickTask = asyncio.create_task(self.runTicks())
+
+        closeWatcher = asyncio.create_task(eventClient.watchForClose(reader))
+
+        try:
+            # THE FIRST EVENT IS EVERY LIGHT THE CLIENT ASKED ABOUT, AFTER THAT ONLY THE FIELDS THAT CHANGE ARE SENT
+            await self.sendEvent(eventClient, "snapshot", [lightStateSnapshot(lightIdx) for lightIdx in range(len(availableLights))
+                                                           if eventClient.addresses == None or availableLights[lightIdx][0].address.upper() in eventClient.addresses])
+
+            while True:
+                try:
+                    await asyncio.wait_for(eventClient.wakeUp.wait(), streamPingInterval)
+                except asyncio.TimeoutError:
+                    writer.write(b": ping\n\n")
+                    await asyncio.wait_for(writer.drain(), streamDrainTimeout)
+                    continue
+
+                if eventClient.closed == True:
+                    break
+
+                eventClient.wakeUp.clear()
+                lightChanges, eventClient.pending = list(eventClient.pending.values()), {}
+                await self.sendEvent(eventClient, "changes", lightChanges)
+        except asyncio.TimeoutError:
+            printDebugString("An /events client couldn't keep up, so it's been disconnected")
+        finally:
+            self.clients.discard(eventClient)
+            closeWatcher.cancel()
+
+eventStream = lightEventStream()
+
+async def startHTTPServer(port = None): # (runs on asyncioEventLoop) start the HTTP server on every IPv4 interface
+    global httpServer
+
+    # (IPv4 only, like the old server - acceptable_HTTP_IPs only has IPv4 addresses, so "localhost" clients that reached us
+    # over ::1 would be turned away, instead of falling back to 127.0.0.1)
+    httpServer = await asyncio.start_server(handleHTTPClient, "0.0.0.0", port if port != None else httpPort, reuse_address=True)
+    printDebugString(f"HTTP server started on port {port if port != None else httpPort}")
+
+    return httpServer
+
+async def stopHTTPServer():
+    global httpServer
+
+    if httpServer != None:
+        httpServer.close()
+        await httpServer.wait_closed()
+        httpServer = None
+
+# =======================================================
+# = LAUNCHING THE HTTP SERVER (--http)
+# =======================================================
+quitRequested = threading.Event() # set when we're told to quit (Ctrl+C, SIGTERM, or the HTTP server not starting)
+
+def startAsyncioLoop(): # start asyncioEventLoop on its own thread - the lights, the link queue and the HTTP server all run on it
+    global asyncioEventLoop
+
+    asyncioEventLoop = asyncio.new_event_loop()
+    threading.Thread(target=asyncioEventLoop.run_forever, name="asyncioEventLoop", daemon=True).start()
+
+    return asyncioEventLoop
+
+async def startHTTPMode(): # (runs on asyncioEventLoop) answer requests right away, then find (and link to) the lights
+    await startHTTPServer()
+    connectionManager.startHealthChecks()
+
+    if findLightsOnStartup == True:
+        await findLightsAtStartup()
+
+async def stopHTTPMode(): # (runs on asyncioEventLoop)
+    await stopHTTPServer()
+    await connectionManager.shutdown()
+
+    if discoveryCacheWriter != None: # let the discovery cache finish being written
+        await discoveryCacheWriter
+
+def httpModeStarted(startupFuture):
+    if startupFuture.exception() != None: # the server couldn't start (the port's already in use, etc.), so there's no point in staying up
+        print(f"Couldn't start the HTTP server: {startupFuture.exception()}")
+        quitRequested.set()
+
+def runHTTPMode():
+    startConfigWatcher() # (load the preferences first, so the server gets the right IP list, link limits, etc.)
+    startAsyncioLoop()
+
+    asyncio.run_coroutine_threadsafe(startHTTPMode(), asyncioEventLoop).add_done_callback(httpModeStarted)
+
+    if platform.system() != "Windows":
+        signal.signal(signal.SIGTERM, lambda signalNum, frame: quitRequested.set())
+
+    try:
+        while not quitRequested.wait(1): # (waiting in short steps, so Ctrl+C gets through on every platform)
+            pass
+    except KeyboardInterrupt:
+        pass
+
+    printDebugString("Stopping the HTTP server and unlinking from the lights...")
+
+    try:
+        asyncio.run_coroutine_threadsafe(stopHTTPMode(), asyncioEventLoop).result(10)
+    except Exception as e:
+        printDebugString(f"Error while shutting down: {e}")
+
+    asyncioEventLoop.call_soon_threadsafe(asyncioEventLoop.stop)
+    singleInstanceUnlockandQuit(0)
+
+# =======================================================
+# = LAUNCHING THE GUI (THE DEFAULT)
+# =======================================================
+async def startGUIMode(): # (runs on asyncioEventLoop) keep the lights linked, and find them if we're supposed to
+    connectionManager.startHealthChecks()
+
+    if findLightsOnStartup == True:
+        await findLightsAtStartup()
+
+def runGUIMode():
+    if PySideGUI == None: # (the reason PySide couldn't be loaded was already printed above)
+        print("The GUI can't be shown without PySide2 or PySide6 - use --http to start the HTTP server instead.")
+        singleInstanceUnlockandQuit(1)
+
+    startConfigWatcher()
+    startAsyncioLoop()
+
+    app = QApplication(sys.argv)
+    mainWindow = MainWindow()
+
+    asyncio.run_coroutine_threadsafe(startGUIMode(), asyncioEventLoop)
+
+    if PySideGUI == "PySide2": # PySide2 does exec_(), PySide 6 does plain exec()
+        exitCode = app.exec_()
+    else:
+        exitCode = app.exec()
+
+    printDebugString("Unlinking from the lights...")
+
+    try:
+        asyncio.run_coroutine_threadsafe(connectionManager.shutdown(), asyncioEventLoop).result(10)
+    except Exception as e:
+        printDebugString(f"Error while shutting down: {e}")
+
+    asyncioEventLoop.call_soon_threadsafe(asyncioEventLoop.stop)
+    singleInstanceUnlockandQuit(exitCode)
+
+if __name__ == "__main__":
+    launchParser = argparse.ArgumentParser(parents=[simParser], description="Control Neewer lights over Bluetooth")
+    launchParser.add_argument("--http", action="store_true", help="run the HTTP server (without the GUI)")
+    launchParser.add_argument("--force_instance", action="store_true", help="start even if another copy of NeewerLite-Python is running")
+    launchArgs = launchParser.parse_known_args()[0]
+
+    if launchArgs.force_instance == False:
+        singleInstanceLock()
+        doAnotherInstanceCheck()
+
+    if launchArgs.http == True:
+        runHTTPMode()
+    else:
+        runGUIMode()
@@ -0,0 +1,202 @@
+#!/usr/bin/python3
+#############################################################
+## NeewerLite-Python HTTP -> GATT benchmark
+############################################################
+## Starts NeewerLite-Python.py as an HTTP server with simulated
+## lights (--simulate), sends doAction requests at it, and
+## matches every request to the frame the simulated light
+## applied, to measure request -> GATT write latency and the
+## sustained number of commands per second.
+##
+## Results are printed (or saved with --output) as JSON, so
+## runs from different releases can be compared.
+############################################################
+
+import os
+import sys
+import json
+import math
+import time
+import signal
+import argparse
+import platform
+import tempfile
+import subprocess
+import urllib.request
+
+from concurrent.futures import ThreadPoolExecutor
+
+scriptDir = os.path.dirname(os.path.abspath(__file__))
+
+def simulatedAddress(lightNum): # the same addresses NeewerLite-Python.py gives its simulated lights
+    return "C4:AC:05:" + ":".join(f"{x:02X}" for x in (lightNum + 1).to_bytes(3, "big"))
+
+def percentile(values, pct): # nearest-rank percentile
+    if len(values) == 0:
+        return None
+
+    sortedValues = sorted(values)
+    rank = max(0, min(len(sortedValues) - 1, math.ceil((pct / 100) * len(sortedValues)) - 1))
+    return sortedValues[rank]
+
+def summarize(values): # p50/p95/p99 (and a couple of others) in milliseconds
+    if len(values) == 0:
+        return None
+
+    return {"p50": round(percentile(values, 50) * 1000, 3), "p95": round(percentile(values, 95) * 1000, 3),
+            "p99": round(percentile(values, 99) * 1000, 3), "min": round(min(values) * 1000, 3), "max": round(max(values) * 1000, 3)}
+
+def readLog(logFile): # returns a list of [time, address, event, params] for every line in the simulated light log
+    events = []
+
+    if not os.path.exists(logFile): # (the server hasn't started simulating the lights yet)
+        return events
+
+    with open(logFile, encoding="utf-8") as theLog:
+        for line in theLog:
+            line = line.split()
+
+            if len(line) >= 3:
+                params = [int(x) for x in line[3].split(",")] if len(line) > 3 and line[3] != "" else []
+                events.append([float(line[0]), line[1], line[2], params])
+
+    return events
+
+def startServer(args, numOfLights, logFile):
+    command = [sys.executable, os.path.join(scriptDir, "NeewerLite-Python.py"), "--http", "--force_instance",
+               f"--simulate={numOfLights}", f"--sim_latency={args.sim_latency}", f"--sim_loss={args.sim_loss}", f"--sim_log={logFile}"]
+
+    return subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def stopServer(serverProcess):
+    if platform.system() == "Windows":
+        serverProcess.terminate()
+    else:
+        serverProcess.send_signal(signal.SIGINT) # the same signal the systemd service uses to stop NeewerLite-Python
+
+    try:
+        serverProcess.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        serverProcess.kill()
+
+def waitForLights(args, numOfLights, logFile): # wait for every simulated light to be linked, and for the HTTP server to answer
+    endTime = time.time() + args.startup_timeout
+    linkedLights = set()
+
+    while time.time() < endTime:
+        linkedLights = set(event[1] for event in readLog(logFile) if event[2] == "LINKED")
+
+        if len(linkedLights) >= numOfLights:
+            try:
+                with urllib.request.urlopen(args.url + "?list", timeout=5) as response:
+                    if response.status == 200:
+                        return True
+            except Exception:
+                pass
+
+        time.sleep(0.25)
+
+    print(f"Only {len(linkedLights)} of {numOfLights} simulated light(s) were linked before the timeout!", file=sys.stderr)
+    return False
+
+def sendRequest(args, lightNum, brightness):
+    url = f"{args.url}?light={simulatedAddress(lightNum)}&mode=CCT&temp=5600&bri={brightness}"
+    sendTime = time.time()
+
+    try:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            response.read()
+            status = response.status
+    except Exception as e:
+        status = str(e)
+
+    return [simulatedAddress(lightNum), brightness, sendTime, time.time(), status]
+
+def runBenchmark(args, numOfLights):
+    logFile = os.path.join(tempfile.gettempdir(), f"neewer_benchmark_{os.getpid()}_{numOfLights}.log")
+
+    if os.path.exists(logFile):
+        os.remove(logFile)
+
+    print(f"Benchmarking with {numOfLights} simulated light(s)...", file=sys.stderr)
+    serverProcess = startServer(args, numOfLights, logFile)
+
+    try:
+        if not waitForLights(args, numOfLights, logFile):
+            return {"lights": numOfLights, "error": "not every light linked before the startup timeout"}
+
+        # EVERY REQUEST GETS A (LIGHT, BRIGHTNESS) PAIR THAT WON'T BE REPEATED FOR THAT LIGHT FOR A WHILE, SO IT CAN BE FOUND IN THE LOG
+        requestList = [[a % numOfLights, (a // numOfLights) % 101] for a in range(args.requests)]
+
+        startTime = time.time()
+
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(executor.map(lambda req: sendRequest(args, req[0], req[1]), requestList))
+
+        endTime = time.time()
+        time.sleep(args.sim_latency * 4 + 0.5) # let any writes still in flight land in the log
+
+        # MATCH EACH REQUEST TO THE FIRST CCT FRAME WITH ITS BRIGHTNESS THAT THE LIGHT APPLIED AFTER THE REQUEST WAS SENT
+        writesForLight = {}
+
+        for event in readLog(logFile):
+            if event[2] == "CCT" and event[0] >= startTime:
+                writesForLight.setdefault(event[1], []).append(event)
+
+        writeLatencies = [] # request sent -> frame applied by the light
+        roundTrips = [] # request sent -> response received
+        errors = 0
+
+        for address, brightness, sendTime, responseTime, status in results:
+            if status != 200:
+                errors += 1
+                continue
+
+            roundTrips.append(responseTime - sendTime)
+
+            for event in writesForLight.get(address, []):
+                if event[0] >= sendTime and len(event[3]) > 0 and event[3][0] == brightness:
+                    writeLatencies.append(event[0] - sendTime)
+                    break
+
+        totalWrites = sum(len(writesForLight[address]) for address in writesForLight)
+
+        return {"lights": numOfLights, "requests": len(results), "errors": errors, "concurrency": args.concurrency,
+                "duration_s": round(endTime - startTime, 3),
+                "commands_per_second": round(len(results) / (endTime - startTime), 2),
+                "writes_per_second": round(totalWrites / (endTime - startTime), 2),
+                "matched_writes": len(writeLatencies), # requests that weren't matched were coalesced into a later write (or lost)
+                "request_to_gatt_ms": summarize(writeLatencies),
+                "request_roundtrip_ms": summarize(roundTrips)}
+    finally:
+        stopServer(serverProcess)
+
+        if os.path.exists(logFile):
+            os.remove(logFile)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the NeewerLite-Python HTTP -> GATT path with simulated lights")
+    parser.add_argument("--lights", default="1,8,32,128", help="comma-separated list of light counts to benchmark (default: 1,8,32,128)")
+    parser.add_argument("--requests", type=int, default=500, help="number of doAction requests to send per light count")
+    parser.add_argument("--concurrency", type=int, default=4, help="number of requests in flight at the same time")
+    parser.add_argument("--sim_latency", type=float, default=0.01, help="seconds per acknowledged write on the simulated lights")
+    parser.add_argument("--sim_loss", type=float, default=0.0, help="chance (0.0-1.0) of a simulated write being lost")
+    parser.add_argument("--startup_timeout", type=float, default=120, help="seconds to wait for the simulated lights to be linked")
+    parser.add_argument("--url", default="http://127.0.0.1:8080/NeewerLite-Python/doAction", help="the doAction URL of the HTTP server")
+    parser.add_argument("--output", default=None, help="save the JSON results to this file (instead of printing them)")
+    args = parser.parse_args()
+
+    allResults = {"benchmark": "http_to_gatt", "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                  "platform": platform.system(), "settings": {"requests": args.requests, "concurrency": args.concurrency,
+                  "sim_latency": args.sim_latency, "sim_loss": args.sim_loss}, "results": []}
+
+    for numOfLights in [int(x) for x in args.lights.split(",")]:
+        allResults["results"].append(runBenchmark(args, numOfLights))
+
+    if args.output != None:
+        with open(args.output, mode="w", encoding="utf-8") as outputFile:
+            json.dump(allResults, outputFile, indent=2)
+
+        print(f"Benchmark results saved to {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(allResults, indent=2))